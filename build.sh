@@ -3,4 +3,6 @@
 set -o errexit
 
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+# ตารางของ DB cache ('shared' ใน settings.CACHES) สำหรับ concurrency cap
+python manage.py createcachetable
\ No newline at end of file
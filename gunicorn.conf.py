@@ -0,0 +1,69 @@
+# gunicorn.conf.py
+# gunicorn อ่านไฟล์นี้อัตโนมัติเมื่อรันจาก root ของโปรเจกต์
+
+import os
+
+# KITSU_ASGI=1 -> รัน asgi.py ด้วย uvicorn worker (async view สำหรับ endpoint ที่ถูก poll)
+# ไม่งั้นใช้ wsgi.py + sync worker แบบเดิม
+ASGI = os.environ.get('KITSU_ASGI', '0') == '1'
+
+if ASGI:
+    wsgi_app = 'kitsu_backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'kitsu_backend.wsgi:application'
+    worker_class = 'sync'
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# ปิด connection ที่ client ค้างไว้นานเกินไป (polling ใช้ keep-alive)
+keepalive = 5
+
+# โหลดแอปครั้งเดียวใน master แล้ว fork -> worker ไม่ต้อง import Django/DRF/cloudinary ใหม่
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    # preload: resolve URLconf และ import view/DRF ใน master ก่อน fork (ไม่แตะ DB)
+    # worker ที่ fork ออกไปจะได้โค้ดที่โหลดแล้วไปด้วย
+    if preload_app:
+        from kitsu_backend.warmup import warm_code
+
+        warm_code()
+
+
+def post_fork(server, worker):
+    # connection ที่ master อาจเปิดไว้ตอน preload ห้ามแชร์ข้าม process
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    # warm-up ก่อน worker เริ่มรับ request: DB connection, URL resolver, import ที่เหลือ, เมนู
+    # (/readyz จะตอบ 200 หลังจากนี้)
+    from kitsu_backend.warmup import warm_up
+
+    warm_up()
+
+    # SCHEDULER_IN_WEB=1: ทุก worker แข่งกันเป็น leader ของ scheduler, มีตัวเดียวที่รันงาน
+    from django.conf import settings
+
+    if settings.SCHEDULER_IN_WEB:
+        from menu.scheduler import start_background_scheduler
+
+        start_background_scheduler()
+
+
+def worker_exit(server, worker):
+    # คืน lease ทันที ให้ worker ตัวอื่นรับงานต่อโดยไม่ต้องรอ lease หมดอายุ
+    from menu.scheduler import stop_background_scheduler
+
+    stop_background_scheduler()
+
+    # ส่งข้อความ Telegram ที่ยังค้างในคิวก่อน process จบ (รอไม่เกิน TELEGRAM_SHUTDOWN_TIMEOUT วินาที)
+    from django.conf import settings
+    from menu.telegram import flush_sender
+
+    flush_sender(settings.TELEGRAM_SHUTDOWN_TIMEOUT)
@@ -3,6 +3,17 @@ ASGI config for kitsu_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+รันแบบ ASGI (uvicorn worker ภายใต้ gunicorn) เพื่อให้ endpoint ที่ลูกค้า poll
+(/api/items/, /api/orders/<id>/, /api/payment/status/<intent>/) เป็น async view:
+
+    KITSU_ASGI=1 gunicorn
+
+(ค่าที่เหลืออ่านจาก gunicorn.conf.py: uvicorn.workers.UvicornWorker, WEB_CONCURRENCY workers)
+sync worker หนึ่งตัวรับได้ทีละ request ส่วน uvicorn worker รอ client ช้าๆ หลายตัวพร้อมกันได้
+เฉพาะเมื่อ middleware ทุกตัวใน settings.MIDDLEWARE รองรับ async (ไม่งั้น Django ย้ายทุก request ไป thread
+แล้วกลับมา ซึ่งหักล้างประโยชน์ของ async view) -> เช็คโดย test_asgi_middleware_chain_stays_async
+ยังไม่มีตัวเลข capacity ที่วัดไว้: เทียบสองโหมดกับ workload จริงด้วย `python manage.py loadtest` ก่อนเปิดใช้
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +23,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kitsu_backend.settings')
+os.environ.setdefault('KITSU_ASGI', '1')
 
 application = get_asgi_application()
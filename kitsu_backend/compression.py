@@ -0,0 +1,20 @@
+# kitsu_backend/compression.py
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+# =======================================================
+#               GZIP FOR LARGE JSON RESPONSES
+# =======================================================
+# บีบอัดเฉพาะ response JSON ที่ใหญ่กว่า GZIP_MIN_LENGTH bytes (เช่น รายการออเดอร์ของ admin)
+# response เล็กๆ (status ที่ลูกค้า poll) ไม่คุ้มค่า CPU ในการบีบอัด
+# static file ไม่ผ่านตรงนี้: WhiteNoise เสิร์ฟไฟล์ .gz ที่บีบอัดไว้แล้วเอง
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if len(response.content) < getattr(settings, 'GZIP_MIN_LENGTH', 1024):
+            return response
+        return super().process_response(request, response)
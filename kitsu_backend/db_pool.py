@@ -0,0 +1,60 @@
+# kitsu_backend/db_pool.py
+
+from django.conf import settings
+from django.db import connections
+
+# =======================================================
+#               CONNECTION POOL METRICS
+# =======================================================
+# DB_POOL=1 (ดู settings.py) -> Django เปิด psycopg_pool.ConnectionPool ต่อ alias ต่อ process
+# ที่นี่แค่อ่านสถิติของ pool ใน process ปัจจุบัน เพื่อดูว่า pool เต็ม (saturated) หรือยัง
+
+
+def pool_saturation(stats):
+    """
+    สรุปสถิติจาก ConnectionPool.get_stats()
+    saturation = connection ที่ถูกยืมอยู่ / ขนาดสูงสุดของ pool (1.0 = เต็ม, request ถัดไปต้องรอ)
+    """
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    maximum = stats.get('pool_max', 0)
+    in_use = max(0, size - available)
+    return {
+        'pool_min': stats.get('pool_min', 0),
+        'pool_max': maximum,
+        'pool_size': size,
+        'pool_available': available,
+        'in_use': in_use,
+        'saturation': round(in_use / maximum, 3) if maximum else 0.0,
+        'requests_waiting': stats.get('requests_waiting', 0),
+        'requests_num': stats.get('requests_num', 0),
+        'requests_queued': stats.get('requests_queued', 0),
+        'requests_wait_ms': stats.get('requests_wait_ms', 0),
+        'requests_errors': stats.get('requests_errors', 0),
+        'connections_num': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def connection_stats(alias):
+    connection = connections[alias]
+    data = {
+        'vendor': connection.vendor,
+        'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS', False),
+    }
+    # เฉพาะ backend postgresql ที่มี OPTIONS['pool'] เท่านั้นที่มี pool
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        data.update(
+            pooled=False,
+            conn_max_age=connection.settings_dict.get('CONN_MAX_AGE', 0),
+            connected=connection.connection is not None,
+        )
+        return data
+
+    data.update(pooled=True, **pool_saturation(pool.get_stats()))
+    return data
+
+
+def database_stats():
+    return {alias: connection_stats(alias) for alias in settings.DATABASES}
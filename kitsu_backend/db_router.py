@@ -0,0 +1,149 @@
+# kitsu_backend/db_router.py
+
+import contextvars
+import functools
+import hashlib
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+# =======================================================
+#               READ REPLICA ROUTING
+# =======================================================
+# - ปกติทุก query ไปที่ 'default' (primary)
+# - query อ่านที่อยู่ใน read_from_replica() / @replica_reads จะไปที่ replica
+# - ถ้า request นี้เคยเขียนแล้ว (หรือ client เดียวกันเพิ่งเขียนไปไม่กี่วินาที ดู middleware)
+#   จะถูก "pin" ไว้ที่ primary เพื่อให้อ่านข้อมูลที่ตัวเองเพิ่งเขียนเจอเสมอ
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.use_replica = False
+
+
+_state = contextvars.ContextVar('kitsu_db_routing', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def read_from_replica():
+    state = _state.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = _state.set(state)
+
+    previous = state.use_replica
+    state.use_replica = True
+    try:
+        yield state
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def replica_reads(func):
+    """decorator สำหรับ method ของ view ที่อ่านอย่างเดียว (admin list / report)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_from_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        alias = replica_alias()
+        if alias and state is not None and state.use_replica and not state.pinned:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica คือสำเนาของ primary -> object จากทั้งสองฝั่ง relate กันได้
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware:
+    """
+    สร้าง routing state ต่อ request และจำ client ที่เพิ่งเขียนไว้ใน cache REPLICA_PIN_SECONDS วินาที
+    (ระบุ client ด้วย Authorization header -> session cookie -> IP ตามลำดับ
+    เพราะหน้า admin ฝั่ง frontend ใช้ Token อยู่คนละ domain ส่ง cookie ไม่ได้)
+    ASGI: ใช้ cache แบบ async (aget/aset) ไม่ต้องย้าย request ไป thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def pin_key(request):
+        identity = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        return 'db:pin:' + hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_alias():
+            return self.get_response(request)
+
+        key = self.pin_key(request)
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or bool(cache.get(key))
+        state = RoutingState(pinned=pinned)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            # ให้ request ถัดๆ ไปของ client นี้อ่านจาก primary จนกว่า replica จะตามทัน
+            cache.set(key, 1, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+    async def __acall__(self, request):
+        if not replica_alias():
+            return await self.get_response(request)
+
+        key = self.pin_key(request)
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or bool(await cache.aget(key))
+        state = RoutingState(pinned=pinned)
+        # contextvar ถูก copy ไปกับ sync_to_async -> sync view เห็น state เดียวกัน
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            await cache.aset(key, 1, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
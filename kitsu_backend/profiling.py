@@ -0,0 +1,234 @@
+# kitsu_backend/profiling.py
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# =======================================================
+#           OPT-IN PER-REQUEST PROFILER (admin only)
+# =======================================================
+# - admin ขอ profile ได้ทีละ request: header "X-Profile: 1" หรือ ?_profile=1
+#   -> รัน request ใต้ cProfile + จด SQL ทุก statement (ทุก database alias) พร้อมเวลา
+# - เก็บเป็นไฟล์ใน REQUEST_PROFILE_DIR: <id>.prof (pstats, เปิดด้วย snakeviz ได้) + <id>.json (ข้อมูล request + SQL)
+#   เก็บแค่ REQUEST_PROFILE_KEEP อันล่าสุด (ring buffer: เขียนอันใหม่แล้วลบอันเก่าสุด)
+# - request ที่ไม่ได้ขอ: เช็ค header / query string หนึ่งครั้งแล้วส่งต่อเลย ไม่มี profiler / wrapper
+#   ปิดทั้งหมดด้วย REQUEST_PROFILER=0 -> middleware ไม่ถูกใส่ใน chain เลย (MiddlewareNotUsed)
+# - ดูผลได้ที่ /api/admin/profiles/ (menu/views.py)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+TOP_FUNCTIONS = 40
+_ID_RE = re.compile(r'^[0-9]{20}-[0-9a-f]{8}$')
+
+
+def profile_dir():
+    return settings.REQUEST_PROFILE_DIR
+
+
+def is_requested(request):
+    # parse query string จริง (substring จะไปตรงกับพารามิเตอร์อื่นเช่น x_profile=1)
+    return request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def _staff_user(request):
+    """admin ที่ login ด้วย session หรือ Token (DRF ยังไม่ได้ authenticate ตอนอยู่ใน middleware)"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    # ไม่ได้ส่ง Authorization มา -> ไม่ต้องให้ TokenAuthentication ไป query (request ที่ไม่ login แค่ใส่ header X-Profile)
+    if not request.META.get('HTTP_AUTHORIZATION'):
+        return None
+
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+
+class SQLLog:
+    """execute_wrapper ที่จด SQL + params + เวลา (ms) ของทุก statement"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append({
+                'alias': self.alias,
+                'sql': sql,
+                'params': [repr(param) for param in params] if params and not many else [],
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def top_functions(stats_path, limit=TOP_FUNCTIONS):
+    """สรุป pstats เป็นข้อความ (เรียงตาม cumulative time)"""
+    output = io.StringIO()
+    pstats.Stats(stats_path, stream=output).strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+def _write_json(path, data):
+    # เขียนไฟล์ชั่วคราวแล้ว rename -> คนที่อ่านรายการพร้อมกันไม่เจอไฟล์ครึ่งๆ
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def save_profile(profiler, meta, sql_logs):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    # เวลาถึง microsecond นำหน้า -> เรียงชื่อไฟล์ = เรียงตามเวลา (ใช้ตอน prune)
+    profile_id = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    statements = [statement for log in sql_logs for statement in log.statements]
+    meta = {
+        **meta,
+        'id': profile_id,
+        'sql_count': len(statements),
+        'sql_ms': round(sum(statement['ms'] for statement in statements), 3),
+        'sql': statements,
+    }
+    _write_json(os.path.join(directory, f"{profile_id}.json"), meta)
+    prune_profiles()
+    return profile_id
+
+
+def _profile_ids():
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json') and _ID_RE.match(name[:-5]))
+
+
+def prune_profiles(keep=None):
+    keep = settings.REQUEST_PROFILE_KEEP if keep is None else keep
+    ids = _profile_ids()
+    for profile_id in ids[:max(len(ids) - keep, 0)]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(profile_dir(), profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(profile_id, suffix='.prof'):
+    """path ของไฟล์ profile (None ถ้า id ผิดรูปแบบ / ไม่มีไฟล์) กัน path traversal ด้วยรูปแบบ id"""
+    if not _ID_RE.match(profile_id or ''):
+        return None
+    path = os.path.join(profile_dir(), profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def load_profile(profile_id, with_sql=True):
+    path = profile_path(profile_id, '.json')
+    if path is None:
+        return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not with_sql:
+        data.pop('sql', None)
+    return data
+
+
+def list_profiles():
+    """profile ล่าสุดก่อน (ไม่รวม SQL log)"""
+    profiles = []
+    for profile_id in reversed(_profile_ids()):
+        data = load_profile(profile_id, with_sql=False)
+        if data is not None:
+            profiles.append(data)
+    return profiles
+
+
+class RequestProfilerMiddleware:
+    """
+    ต้องอยู่หลัง AuthenticationMiddleware (ใช้ request.user ของ session)
+    ASGI: request ทั่วไปไม่ข้าม thread; request ที่ขอ profile รันทั้งก้อนใน thread เดียว
+    (sync view / async ORM ถูกส่งกลับมา thread นี้ -> cProfile และ SQL wrapper เห็นครบ)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILER', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_requested(request):
+            return self.get_response(request)
+        return self.handle(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not is_requested(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.handle)(request, async_to_sync(self.get_response))
+
+    def handle(self, request, get_response):
+        user = _staff_user(request)
+        if user is None:
+            return get_response(request)
+        return self.profile(request, user, get_response)
+
+    def profile(self, request, user, get_response):
+        sql_logs = [SQLLog(alias) for alias in settings.DATABASES]
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: มี profiler ได้ทีละตัวต่อ process (อีก request กำลังถูก profile อยู่)
+            return get_response(request)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for log in sql_logs:
+                    stack.enter_context(connections[log.alias].execute_wrapper(log))
+                response = get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile_id = save_profile(profiler, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user': user.get_username(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'duration_ms': round(elapsed * 1000, 3),
+            }, sql_logs)
+        except OSError as e:
+            print(f"ERROR: could not save request profile: {e}")
+            return response
+        response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,33 @@
+# kitsu_backend/renderers.py
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson ไม่ได้ติดตั้ง -> ใช้ JSONRenderer ของ DRF ตามเดิม
+    orjson = None
+
+# =======================================================
+#               FAST JSON RENDERER
+# =======================================================
+# encode ด้วย orjson (เร็วกว่า json ของ stdlib หลายเท่า) แต่ผลลัพธ์ต้องเหมือน DRF:
+# - datetime / Decimal / lazy string ฯลฯ ส่งต่อให้ JSONEncoder.default ของ DRF แปลงเหมือนเดิม
+# - ขอแบบมี indent (?format / Accept: ...; indent=4) หรือ encode ไม่ได้ -> กลับไปใช้ JSONRenderer ปกติ
+
+_drf_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    options = 0 if orjson is None else orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(data, default=_drf_encoder.default, option=self.options)
+        except TypeError:
+            # เช่น int ที่ใหญ่เกิน 64 bit -> ให้ json ของ stdlib จัดการ
+            return super().render(data, accepted_media_type, renderer_context)
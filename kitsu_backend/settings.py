@@ -54,18 +54,30 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise ที่รองรับ async (kitsu_backend/static.py) -> ใต้ ASGI ไม่มี middleware ตัวไหนบังคับให้ request ข้าม thread
+    'kitsu_backend.static.StaticFilesMiddleware',
+    # บีบอัด response JSON ขนาดใหญ่ (ต้องอยู่บนๆ เพื่อบีบอัดหลัง middleware อื่นแก้ response เสร็จ)
+    'kitsu_backend.compression.JSONGZipMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Should be placed high up
+    # ต้องอยู่หลัง CORS เพื่อให้ response 429/503 มี CORS header ด้วย
+    'menu.throttling.AbuseSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # ?_profile=1 / X-Profile: 1 จาก admin -> cProfile + SQL log (kitsu_backend/profiling.py)
+    'kitsu_backend.profiling.RequestProfilerMiddleware',
+    'kitsu_backend.db_router.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'kitsu_backend.urls'
 WSGI_APPLICATION = 'kitsu_backend.wsgi.application'
+ASGI_APPLICATION = 'kitsu_backend.asgi.application'
+
+# KITSU_ASGI=1 เมื่อรันผ่าน asgi.py (uvicorn worker) -> ใช้ async view สำหรับ endpoint ที่ถูก poll
+ASYNC_PUBLIC_VIEWS = os.environ.get('KITSU_ASGI', '0') == '1'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
@@ -83,6 +95,70 @@ DATABASES = {
     )
 }
 
+# Read replica (ไม่บังคับ): ใช้กับ admin list / dashboard stats ที่อ่านอย่างเดียว
+# ทดสอบในเครื่องได้โดยชี้ REPLICA_DATABASE_URL ไปที่ DB ตัวเดียวกัน เช่น sqlite:///db.sqlite3
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+REPLICA_DATABASE_ALIAS = None
+if REPLICA_DATABASE_URL:
+    REPLICA_DATABASE_ALIAS = 'replica'
+    DATABASES[REPLICA_DATABASE_ALIAS] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    # ตอนรัน test ให้ replica ชี้ไปที่ test database ของ default
+    DATABASES[REPLICA_DATABASE_ALIAS]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['kitsu_backend.db_router.ReplicaRouter']
+# หลังจาก client เขียนข้อมูล ให้อ่านจาก primary ต่ออีกกี่วินาที (รอ replica ตามทัน)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Connection pool (psycopg 3, PostgreSQL เท่านั้น): DB_POOL=1 เปิดใช้
+# - แต่ละ process มี pool ของตัวเอง ขนาด DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+#   (workers * DB_POOL_MAX_SIZE ต้องไม่เกิน max_connections ของ PostgreSQL)
+# - รอ connection ว่างได้นานสุด DB_POOL_TIMEOUT วินาที จากนั้น request นั้นจะ error
+# - ปิด pool (ค่าเริ่มต้น) = persistent connection ต่อ worker แบบเดิม (conn_max_age=600)
+# ทั้งสองแบบเปิด CONN_HEALTH_CHECKS: connection ที่หลุดไปแล้วจะถูกเปิดใหม่ก่อนใช้ ไม่ใช่ไปพังที่ request ของลูกค้า
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+DB_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+}
+
+for _database in DATABASES.values():
+    _database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL and _database['ENGINE'] == 'django.db.backends.postgresql':
+        # pool จัดการอายุ connection เอง -> Django ต้องคืน connection ทุกครั้งที่จบ request
+        _database['CONN_MAX_AGE'] = 0
+        _database.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+
+# บน PostgreSQL เปิดใช้ django.contrib.postgres (trigram lookup สำหรับค้นหาเมนู)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    INSTALLED_APPS.append('django.contrib.postgres')
+
+# ==============================================================================
+# CACHES
+# ==============================================================================
+
+# 'default' = ใน process (menu version, replica pin, throttle แบบ 'cache')
+# 'shared' = DB cache (ตาราง kitsu_shared_cache, build.sh รัน createcachetable) แชร์ทุก worker / ทุก instance
+#   ใช้กับ CONCURRENCY_LIMITS ที่ต้องนับรวมทั้งระบบ
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'kitsu_shared_cache',
+    },
+}
+
+# ==============================================================================
+# MENU CACHE & SEARCH
+# ==============================================================================
+
+# อายุของ payload เมนูที่ cache ไว้ใน process (วินาที)
+MENU_CACHE_TTL = int(os.environ.get('MENU_CACHE_TTL', 60))
+
+# 'auto' = ใช้ index ของ PostgreSQL ถ้ามี, ไม่งั้นใช้ inverted index ใน memory
+# ('database' / 'memory' เพื่อบังคับ)
+MENU_SEARCH_BACKEND = os.environ.get('MENU_SEARCH_BACKEND', 'auto')
+
 # ==============================================================================
 # TEMPLATES & INTERNATIONALIZATION
 # ==============================================================================
@@ -177,9 +253,19 @@ REST_FRAMEWORK = {
     # บอกว่า โดยปกติแล้ว ทุก API จะต้องใช้ "บัตรผ่าน" (ต้องล็อกอิน) ถึงจะเข้าได้
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+
+    # กฎข้อที่ 3: "รูปแบบ response"
+    # encode JSON ด้วย orjson (ผลลัพธ์เหมือน JSONRenderer ของ DRF) และยังเปิดหน้า browsable API ไว้เหมือนเดิม
+    'DEFAULT_RENDERER_CLASSES': [
+        'kitsu_backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# response JSON ที่ใหญ่กว่านี้ (bytes) จะถูกบีบอัดด้วย gzip ถ้า client รองรับ
+GZIP_MIN_LENGTH = int(os.environ.get('GZIP_MIN_LENGTH', 1024))
+
 # ==============================================================================
 # CLOUDINARY SETTINGS
 # ==============================================================================
@@ -187,4 +273,113 @@ CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME'),
     'API_KEY': os.environ.get('CLOUDINARY_API_KEY'),
     'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
-}
\ No newline at end of file
+}
+
+# ==============================================================================
+# TELEGRAM
+# ==============================================================================
+
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+# ส่งข้อความผ่าน asyncio sender (menu/telegram.py) แทนการยิง request ตรงใน view
+TELEGRAM_ASYNC_SENDER = os.environ.get('TELEGRAM_ASYNC_SENDER', '1') == '1'
+# token bucket ต่อ chat: ข้อความต่อวินาที และ burst สูงสุด
+TELEGRAM_CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_CHAT_BURST = int(os.environ.get('TELEGRAM_CHAT_BURST', 3))
+# เวลารอ (วินาที) เพื่อรวมออเดอร์ใหม่ที่เข้ามาติดๆ กันเป็น digest เดียว
+TELEGRAM_COALESCE_WINDOW = float(os.environ.get('TELEGRAM_COALESCE_WINDOW', 1))
+# เวลาสูงสุด (วินาที) ที่ worker ที่กำลังปิดรอส่งข้อความที่ค้างในคิว (gunicorn worker_exit)
+TELEGRAM_SHUTDOWN_TIMEOUT = float(os.environ.get('TELEGRAM_SHUTDOWN_TIMEOUT', 5))
+
+# bot ของลูกค้า (menu/bot.py): username ใช้สร้างลิงก์ t.me/<bot>?start=<token> หลังสั่งอาหาร
+TELEGRAM_BOT_USERNAME = os.environ.get('TELEGRAM_BOT_USERNAME', '')
+# หน้าประวัติออเดอร์ของ frontend ที่ bot ส่งให้ตอน /orders (ต่อท้ายด้วย ?chat_id=&token=), ว่าง = ลิงก์ไปที่ /api/orders/lookup/
+ORDER_HISTORY_URL = os.environ.get('ORDER_HISTORY_URL', '')
+# secret_token ที่ตั้งตอน setWebhook (ว่าง = ปิด webhook, ตอบ 403 ทุก request)
+TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+
+# ==============================================================================
+# RATE LIMITING (menu/throttling.py)
+# ==============================================================================
+
+# 'memory' = นับต่อ process, 'cache' = นับผ่าน Django cache (แชร์ทุก worker ถ้าใช้ shared cache)
+THROTTLE_BACKEND = os.environ.get('THROTTLE_BACKEND', 'memory')
+# จำนวน proxy หน้า app ที่เชื่อ X-Forwarded-For ได้ (Render มี 1 ชั้น)
+THROTTLE_TRUSTED_PROXIES = int(os.environ.get('THROTTLE_TRUSTED_PROXIES', 1 if 'RENDER' in os.environ else 0))
+
+# (path regex, จำนวนครั้ง, window วินาที) นับต่อ IP สำหรับ POST/PUT/PATCH/DELETE
+THROTTLE_IP_RULES = [
+    (r'^/api/orders/submit-final/$', 20, 60),
+    (r'^/api/orders/\d+/upload-slip/$', 10, 60),
+    (r'^/api/payment/create-intent/$', 30, 60),
+    # หน้าตะกร้าเรียกทุกครั้งที่แก้จำนวน -> limit สูงกว่า submit
+    (r'^/api/orders/quote/$', 120, 60),
+    (r'^/api/orders/lookup/$', 30, 60),
+    # update ของ bot มาจาก IP ของ Telegram ไม่กี่ตัว -> limit สูงกว่า webhook อื่น
+    (r'^/api/webhook/telegram/$', 1200, 60),
+    (r'^/api/webhook/', 120, 60),
+]
+# (จำนวนออเดอร์, window วินาที) ต่อเบอร์โทร
+THROTTLE_PHONE_RATE = (5, 600)
+# จำนวน request ที่ทำงานพร้อมกันได้สูงสุดของ endpoint ที่หนัก รวมทุก worker (เกิน -> 503 + Retry-After)
+# นับผ่าน CONCURRENCY_CACHE ที่ต้องแชร์ข้าม process: cache ใน process -> middleware ไม่ยอมเริ่ม (ImproperlyConfigured)
+CONCURRENCY_CACHE = os.environ.get('CONCURRENCY_CACHE', 'shared')
+CONCURRENCY_LIMITS = {
+    r'^/api/orders/submit-final/$': int(os.environ.get('SUBMIT_CONCURRENCY_LIMIT', 16)),
+    r'^/api/orders/\d+/upload-slip/$': int(os.environ.get('UPLOAD_CONCURRENCY_LIMIT', 8)),
+}
+
+# ==============================================================================
+# SCHEDULER (menu/scheduler.py, งานอยู่ใน menu/jobs.py)
+# ==============================================================================
+
+# รัน scheduler ในทุก gunicorn worker (เลือก leader ผ่าน DB มีตัวเดียวที่ทำงานจริง)
+# หรือปิดไว้แล้วรัน `python manage.py run_scheduler` เป็น process แยก
+SCHEDULER_IN_WEB = os.environ.get('SCHEDULER_IN_WEB', '0') == '1'
+SCHEDULER_JOB_MODULES = ['menu.jobs']
+# leader ที่ตายไปจะถูกแทนที่ภายในเวลานี้ (วินาที)
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 30))
+# ยกเลิกออเดอร์ที่ไม่ชำระเงินภายในกี่นาที (0 = ไม่ยกเลิกอัตโนมัติ, ต้องเปิดเอง)
+# ออเดอร์ที่ upload slip แล้ว (รอ admin ตรวจ) ไม่ถูกยกเลิก
+UNPAID_ORDER_EXPIRY_MINUTES = int(os.environ.get('UNPAID_ORDER_EXPIRY_MINUTES', 0))
+
+# ==============================================================================
+# MENU IMAGES
+# ==============================================================================
+# ความกว้าง (px) ของรูปเมนูใน srcset (เรียงจากเล็กไปใหญ่, ตัวสุดท้ายใช้เป็น image_url)
+# เปลี่ยนแล้วรัน: python manage.py build_image_variants --all
+MENU_IMAGE_WIDTHS = [160, 320, 480, 640, 960]
+
+# ==============================================================================
+# PRE-ORDER TIME SLOTS (menu/slots.py)
+# ==============================================================================
+# slot ถูกสร้างล่วงหน้าโดยงาน generate_time_slots, ความจุแต่ละ slot แก้ได้ใน admin
+TIME_SLOT_MINUTES = int(os.environ.get('TIME_SLOT_MINUTES', 30))
+TIME_SLOT_CAPACITY = int(os.environ.get('TIME_SLOT_CAPACITY', 8))
+TIME_SLOT_OPEN = os.environ.get('TIME_SLOT_OPEN', '10:00')
+TIME_SLOT_CLOSE = os.environ.get('TIME_SLOT_CLOSE', '21:00')
+TIME_SLOT_DAYS_AHEAD = int(os.environ.get('TIME_SLOT_DAYS_AHEAD', 2))
+# จองได้เฉพาะ slot ที่เริ่มหลังจากตอนนี้อย่างน้อยกี่นาที
+TIME_SLOT_LEAD_MINUTES = int(os.environ.get('TIME_SLOT_LEAD_MINUTES', 30))
+
+# ==============================================================================
+# REQUEST PROFILER (kitsu_backend/profiling.py)
+# ==============================================================================
+# admin ขอ profile ทีละ request ด้วย ?_profile=1 หรือ header X-Profile: 1, ดูผลที่ /api/admin/profiles/
+REQUEST_PROFILER = os.environ.get('REQUEST_PROFILER', '1') == '1'
+REQUEST_PROFILE_DIR = os.environ.get('REQUEST_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+# จำนวน profile ล่าสุดที่เก็บไว้ (เก่ากว่านี้ถูกลบ)
+REQUEST_PROFILE_KEEP = int(os.environ.get('REQUEST_PROFILE_KEEP', 50))
+
+
+# ==============================================================================
+# RECEIPTS (menu/receipts.py)
+# ==============================================================================
+# cache ใบเสร็จ (PNG / HTML) บน disk ตั้งชื่อไฟล์ตาม hash ของเนื้อหา, เกินขนาดนี้ลบไฟล์ที่ไม่ได้ใช้นานที่สุด
+RECEIPT_CACHE_DIR = os.environ.get('RECEIPT_CACHE_DIR', os.path.join(BASE_DIR, 'receipts'))
+RECEIPT_CACHE_MAX_BYTES = int(os.environ.get('RECEIPT_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+# ไฟล์ .ttf ที่มีตัวอักษรไทย (ว่าง = ฟอนต์ default ของ Pillow ซึ่งไม่มีภาษาไทย)
+RECEIPT_FONT_PATH = os.environ.get('RECEIPT_FONT_PATH', '')
+# แนบรูปใบเสร็จไปกับข้อความ Telegram "จัดส่งสำเร็จ"
+# default: เปิดเฉพาะเมื่อตั้ง RECEIPT_FONT_PATH แล้ว (ฟอนต์ default วาดตัวไทยเป็นกล่องเหมือนกันหมด อ่านไม่ออก)
+RECEIPT_ON_COMPLETED = os.environ.get('RECEIPT_ON_COMPLETED', '1' if RECEIPT_FONT_PATH else '0') == '1'
@@ -0,0 +1,35 @@
+# kitsu_backend/static.py
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# =======================================================
+#               STATIC FILES (WSGI + ASGI)
+# =======================================================
+# WhiteNoiseMiddleware เป็น sync อย่างเดียว -> ใต้ ASGI Django ต้องย้ายทุก request ไป thread แล้วกลับมา
+# (async view ใน menu/async_views.py ก็เลยไม่ได้ประโยชน์)
+# ตัวนี้หา static file ใน dict ของ WhiteNoise (ไม่มี I/O) แล้วส่งต่อ request อื่นแบบ async ได้เลย
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
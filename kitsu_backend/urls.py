@@ -5,7 +5,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 # --- เพิ่ม import นี้เข้ามา ---
 from rest_framework.authtoken.views import obtain_auth_token
-from .views import proxy_view
+from .views import proxy_view, healthz, readyz
 from django.views.generic import RedirectView
 
 urlpatterns = [
@@ -13,6 +13,10 @@ urlpatterns = [
     #path('', RedirectView.as_view(url='https://potae31121.github.io/kitsu-cloud-kitchen/', permanent=False), name='index'),  # Redirect to the homepage
 
     path('admin/', admin.site.urls),
+
+    # health check (liveness / readiness หลัง warm-up)
+    path('healthz', healthz),
+    path('readyz', readyz),
     
     # --- เพิ่มเส้นทางสำหรับ Login เข้ามาใหม่ตรงนี้ ---
     path('api/token-auth/', obtain_auth_token, name='api_token_auth'),
@@ -1,7 +1,29 @@
 # kitsu_backend/views.py
 
-import requests
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+
+from .warmup import readiness, warm_up_in_background
+
+# =======================================================
+#               HEALTH / READINESS
+# =======================================================
+
+def healthz(request):
+    # liveness: process ยังตอบได้ (ไม่แตะ DB)
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    state = readiness()
+    if state['ready']:
+        return JsonResponse({'status': 'ready', 'warmup_ms': state['steps']})
+
+    # ยังไม่ warm (เช่นรันด้วย runserver ที่ไม่มี gunicorn hook) -> เริ่ม warm-up ใน background
+    warm_up_in_background()
+    response = JsonResponse({'status': 'warming_up', 'error': state['error']}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
 
 # =======================================================
 #               PROXY VIEW FOR FRONTEND
@@ -10,6 +32,9 @@ from django.http import HttpResponse
 FRONTEND_URL = 'https://potae31121.github.io/kitsu-cloud-kitchen/'
 
 def proxy_view(request, path):
+    # import ตอนใช้งาน เพื่อไม่ให้ requests ถูกโหลดตอน start (cold start)
+    import requests
+
     # สร้าง URL ที่จะไปดึงข้อมูล
     url = f"{FRONTEND_URL}{path}"
     
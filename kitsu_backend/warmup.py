@@ -0,0 +1,128 @@
+# kitsu_backend/warmup.py
+
+import importlib
+import threading
+import time
+
+# =======================================================
+#               WARM-UP / READINESS
+# =======================================================
+# instance ที่เพิ่งตื่น (Render spin down) จ่ายค่า import, resolve URL, เปิด DB connection
+# และ build เมนูใน request แรก -> ทำทั้งหมดนี้ล่วงหน้าใน warm_up()
+# gunicorn เรียก warm_up() ใน post_worker_init (ดู gunicorn.conf.py)
+# /readyz ตอบ 200 หลังจาก warm-up เสร็จแล้วเท่านั้น
+
+# module ที่ DRF / view import ตอนรับ request แรก
+WARM_IMPORTS = [
+    'rest_framework.renderers',
+    'rest_framework.parsers',
+    'rest_framework.negotiation',
+    'rest_framework.authtoken.models',
+    'requests',
+]
+
+_lock = threading.Lock()
+_state = {
+    'ready': False,
+    'started': False,
+    'steps': {},
+    'error': None,
+}
+
+
+def _warm_database():
+    from django.conf import settings
+    from django.db import connections
+
+    for alias in settings.DATABASES:
+        connections[alias].ensure_connection()
+
+
+def _warm_urls():
+    from django.urls import get_resolver, resolve
+
+    get_resolver().url_patterns
+    resolve('/api/items/')
+
+
+def _warm_imports():
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+
+def _warm_menu():
+    from menu.cache import get_menu_items
+    from menu.kitchens import active_kitchen_ids
+    from menu.search import get_search_index, use_database_search
+
+    # payload เมนูแยกตามครัว -> อุ่นทุกครัวที่เปิดอยู่
+    for kitchen_id in active_kitchen_ids():
+        get_menu_items(kitchen_id=kitchen_id)
+        if not use_database_search():
+            get_search_index(kitchen_id)
+
+
+STEPS = [
+    ('database', _warm_database),
+    ('urls', _warm_urls),
+    ('imports', _warm_imports),
+    ('menu', _warm_menu),
+]
+
+
+def warm_code():
+    # เฉพาะ step ที่ไม่แตะ DB / cache -> เรียกใน gunicorn master ก่อน fork ได้
+    _warm_urls()
+    _warm_imports()
+
+
+def warm_up():
+    """รันทุก step แล้วเก็บเวลา (ms) ของแต่ละ step, ถ้า step ไหนพังจะยังไม่ ready"""
+    with _lock:
+        if _state['ready']:
+            return _state['steps']
+        _state['started'] = True
+
+        steps = {}
+        try:
+            for name, step in STEPS:
+                started = time.perf_counter()
+                step()
+                steps[name] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            _state['error'] = f"{name}: {e}"
+            _state['started'] = False
+            print(f"ERROR: warm-up failed at step {name}: {e}")
+            return steps
+
+        _state['steps'] = steps
+        _state['error'] = None
+        _state['ready'] = True
+        print(f"Warm-up finished: {steps}")
+        return steps
+
+
+def _warm_up_thread():
+    from django.db import connections
+
+    try:
+        warm_up()
+    finally:
+        # connection ของ Django เป็นของแต่ละ thread -> ปิดของ thread นี้ทิ้ง ไม่ให้ค้าง
+        connections.close_all()
+
+
+def warm_up_in_background():
+    if _state['ready'] or _state['started']:
+        return
+    _state['started'] = True
+    threading.Thread(target=_warm_up_thread, name='warm-up', daemon=True).start()
+
+
+def readiness():
+    return dict(_state)
+
+
+def reset_readiness():
+    with _lock:
+        _state.update(ready=False, started=False, steps={}, error=None)
@@ -1,6 +1,17 @@
 # menu/admin.py (Correct Final Version)
-from django.contrib import admin
-from .models import Category, MenuItem, Order, OrderItem, Category
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .admin_helpers import EstimatedCountPaginator, RangeDrilldownQuerySet
+from .events import record_transition
+from .importer import export_rows, import_menu, read_rows
+from .models import AvailabilityWindow, Category, Kitchen, MenuItem, Order, OrderEvent, OrderItem, Category, Promotion, TimeSlot
+from .services import normalize_phone
 from django.utils.html import format_html
 
 class OrderItemInline(admin.TabularInline):
@@ -12,14 +23,80 @@ class OrderItemInline(admin.TabularInline):
     def has_add_permission(self, request, obj=None):
         return False
 
+class OrderEventInline(admin.TabularInline):
+    model = OrderEvent
+    extra = 0
+    fields = ('created_at', 'from_status', 'to_status', 'payment_status', 'source')
+    readonly_fields = fields
+    can_delete = False
+    ordering = ('created_at', 'id')
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer_name', 'customer_phone', 'status', 'total_price', 'created_at', 'payment_status')
-    list_filter = ('status', 'payment_status', 'created_at')
-    search_fields = ('customer_name', 'customer_phone', 'customer_address', 'payment_intent_id')
+    list_display = ('id', 'customer_name', 'customer_phone', 'status', 'item_count', 'total_price', 'created_at', 'scheduled_for', 'payment_status')
+    # กรองตามครัวก่อน -> ใช้ index (kitchen, status, created_at) / (kitchen, created_at)
+    list_filter = ('kitchen', 'status', 'payment_status', 'created_at')
+    # ค้นหาเฉพาะแบบที่ใช้ index ได้ (ดู get_search_results), ที่อยู่/ชื่อต้องพิมพ์ prefix เอง
+    search_fields = ('customer_phone', 'payment_intent_id')
+    search_help_text = (
+        "Order ID, phone number (prefix) or payment intent ID. "
+        "Use 'address: ...' or 'name: ...' to search those fields (slower)."
+    )
     list_editable = ('status',)
-    inlines = [OrderItemInline]
-    readonly_fields = ('customer_name', 'customer_phone', 'customer_address', 'total_price', 'created_at', 'payment_slip_thumbnail')
+    inlines = [OrderItemInline, OrderEventInline]
+    readonly_fields = (
+        'kitchen', 'customer_name', 'customer_phone', 'customer_address', 'total_price', 'discount_total', 'applied_promotions',
+        'item_count', 'created_at', 'time_slot', 'scheduled_for', 'payment_slip_thumbnail',
+    )
+
+    # ตารางออเดอร์โตขึ้นทุกวัน: ไม่นับจำนวนเต็ม, drill-down ตามวันที่ด้วย range query (index created_at)
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Order ไม่มี FK ที่แสดงในตาราง -> ไม่ต้อง join อะไรเพิ่ม
+    list_select_related = ()
+    # คอลัมน์ใหญ่ที่หน้า list ไม่ได้ใช้
+    changelist_deferred_fields = ('customer_address', 'items_summary', 'applied_promotions', 'payment_slip')
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if match is None or not match.url_name.endswith('_changelist'):
+            return queryset
+        queryset = queryset.defer(*self.changelist_deferred_fields)
+        return RangeDrilldownQuerySet(model=queryset.model, query=queryset.query, using=queryset._db, hints=queryset._hints)
+
+    def save_model(self, request, obj, form, change):
+        # แก้สถานะจากหน้า admin (รวม list_editable) ต้องลง OrderEvent ด้วย
+        previous = Order.objects.filter(pk=obj.pk).values_list('status', 'payment_status').first() if change else None
+        super().save_model(request, obj, form, change)
+        if previous:
+            record_transition(obj, *previous, source='admin')
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        field, _, value = term.partition(':')
+        if value.strip() and field.strip().lower() in ('address', 'name'):
+            lookup = 'customer_address__icontains' if field.strip().lower() == 'address' else 'customer_name__icontains'
+            return queryset.filter(**{lookup: value.strip()}), False
+
+        # id (primary key), payment_intent_id (unique index), เบอร์โทร (prefix index)
+        condition = Q(payment_intent_id=term)
+        order_id = term.lstrip('#')
+        if order_id.isdigit() and len(order_id) <= 18:
+            condition |= Q(id=int(order_id))
+        phone = normalize_phone(term)
+        # เบอร์ไทยขึ้นต้นด้วย 0 เสมอ: '+66 89-9' (ยังพิมพ์ไม่ครบ) -> '0899'
+        if phone.startswith('66'):
+            phone = '0' + phone[2:]
+        if len(phone) >= 3:
+            condition |= Q(customer_phone__startswith=phone)
+        return queryset.filter(condition), False
 
     def payment_slip_thumbnail(self, obj):
         if obj.payment_slip:
@@ -27,12 +104,104 @@ class OrderAdmin(admin.ModelAdmin):
         return "No Slip"
     payment_slip_thumbnail.short_description = 'Payment Slip'
 
+class MenuImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or a JSON list of objects.")
+    dry_run = forms.BooleanField(required=False, initial=True, help_text="Only report what would change.")
+    replace_images = forms.BooleanField(required=False, help_text="Upload images even for items that already have one.")
+    kitchen = forms.ModelChoiceField(
+        Kitchen.objects.filter(is_active=True), required=False, empty_label="Main kitchen",
+        help_text="Rows are matched against (and created in) this kitchen's menu.",
+    )
+
+class AvailabilityWindowInline(admin.TabularInline):
+    # ไม่มี window = ขายตลอด (ตาม is_available), window ของเมนูใช้แทน window ของหมวด
+    model = AvailabilityWindow
+    extra = 0
+    fields = ('days_of_week', 'start_time', 'end_time')
+
 @admin.register(MenuItem)
 class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'is_available', 'category')
+    list_display = ('name', 'price', 'is_available', 'category', 'kitchen')
+    list_select_related = ('category', 'kitchen')
     list_editable = ('is_available',)
-    list_filter = ('category',)
+    list_filter = ('kitchen', 'category')
+    inlines = [AvailabilityWindowInline]
+    # แก้เมนูทีละหลายรายการ: export -> แก้ใน spreadsheet -> import (menu/importer.py)
+    change_list_template = 'admin/menu/menuitem/change_list.html'
+    actions = ['export_as_csv']
+
+    @admin.action(description="Export selected items as CSV")
+    def export_as_csv(self, request, queryset):
+        response = HttpResponse(export_rows(queryset.select_related('category').order_by('id')), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="menu.csv"'
+        return response
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='menu_menuitem_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            raise PermissionDenied
+        form = MenuImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                rows = read_rows(upload.read(), filename=upload.name)
+            except ValueError as e:
+                rows = None
+                self.message_user(request, f"Could not read {upload.name}: {e}", messages.ERROR)
+            if rows is not None:
+                dry_run = form.cleaned_data['dry_run']
+                kitchen = form.cleaned_data['kitchen']
+                result = import_menu(
+                    rows, dry_run=dry_run, replace_images=form.cleaned_data['replace_images'],
+                    kitchen_id=kitchen.id if kitchen else None,
+                )
+                if result.errors:
+                    self.message_user(request, "Import aborted, nothing was written: " + "; ".join(result.errors[:20]), messages.ERROR)
+                elif dry_run:
+                    self.message_user(request, f"Dry run: would have {result}", messages.INFO)
+                else:
+                    self.message_user(request, f"Imported: {result}", messages.SUCCESS)
+                    return redirect('admin:menu_menuitem_changelist')
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta, 'form': form, 'title': "Import menu items"}
+        return TemplateResponse(request, 'admin/menu/menuitem/import.html', context)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'kitchen')
+    list_select_related = ('kitchen',)
+    list_filter = ('kitchen',)
+    inlines = [AvailabilityWindowInline]
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'is_active', 'priority', 'category', 'starts_at', 'ends_at')
+    list_select_related = ('category',)
+    list_editable = ('is_active', 'priority')
+    list_filter = ('kind', 'is_active')
+    filter_horizontal = ('menu_items',)
+    fieldsets = (
+        (None, {'fields': ('name', 'kind', 'is_active', 'priority')}),
+        ('Applies to (empty = whole menu)', {'fields': ('menu_items', 'category')}),
+        ('Discount', {'fields': ('percent', 'buy_quantity', 'free_quantity', 'bundle_price')}),
+        ('When', {'fields': ('starts_at', 'ends_at', 'days_of_week', 'start_time', 'end_time')}),
+    )
+
+@admin.register(TimeSlot)
+class TimeSlotAdmin(admin.ModelAdmin):
+    list_display = ('starts_at', 'ends_at', 'kitchen', 'capacity', 'booked')
+    list_select_related = ('kitchen',)
+    list_filter = ('kitchen',)
+    # ปรับความจุตามจำนวนคนในครัววันนั้น (ต่ำกว่าที่จองไปแล้วไม่ได้ ดู TimeSlot.clean)
+    list_editable = ('capacity',)
+    readonly_fields = ('booked',)
+    date_hierarchy = 'starts_at'
+
+@admin.register(Kitchen)
+class KitchenAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'telegram_chat_id', 'is_active')
+    list_editable = ('is_active',)
+    prepopulated_fields = {'slug': ('name',)}
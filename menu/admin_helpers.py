@@ -0,0 +1,87 @@
+# menu/admin_helpers.py
+
+import calendar
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+# =======================================================
+#           ADMIN CHANGELIST HELPERS (ตารางใหญ่)
+# =======================================================
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) ของตารางใหญ่ช้า (PostgreSQL ต้องอ่านทั้งตาราง) จึง:
+    - ไม่มี filter/search: ใช้ค่าประมาณจาก pg_class.reltuples (อัปเดตตอน VACUUM/ANALYZE)
+    - มี filter: นับจริงแต่ไม่เกิน max_count แถว (แสดงได้ max_count / list_per_page หน้า)
+    """
+
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimated_rows(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset[:self.max_count].count()
+
+    def _estimated_rows(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 = ตารางยังไม่เคยถูก ANALYZE
+        if not row or row[0] < 0:
+            return None
+        return row[0]
+
+
+class RangeDrilldownQuerySet(models.QuerySet):
+    """
+    date_hierarchy ของ admin สร้างลิงก์ปี/เดือน/วันด้วย queryset.datetimes()
+    = DISTINCT DATE_TRUNC(...) ทุกแถว (อ่านทั้ง index/ตาราง)
+    ที่นี่เปลี่ยนเป็นเช็คทีละช่วง: EXISTS(created_at >= ต้นช่วง AND < ต้นช่วงถัดไป) ใช้ index แบบ range
+    (ปี: ไล่จาก MIN..MAX, เดือน: 12 ช่วง, วัน: ไม่เกิน 31 ช่วง)
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day') or order != 'ASC' or tzinfo is not None:
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        bounds = self.aggregate(first=models.Min(field_name), last=models.Max(field_name))
+        if bounds['first'] is None:
+            return []
+        first = timezone.localtime(bounds['first'])
+        last = timezone.localtime(bounds['last'])
+        # admin ขอระดับเดือน/วันเฉพาะตอนที่ข้อมูลอยู่ในปี/เดือนเดียวกัน กรณีอื่นใช้วิธีเดิม
+        if (kind == 'month' and first.year != last.year) or (
+            kind == 'day' and (first.year, first.month) != (last.year, last.month)
+        ):
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        if kind == 'year':
+            starts = [datetime(year, 1, 1) for year in range(first.year, last.year + 2)]
+        elif kind == 'month':
+            starts = [datetime(first.year, month, 1) for month in range(1, 13)] + [datetime(first.year + 1, 1, 1)]
+        else:
+            days = calendar.monthrange(first.year, first.month)[1]
+            starts = [datetime(first.year, first.month, day) for day in range(1, days + 1)]
+            starts.append(datetime(first.year + (first.month == 12), first.month % 12 + 1, 1))
+        starts = [timezone.make_aware(start) for start in starts]
+
+        return [
+            start for start, end in zip(starts, starts[1:])
+            if first <= end and start <= last
+            and self.filter(**{f"{field_name}__gte": start, f"{field_name}__lt": end}).exists()
+        ]
@@ -0,0 +1,60 @@
+# menu/async_views.py
+
+from django.db.models import aprefetch_related_objects
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .cache import aget_menu_items, filter_menu_items
+from .kitchens import akitchen_id_for
+from .models import Kitchen, Order
+from .serializers import OrderStatusSerializer
+
+# =======================================================
+#           ASYNC (ASGI-NATIVE) PUBLIC READ VIEWS
+# =======================================================
+# เวอร์ชัน async ของ endpoint ที่ลูกค้า poll บ่อยที่สุด ใช้ async ORM ของ Django
+# ใช้เมื่อรันผ่าน kitsu_backend/asgi.py (KITSU_ASGI=1 ดู menu/urls.py และ gunicorn.conf.py)
+# client ที่ช้าจะไม่กิน worker ทั้งตัวเหมือน sync view
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+async def menu_item_list(request):
+    try:
+        kitchen_id = await akitchen_id_for(request.GET.get('kitchen'))
+    except Kitchen.DoesNotExist:
+        return json_response({'detail': 'Kitchen not found'}, status=404)
+    items = await aget_menu_items(kitchen_id=kitchen_id)
+    return json_response(filter_menu_items(items, request.GET.get('category')))
+
+
+@require_GET
+async def order_status(request, id):
+    try:
+        order = await Order.objects.aget(id=id)
+    except Order.DoesNotExist:
+        return json_response({'detail': 'No Order matches the given query.'}, status=404)
+    # ปกติรายการอาหารอยู่ใน order.items_summary แล้ว
+    # ออเดอร์เก่าที่ยังไม่ได้ backfill: prefetch ก่อน ไม่ให้ serializer ไป query แบบ sync
+    if not order.items_summary:
+        await aprefetch_related_objects([order], 'items')
+    return json_response(OrderStatusSerializer(order).data)
+
+
+@require_GET
+async def payment_status(request, payment_intent_id):
+    try:
+        order = await Order.objects.only('id', 'payment_status', 'status').aget(
+            payment_intent_id=payment_intent_id
+        )
+    except Order.DoesNotExist:
+        return json_response({'error': 'Order not found'}, status=404)
+
+    return json_response({
+        'order_id': order.id,
+        'payment_status': order.payment_status,
+        'order_status': order.status,
+    })
@@ -0,0 +1,132 @@
+# menu/availability.py
+
+from array import array
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AvailabilityWindow, MenuItem
+
+# =======================================================
+#           TIME-OF-DAY AVAILABILITY (weekly index)
+# =======================================================
+# - AvailabilityWindow ของแต่ละครัวถูกคอมไพล์เป็น ScheduleIndex ครั้งเดียวต่อเวอร์ชันเมนูของครัวนั้น (cache.get_schedule)
+# - สัปดาห์ถูกแบ่งเป็นช่วง (segment) ที่ขอบคือเวลาเริ่ม/จบของ window ทุกตัว
+#   แต่ละ segment มีชุด id เมนูที่ "ปิดตามเวลา" อยู่ -> ตอบ "ขายอยู่ไหมตอนนี้" ด้วย lookup ใน array + set (O(1))
+# - segment ที่ปิดเมนูชุดเดียวกันใช้เลขเดียวกัน -> payload เมนูที่ cache ไว้ใช้ key ตามเลข segment
+#   (menu/cache.py) ข้ามขอบเวลาแล้วได้ payload ใหม่เอง โดยไม่ต้อง bump เวอร์ชัน
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def minute_of_week(now):
+    local = timezone.localtime(now)
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def _window_intervals(days, start_time, end_time):
+    """window หนึ่งตัว -> ช่วง [start, end) เป็นนาทีของสัปดาห์ (ช่วงที่ข้ามเที่ยงคืน / สิ้นสัปดาห์ถูกแบ่งเป็นสองช่วง)"""
+    start = start_time.hour * 60 + start_time.minute
+    end = end_time.hour * 60 + end_time.minute
+    length = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+    for day in days:
+        begin = day * MINUTES_PER_DAY + start
+        finish = begin + length
+        if finish <= MINUTES_PER_WEEK:
+            yield begin, finish
+        else:
+            yield begin, MINUTES_PER_WEEK
+            yield 0, finish - MINUTES_PER_WEEK
+
+
+class ScheduleIndex:
+    def __init__(self, intervals_by_item=None):
+        """intervals_by_item = {menu_item_id: [(start, end) นาทีของสัปดาห์]} ของเมนูที่มีตารางเวลา"""
+        intervals_by_item = intervals_by_item or {}
+        boundaries = sorted({0, MINUTES_PER_WEEK} | {
+            point for intervals in intervals_by_item.values() for interval in intervals for point in interval
+        })
+
+        self.hidden = []
+        segment_ids = {}
+        # นาทีของสัปดาห์ -> เลข segment (10080 ช่อง)
+        self.segments = array('H', bytes(2 * MINUTES_PER_WEEK))
+        for start, end in zip(boundaries, boundaries[1:]):
+            hidden = frozenset(
+                item_id
+                for item_id, intervals in intervals_by_item.items()
+                if not any(begin <= start < finish for begin, finish in intervals)
+            )
+            if hidden not in segment_ids:
+                segment_ids[hidden] = len(self.hidden)
+                self.hidden.append(hidden)
+            self.segments[start:end] = array('H', [segment_ids[hidden]]) * (end - start)
+
+    def segment_at(self, now):
+        return self.segments[minute_of_week(now)]
+
+    def hidden_at(self, now):
+        return self.hidden[self.segment_at(now)]
+
+    def is_available(self, item_id, now):
+        """ตามตารางเวลาเท่านั้น (ไม่รวม MenuItem.is_available)"""
+        return item_id not in self.hidden_at(now)
+
+    def visible(self, items, segment):
+        """payload เมนู (list ของ dict) -> เฉพาะที่ขายอยู่ใน segment นี้"""
+        hidden = self.hidden[segment]
+        if not hidden:
+            return items
+        return [item for item in items if item['id'] not in hidden]
+
+
+def build_schedule(windows, item_categories):
+    """
+    windows = [(menu_item_id, category_id, days_of_week, start_time, end_time)]
+    item_categories = {menu_item_id: category_id} ของเมนูในหมวดที่มี window
+    """
+    item_intervals = defaultdict(list)
+    category_intervals = defaultdict(list)
+    for menu_item_id, category_id, days_of_week, start_time, end_time in windows:
+        days = [int(day) for day in days_of_week] if days_of_week else range(7)
+        intervals = list(_window_intervals(days, start_time, end_time))
+        if menu_item_id is not None:
+            item_intervals[menu_item_id].extend(intervals)
+        else:
+            category_intervals[category_id].extend(intervals)
+
+    # window ของเมนูเองใช้แทน window ของหมวด
+    for menu_item_id, category_id in item_categories.items():
+        if menu_item_id not in item_intervals and category_id in category_intervals:
+            item_intervals[menu_item_id] = category_intervals[category_id]
+    return ScheduleIndex(item_intervals)
+
+
+_WINDOW_FIELDS = ('menu_item_id', 'category_id', 'days_of_week', 'start_time', 'end_time')
+
+
+def _kitchen_windows(kitchen_id):
+    return AvailabilityWindow.objects.filter(
+        Q(menu_item__kitchen_id=kitchen_id) | Q(category__kitchen_id=kitchen_id)
+    ).values_list(*_WINDOW_FIELDS)
+
+
+def compile_schedule(kitchen_id):
+    windows = list(_kitchen_windows(kitchen_id))
+    categories = {category_id for menu_item_id, category_id, *_ in windows if category_id is not None}
+    item_categories = dict(
+        MenuItem.objects.filter(category_id__in=categories).values_list('id', 'category_id')
+    ) if categories else {}
+    return build_schedule(windows, item_categories)
+
+
+async def acompile_schedule(kitchen_id):
+    windows = [window async for window in _kitchen_windows(kitchen_id)]
+    categories = {category_id for menu_item_id, category_id, *_ in windows if category_id is not None}
+    item_categories = {}
+    if categories:
+        async for menu_item_id, category_id in MenuItem.objects.filter(category_id__in=categories).values_list('id', 'category_id'):
+            item_categories[menu_item_id] = category_id
+    return build_schedule(windows, item_categories)
@@ -0,0 +1,139 @@
+# menu/bot.py
+
+import hashlib
+import hmac
+from datetime import datetime
+from html import escape
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Order
+from .serializers import OrderStatusSerializer
+from .services import lookup_token
+
+# =======================================================
+#           CUSTOMER TELEGRAM BOT (inbound webhook)
+# =======================================================
+# - หลังสั่งอาหาร ลูกค้ากดลิงก์ t.me/<bot>?start=<order token> -> bot ได้ "/start <token>"
+#   -> ผูก chat id กับออเดอร์ แล้วสถานะถัดไปถูก push ผ่าน send_customer_telegram_notification (ไม่ต้อง reload หน้า tracker)
+# - "/status" -> ออเดอร์ที่ยังไม่จบของ chat นี้ (query เดียวผ่าน index order_chat_created_idx)
+# - "/orders" -> ลิงก์ประวัติออเดอร์ทั้งหมดของ chat นี้ พร้อม lookup token ของ chat id (/api/orders/lookup/?chat_id=&token=)
+#   ข้อความมาจาก chat นั้นจริง (Telegram ยืนยันด้วย secret ของ webhook) -> ออก token ให้ได้ ไม่ต้อง login
+# - ตอบกลับใน response ของ webhook เลย (Telegram รับ {"method": "sendMessage", ...} เป็น body)
+#   -> ไม่มี request ขาออกเพิ่ม
+# token = "<order id>-<HMAC ของ id>" ใช้ได้แค่ผูกกับออเดอร์นั้น เดา id ของคนอื่นไม่ได้
+
+TOKEN_DIGEST_LENGTH = 20
+FINAL_STATUSES = ('COMPLETED', 'CANCELLED')
+STATUS_LIMIT = 5
+# เฉพาะคอลัมน์ที่ OrderStatusSerializer ใช้ (รายการอาหารอ่านจาก items_summary)
+STATUS_FIELDS = ('id', 'status', 'payment_status', 'created_at', 'scheduled_for', 'total_price', 'discount_total', 'items_summary')
+
+STATUS_LABELS = {
+    'AWAITING_PAYMENT': "⏳ รอชำระเงิน",
+    'PENDING': "⏳ รอยืนยัน",
+    'PREPARING': "🍳 กำลังเตรียมอาหาร",
+    'DELIVERING': "🛵 กำลังจัดส่ง",
+    'COMPLETED': "✅ จัดส่งสำเร็จ",
+    'CANCELLED': "❌ ยกเลิกแล้ว",
+}
+
+
+def _digest(order_id):
+    message = f"telegram-start:{order_id}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:TOKEN_DIGEST_LENGTH]
+
+
+def order_token(order_id):
+    # Telegram รับ start parameter ได้แค่ A-Z a-z 0-9 _ - ไม่เกิน 64 ตัว
+    return f"{order_id}-{_digest(order_id)}"
+
+
+def parse_order_token(token):
+    """token -> order id หรือ None ถ้ารูปแบบผิด / ลายเซ็นไม่ตรง"""
+    order_id, _, digest = (token or '').partition('-')
+    if not order_id.isdigit() or not hmac.compare_digest(digest, _digest(int(order_id))):
+        return None
+    return int(order_id)
+
+
+def start_link(order_id):
+    """ลิงก์เปิด bot พร้อม token ของออเดอร์ (None ถ้าไม่ได้ตั้ง TELEGRAM_BOT_USERNAME)"""
+    username = getattr(settings, 'TELEGRAM_BOT_USERNAME', '')
+    if not username:
+        return None
+    return f"https://t.me/{username}?start={order_token(order_id)}"
+
+
+def format_order(data):
+    """ข้อมูลจาก OrderStatusSerializer -> ข้อความสั้นๆ ของออเดอร์หนึ่ง"""
+    lines = [f"<b>Order #{data['id']}</b> {STATUS_LABELS.get(data['status'], data['status'])}"]
+    lines += [f"- {item['name']} x{item['quantity']}" for item in data['items']]
+    if data['scheduled_for']:
+        scheduled_for = timezone.localtime(datetime.fromisoformat(data['scheduled_for']))
+        lines.append(f"🕒 {scheduled_for:%d/%m %H:%M}")
+    lines.append(f"💰 ฿{data['total_price']}")
+    return "\n".join(lines)
+
+
+def status_text(chat_id):
+    orders = (
+        Order.objects.filter(customer_telegram_chat_id=str(chat_id))
+        .exclude(status__in=FINAL_STATUSES)
+        .only(*STATUS_FIELDS)
+        .order_by('-created_at')[:STATUS_LIMIT]
+    )
+    data = OrderStatusSerializer(orders, many=True).data
+    if not data:
+        return "ไม่มีออเดอร์ที่กำลังดำเนินการอยู่ครับ"
+    return "\n\n".join(format_order(order) for order in data)
+
+
+def link_order(chat_id, token):
+    """ผูก chat กับออเดอร์ของ token -> ข้อความตอบกลับ"""
+    order_id = parse_order_token(token)
+    if order_id is None or not Order.objects.filter(id=order_id).update(customer_telegram_chat_id=str(chat_id)):
+        return "ลิงก์นี้ไม่ถูกต้องหรือหมดอายุแล้วครับ"
+    order = Order.objects.only(*STATUS_FIELDS).get(id=order_id)
+    return (
+        "🔔 เชื่อมต่อแล้ว! เราจะแจ้งสถานะออเดอร์นี้ทาง Telegram ครับ\n\n"
+        + format_order(OrderStatusSerializer(order).data)
+        + "\n\nพิมพ์ /status เพื่อดูออเดอร์ที่กำลังดำเนินการ หรือ /orders เพื่อดูประวัติทั้งหมด"
+    )
+
+
+def history_link(chat_id, base_url):
+    """ลิงก์ประวัติออเดอร์ของ chat (base_url = หน้า frontend ORDER_HISTORY_URL หรือ URL ของ /api/orders/lookup/)"""
+    query = urlencode({'chat_id': chat_id, 'token': lookup_token(chat_id=chat_id)})
+    return f"{base_url}{'&' if '?' in base_url else '?'}{query}"
+
+
+def history_text(chat_id, base_url):
+    return f"📜 ประวัติออเดอร์ทั้งหมดของคุณ: <a href=\"{escape(history_link(chat_id, base_url))}\">เปิดดู</a>"
+
+
+def handle_update(update, history_url=''):
+    """
+    update จาก Telegram -> body ของ response ({"method": "sendMessage", ...}) หรือ None ถ้าไม่ต้องตอบ
+    สนใจเฉพาะข้อความในแชทส่วนตัว, history_url = base ของลิงก์ที่ตอบ /orders
+    """
+    message = update.get('message') if isinstance(update, dict) else None
+    if not isinstance(message, dict) or (message.get('chat') or {}).get('type') != 'private':
+        return None
+    chat_id = message['chat'].get('id')
+    command, _, argument = (message.get('text') or '').strip().partition(' ')
+    command = command.split('@')[0]
+
+    if command == '/start' and argument.strip():
+        text = link_order(chat_id, argument.strip())
+    elif command == '/status':
+        text = status_text(chat_id)
+    elif command == '/orders' and history_url:
+        text = history_text(chat_id, history_url)
+    elif command == '/start':
+        text = "สวัสดีครับ 🍱 กดลิงก์ Telegram จากหน้าสั่งอาหารเพื่อรับแจ้งสถานะ หรือพิมพ์ /status, /orders"
+    else:
+        return None
+    return {'method': 'sendMessage', 'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}
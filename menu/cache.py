@@ -0,0 +1,223 @@
+# menu/cache.py
+
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .availability import acompile_schedule, compile_schedule
+from .kitchens import active_kitchen_ids, akitchen_id_for, kitchen_id_for
+from .models import MenuItem
+from .serializers import MenuItemSerializer
+
+# =======================================================
+#               MENU VERSION (shared)
+# =======================================================
+# เก็บ "เวอร์ชันของเมนู" ของแต่ละครัวไว้ใน Django cache
+# ทุกครั้งที่ MenuItem / Category เปลี่ยน (ดู menu/signals.py) เราจะ bump เวอร์ชันของครัวนั้น
+# ถ้าใช้ shared cache (เช่น Redis) ทุก worker จะเห็นเวอร์ชันเดียวกัน
+# kitchen_id=None ในทุกฟังก์ชันของไฟล์นี้ = ครัวหลัก
+
+MENU_VERSION_KEY = 'menu:version:{kitchen_id}'
+
+
+def menu_version(kitchen_id=None):
+    key = MENU_VERSION_KEY.format(kitchen_id=kitchen_id or kitchen_id_for())
+    version = cache.get(key)
+    if version is None:
+        # ใช้เวลาปัจจุบันเป็นค่าเริ่มต้น กันไม่ให้เวอร์ชันชนกับของเก่าหลัง cache ถูกล้าง
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def amenu_version(kitchen_id=None):
+    key = MENU_VERSION_KEY.format(kitchen_id=kitchen_id or await akitchen_id_for())
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_menu_version(kitchen_id=None):
+    """bump เวอร์ชันของครัวเดียว หรือทุกครัวถ้าไม่ระบุ (เช่น โปรโมชันที่ใช้ได้ทุกครัว)"""
+    for kitchen in [kitchen_id] if kitchen_id else active_kitchen_ids():
+        try:
+            cache.incr(MENU_VERSION_KEY.format(kitchen_id=kitchen))
+        except ValueError:
+            # key หายไปจาก cache (เช่น ถูก evict) -> เริ่มเวอร์ชันใหม่
+            menu_version(kitchen)
+
+
+# =======================================================
+#               PROCESS-LOCAL PAYLOAD CACHE
+# =======================================================
+# payload ที่ build แล้ว (เช่น list เมนูที่ serialize แล้ว) เก็บไว้ใน memory ของ process
+# ใช้ได้ตราบที่เวอร์ชันยังตรงกันและยังไม่หมดอายุ (MENU_CACHE_TTL วินาที)
+# TTL เป็นตัวกันกรณีที่ใช้ LocMemCache แล้ว worker อื่นไม่เห็นการ bump
+# ชื่อ payload ขึ้นต้นด้วย id ครัว ('<kitchen_id>:items') -> bump ครัวหนึ่งไม่ทำให้ cache ของครัวอื่นหลุด
+
+_payloads = {}
+
+
+def _cached_payload(name, version):
+    entry = _payloads.get(name)
+    if entry is not None:
+        cached_version, expires_at, payload = entry
+        if cached_version == version and expires_at > time.monotonic():
+            return payload
+    return None
+
+
+def _store_payload(name, version, payload):
+    ttl = getattr(settings, 'MENU_CACHE_TTL', 60)
+    _payloads[name] = (version, time.monotonic() + ttl, payload)
+    return payload
+
+
+def get_menu_payload(name, builder, version=None, kitchen_id=None):
+    # version: ส่งมาได้ถ้าอ่านไว้แล้วใน request นี้ (หลาย payload ต่อ request อ่าน cache ครั้งเดียว)
+    kitchen_id = kitchen_id or kitchen_id_for()
+    version = menu_version(kitchen_id) if version is None else version
+    name = f'{kitchen_id}:{name}'
+    payload = _cached_payload(name, version)
+    if payload is None:
+        payload = _store_payload(name, version, builder())
+    return payload
+
+
+async def aget_menu_payload(name, abuilder, version=None, kitchen_id=None):
+    kitchen_id = kitchen_id or await akitchen_id_for()
+    version = await amenu_version(kitchen_id) if version is None else version
+    name = f'{kitchen_id}:{name}'
+    payload = _cached_payload(name, version)
+    if payload is None:
+        payload = _store_payload(name, version, await abuilder())
+    return payload
+
+
+def clear_menu_payloads():
+    _payloads.clear()
+
+
+# =======================================================
+#               AVAILABILITY SCHEDULE
+# =======================================================
+
+def get_schedule(version=None, kitchen_id=None):
+    kitchen_id = kitchen_id or kitchen_id_for()
+    return get_menu_payload('schedule', lambda: compile_schedule(kitchen_id), version, kitchen_id)
+
+
+def _current_segment(version, now=None, kitchen_id=None):
+    schedule = get_schedule(version, kitchen_id)
+    return schedule, schedule.segment_at(now or timezone.now())
+
+
+# =======================================================
+#               MENU PAYLOADS
+# =======================================================
+
+def _menu_queryset(kitchen_id):
+    # select_related('category') -> query เดียว ไม่ต้องยิงซ้ำตอนหา category_name
+    # (kitchen_id, is_available) ตรงกับ index menuitem_kitchen_avail_idx
+    return (
+        MenuItem.objects.filter(kitchen_id=kitchen_id, is_available=True)
+        .select_related('category')
+        .order_by('id')
+    )
+
+
+def build_menu_items(kitchen_id=None):
+    return list(MenuItemSerializer(_menu_queryset(kitchen_id or kitchen_id_for()), many=True).data)
+
+
+def get_menu_items(now=None, kitchen_id=None):
+    # payload ต่อ segment ของตารางเวลา (menu/availability.py): ข้ามขอบเวลา (เช่น หมดเวลาอาหารเช้า) -> key ใหม่
+    kitchen_id = kitchen_id or kitchen_id_for()
+    version = menu_version(kitchen_id)
+    schedule, segment = _current_segment(version, now, kitchen_id)
+    return get_menu_payload(
+        f'items:{segment}',
+        lambda: schedule.visible(
+            get_menu_payload('items', lambda: build_menu_items(kitchen_id), version, kitchen_id), segment
+        ),
+        version,
+        kitchen_id,
+    )
+
+
+async def abuild_menu_items(kitchen_id):
+    items = [item async for item in _menu_queryset(kitchen_id)]
+    return list(MenuItemSerializer(items, many=True).data)
+
+
+async def aget_menu_items(now=None, kitchen_id=None):
+    # ใช้ payload ชุดเดียวกับ get_menu_items() (key 'items', 'items:<segment>') ทั้ง sync และ async view
+    kitchen_id = kitchen_id or await akitchen_id_for()
+    version = await amenu_version(kitchen_id)
+    schedule = await aget_menu_payload('schedule', lambda: acompile_schedule(kitchen_id), version, kitchen_id)
+    segment = schedule.segment_at(now or timezone.now())
+    name = f'{kitchen_id}:items:{segment}'
+    payload = _cached_payload(name, version)
+    if payload is None:
+        items = await aget_menu_payload('items', lambda: abuild_menu_items(kitchen_id), version, kitchen_id)
+        payload = _store_payload(name, version, schedule.visible(items, segment))
+    return payload
+
+
+def filter_menu_items(items, category):
+    # ?category=<id> ให้ client ดึงเฉพาะหมวดที่จะแสดง
+    if not category:
+        return items
+    return [item for item in items if str(item['category_id']) == category]
+
+
+def build_menu_grouped(now=None, kitchen_id=None):
+    groups = {}
+    for item in get_menu_items(now, kitchen_id):
+        key = item['category_id']
+        if key not in groups:
+            groups[key] = {'id': key, 'name': item['category_name'], 'items': []}
+        groups[key]['items'].append(item)
+    # เรียงตามชื่อหมวดหมู่ เมนูที่ไม่มีหมวดหมู่ไว้ท้ายสุด
+    return sorted(groups.values(), key=lambda group: (group['id'] is None, group['name'] or ''))
+
+
+def get_menu_grouped(now=None, kitchen_id=None):
+    kitchen_id = kitchen_id or kitchen_id_for()
+    version = menu_version(kitchen_id)
+    _, segment = _current_segment(version, now, kitchen_id)
+    return get_menu_payload(f'grouped:{segment}', lambda: build_menu_grouped(now, kitchen_id), version, kitchen_id)
+
+
+# =======================================================
+#               PRICE TABLE (cart quote)
+# =======================================================
+# {menu_item_id: MenuPrice} ของทุกเมนูในครัว (รวมที่ปิดขายอยู่ เพื่อบอก client ได้ว่า "หมด" ไม่ใช่ "ไม่มี")
+# /api/orders/quote/ อ่านจากตารางนี้อย่างเดียว: ต่อ request มีแค่การเช็คเวอร์ชันใน cache ไม่แตะ DB
+
+MenuPrice = namedtuple('MenuPrice', ['name', 'price', 'category_id', 'is_available'])
+
+
+def build_price_table(kitchen_id=None):
+    rows = MenuItem.objects.filter(kitchen_id=kitchen_id or kitchen_id_for()).values_list(
+        'id', 'name', 'price', 'category_id', 'is_available'
+    )
+    return {item_id: MenuPrice(*fields) for item_id, *fields in rows}
+
+
+def get_price_table(version=None, kitchen_id=None):
+    kitchen_id = kitchen_id or kitchen_id_for()
+    return get_menu_payload('prices', lambda: build_price_table(kitchen_id), version, kitchen_id)
+
+
+def get_orderable_menu(now=None, kitchen_id=None):
+    """(ตารางราคา, id เมนูที่ปิดตามตารางเวลาอยู่ตอนนี้) ของครัวหนึ่ง อ่านเวอร์ชันเมนูครั้งเดียว"""
+    kitchen_id = kitchen_id or kitchen_id_for()
+    version = menu_version(kitchen_id)
+    schedule, segment = _current_segment(version, now, kitchen_id)
+    return get_price_table(version, kitchen_id), schedule.hidden[segment]
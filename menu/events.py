@@ -0,0 +1,157 @@
+# menu/events.py
+
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import OrderEvent, OrderStageStat
+
+# =======================================================
+#           ORDER LIFECYCLE EVENTS & SLA METRICS
+# =======================================================
+# - ทุกครั้งที่ status / payment_status ของออเดอร์เปลี่ยน -> เพิ่ม OrderEvent 1 แถว
+# - ถ้าเป็นการออกจากช่วงที่เราวัด (SLA_STAGES) -> นับเวลาที่อยู่ในช่วงนั้นลง histogram รายชั่วโมง (OrderStageStat)
+# - stage_percentiles() รวม histogram ของชั่วโมงในช่วงที่ขอ แล้วประมาณ percentile จากขอบ bucket
+
+# (ชื่อ, สถานะเริ่ม, สถานะถัดไป)
+# ชำระเงินสำเร็จ = ครัวเริ่มทำทันที (webhook ตั้ง PREPARING เลย) ช่วงแรกจึงวัดจากตอนสั่งถึงตอนเริ่มทำ
+SLA_STAGES = [
+    ('pay_to_prep', 'AWAITING_PAYMENT', 'PREPARING'),
+    ('prep_to_delivery', 'PREPARING', 'DELIVERING'),
+    ('delivery_to_complete', 'DELIVERING', 'COMPLETED'),
+]
+
+# ขอบบนของแต่ละ bucket (วินาที) ช่วงสุดท้ายคือ "มากกว่า 1 วัน"
+BUCKET_BOUNDS = [
+    30, 60, 120, 180, 300, 420, 600, 900, 1200, 1500, 1800, 2400,
+    3600, 5400, 7200, 10800, 21600, 43200, 86400,
+]
+
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+}
+
+_stage_by_transition = {(start, end): name for name, start, end in SLA_STAGES}
+
+
+def bucket_for(seconds):
+    return bisect_right(BUCKET_BOUNDS, seconds)
+
+
+def _entered_at(order, status):
+    """เวลาที่ออเดอร์เข้าสู่ status นี้ครั้งล่าสุด (ออเดอร์เก่าที่ไม่มี event ใช้ created_at / paid_at)"""
+    entered = (
+        OrderEvent.objects.filter(order=order, to_status=status)
+        .exclude(from_status=status)
+        .order_by('-created_at', '-id')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+    if entered is not None:
+        return entered
+    if status == 'AWAITING_PAYMENT':
+        return order.created_at
+    if status == 'PREPARING':
+        return order.paid_at
+    return None
+
+
+def _add_to_histogram(stage, seconds, now):
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    bucket = bucket_for(seconds)
+    lookup = {'stage': stage, 'hour': hour, 'bucket': bucket}
+    increment = {'count': F('count') + 1, 'total_seconds': F('total_seconds') + seconds}
+
+    if OrderStageStat.objects.filter(**lookup).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            OrderStageStat.objects.create(count=1, total_seconds=seconds, **lookup)
+    except IntegrityError:
+        # อีก request สร้างแถวนี้ไปพร้อมกัน
+        OrderStageStat.objects.filter(**lookup).update(**increment)
+
+
+def record_transition(order, from_status, from_payment_status, source='system'):
+    """
+    เรียกหลัง order.save() ทุกครั้งที่อาจเปลี่ยนสถานะ
+    (from_status = '' สำหรับออเดอร์ที่เพิ่งสร้าง) คืน OrderEvent หรือ None ถ้าไม่มีอะไรเปลี่ยน
+    """
+    if from_status == order.status and from_payment_status == order.payment_status:
+        return None
+
+    now = timezone.now()
+    stage = _stage_by_transition.get((from_status, order.status))
+    if stage is not None:
+        entered = _entered_at(order, from_status)
+        if entered is not None:
+            _add_to_histogram(stage, max(0.0, (now - entered).total_seconds()), now)
+
+    return OrderEvent.objects.create(
+        order=order,
+        from_status=from_status or '',
+        to_status=order.status,
+        payment_status=order.payment_status,
+        source=source,
+        created_at=now,
+    )
+
+
+def percentile_from_histogram(counts, pct):
+    """counts = {bucket: จำนวน} -> ค่าประมาณ (วินาที) โดย interpolate เชิงเส้นภายใน bucket"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    target = total * pct / 100
+    seen = 0
+    for bucket in sorted(counts):
+        count = counts[bucket]
+        if seen + count >= target:
+            lower = BUCKET_BOUNDS[bucket - 1] if bucket > 0 else 0
+            if bucket >= len(BUCKET_BOUNDS):
+                # bucket สุดท้ายไม่มีขอบบน
+                return float(lower)
+            upper = BUCKET_BOUNDS[bucket]
+            return lower + (upper - lower) * ((target - seen) / count)
+        seen += count
+    return float(BUCKET_BOUNDS[-1])
+
+
+def stage_percentiles(window, now=None, percentiles=(50, 90, 99)):
+    """สรุปเวลาในแต่ละ stage ของ `window` (timedelta) ล่าสุด (ละเอียดระดับชั่วโมง)"""
+    now = now or timezone.now()
+    since = (now - window).replace(minute=0, second=0, microsecond=0)
+    rows = (
+        OrderStageStat.objects.filter(hour__gte=since)
+        .values('stage', 'bucket')
+        .annotate(count=Sum('count'), total=Sum('total_seconds'))
+    )
+
+    histograms = {name: {} for name, _, _ in SLA_STAGES}
+    totals = {name: 0.0 for name, _, _ in SLA_STAGES}
+    for row in rows:
+        if row['stage'] not in histograms:
+            continue
+        histograms[row['stage']][row['bucket']] = row['count']
+        totals[row['stage']] += row['total']
+
+    result = {}
+    for name, start, end in SLA_STAGES:
+        counts = histograms[name]
+        count = sum(counts.values())
+        summary = {
+            'from': start,
+            'to': end,
+            'count': count,
+            'mean_seconds': round(totals[name] / count, 1) if count else None,
+        }
+        for pct in percentiles:
+            value = percentile_from_histogram(counts, pct)
+            summary[f"p{pct}_seconds"] = round(value, 1) if value is not None else None
+        result[name] = summary
+    return result
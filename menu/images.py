@@ -0,0 +1,79 @@
+# menu/images.py
+
+import base64
+import io
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+# =======================================================
+#           RESPONSIVE IMAGE VARIANTS (MenuItem.image)
+# =======================================================
+# คำนวณครั้งเดียวตอนรูปเมนูเปลี่ยน (MenuItem.save) แล้วเก็บใน MenuItem.image_variants:
+#   src          URL กว้างสุดที่ใช้เป็นค่า default ของ <img src>
+#   srcset       "url 160w, url 320w, ..." ให้ browser เลือกขนาดที่พอดีกับจอ
+#   placeholder  รูปจิ๋ว (LQIP) แบบ data URI แสดงเบลอๆ ระหว่างโหลดรูปจริง
+# - ขนาดต่างๆ ใช้ transformation ของ Cloudinary (c_limit = ไม่ขยายเกินรูปต้นฉบับ, f_auto/q_auto = webp/avif ตาม browser)
+# - placeholder ทำด้วย Pillow จาก bytes ของไฟล์ที่ upload (ไม่ต้องยิง network)
+#   ถ้าไม่มีไฟล์ในมือ (เช่น backfill) ให้คนเรียกส่ง bytes ที่ดาวน์โหลดมาเอง
+
+PLACEHOLDER_WIDTH = 16
+
+
+def variant_widths():
+    return getattr(settings, 'MENU_IMAGE_WIDTHS', [160, 320, 480, 640, 960])
+
+
+def variant_url(resource, width):
+    return resource.build_url(width=width, crop='limit', fetch_format='auto', quality='auto', secure=True)
+
+
+def build_placeholder(source):
+    """bytes / file ของรูป -> data URI ของ JPEG กว้าง PLACEHOLDER_WIDTH px (ไม่กี่ร้อย bytes)"""
+    from PIL import Image, ImageOps
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+        tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='JPEG', quality=40, optimize=True)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_image_variants(resource, source=None):
+    """
+    resource = CloudinaryResource ของรูป (หลัง upload แล้ว), source = bytes / file ต้นฉบับ (ถ้ามี)
+    คืน dict สำหรับ MenuItem.image_variants ({} ถ้าไม่มีรูป)
+    """
+    if not resource or not getattr(resource, 'public_id', None):
+        return {}
+
+    widths = variant_widths()
+    variants = {
+        'public_id': resource.public_id,
+        'src': variant_url(resource, widths[-1]),
+        'srcset': ", ".join(f"{variant_url(resource, width)} {width}w" for width in widths),
+        'placeholder': '',
+    }
+    if source is not None:
+        from PIL import UnidentifiedImageError
+
+        try:
+            variants['placeholder'] = build_placeholder(source)
+        except (UnidentifiedImageError, OSError) as e:
+            # ไฟล์ที่ Pillow เปิด / อ่านไม่ได้ -> ไม่มี placeholder แต่ยังมี srcset (error อื่น = bug ให้หลุดออกไป)
+            print(f"WARNING: could not build image placeholder for {resource.public_id}: {e}")
+    return variants
+
+
+def is_upload(value):
+    return isinstance(value, UploadedFile)
@@ -0,0 +1,280 @@
+# menu/importer.py
+
+import csv
+import io
+import ipaddress
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .cache import bump_menu_version
+from .images import build_image_variants
+from .kitchens import kitchen_id_for
+from .models import Category, MenuItem
+
+# =======================================================
+#               BULK MENU IMPORT (CSV / JSON)
+# =======================================================
+# ใช้โดย manage.py import_menu และหน้า import ใน admin (MenuItemAdmin)
+# - import ทีละครัว: แถวจับคู่กับเมนูเดิมของครัวนั้นด้วย id (ถ้ามี) ไม่งั้นด้วยชื่อ -> เทียบทีละ field, แถวที่ไม่เปลี่ยนถูกข้าม
+# - เขียนด้วย bulk_create / bulk_update ทีละ batch ใน transaction เดียว
+#   (ไม่ผ่าน MenuItem.save() / signal -> bump เวอร์ชัน cache เมนูครั้งเดียวตอนจบ)
+# - รูป (URL หรือ path ของไฟล์) ถูก upload ขึ้น Cloudinary พร้อมกันหลาย thread ก่อนเปิด transaction
+#   path ในเครื่อง / http:// ใช้ได้เฉพาะจาก manage.py (allow_local_images=True)
+#   หน้า admin รับแค่ https:// ที่ไม่ชี้เข้า address ภายใน (กันอ่านไฟล์ในเครื่อง / SSRF ผ่านคอลัมน์ image)
+# - มีแถวไหนผิด -> ไม่เขียนอะไรเลย คืน error ทุกแถว
+
+FIELDS = ['id', 'name', 'description', 'price', 'category', 'is_available', 'image']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.images = 0
+        self.categories = 0
+        self.errors = []
+
+    def __str__(self):
+        return (
+            f"{self.created} created, {self.updated} updated, {self.unchanged} unchanged, "
+            f"{self.images} images uploaded, {self.categories} categories created"
+        )
+
+
+def read_rows(data, format=None, filename=''):
+    """bytes / str ของไฟล์ -> list ของ dict (CSV ต้องมี header, JSON เป็น list ของ object)"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    format = format or ('json' if filename.lower().endswith('.json') or data.lstrip().startswith('[') else 'csv')
+    if format == 'json':
+        rows = json.loads(data)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("JSON import must be a list of objects")
+        return rows
+    return list(csv.DictReader(io.StringIO(data)))
+
+
+def export_rows(menu_items):
+    """เมนู -> CSV (คอลัมน์เดียวกับที่ import รับ) ใช้แก้ใน spreadsheet แล้ว import กลับ"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=FIELDS)
+    writer.writeheader()
+    for item in menu_items:
+        writer.writerow({
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'price': f"{item.price:.2f}",
+            'category': item.category.name if item.category else '',
+            'is_available': 'true' if item.is_available else 'false',
+            'image': '',
+        })
+    return output.getvalue()
+
+
+def _text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _parse_row(row):
+    """dict จากไฟล์ -> dict ที่ตรวจแล้ว (ValueError ถ้าผิด), field ที่ไม่มีในไฟล์ = ไม่แก้"""
+    parsed = {}
+    if _text(row, 'id'):
+        try:
+            parsed['id'] = int(_text(row, 'id'))
+        except ValueError:
+            raise ValueError("id must be an integer")
+    name = _text(row, 'name')
+    if name:
+        if len(name) > MenuItem._meta.get_field('name').max_length:
+            raise ValueError("name is too long")
+        parsed['name'] = name
+    elif 'id' not in parsed:
+        raise ValueError("name or id is required")
+    if 'description' in row:
+        parsed['description'] = _text(row, 'description')
+    if _text(row, 'price'):
+        try:
+            price = Decimal(_text(row, 'price')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f"invalid price {row['price']!r}")
+        if price < 0 or price >= Decimal('10000'):
+            raise ValueError(f"price {price} out of range")
+        parsed['price'] = price
+    if 'category' in row:
+        parsed['category'] = _text(row, 'category')
+    if _text(row, 'is_available'):
+        flag = _text(row, 'is_available').lower()
+        if flag not in TRUE_VALUES | FALSE_VALUES:
+            raise ValueError(f"invalid is_available {row['is_available']!r}")
+        parsed['is_available'] = flag in TRUE_VALUES
+    if _text(row, 'image'):
+        parsed['image'] = _text(row, 'image')
+    return parsed
+
+
+def check_public_url(source):
+    """https:// URL ที่ host resolve ได้เป็น address สาธารณะเท่านั้น (ValueError ถ้าไม่ใช่)"""
+    parts = urlsplit(source)
+    if parts.scheme != 'https' or not parts.hostname:
+        raise ValueError("image must be an https:// URL")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror as e:
+        raise ValueError(f"cannot resolve {parts.hostname}: {e}")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError(f"image host {parts.hostname} is not a public address")
+
+
+def _read_image(source, allow_local=False):
+    if not allow_local:
+        check_public_url(source)
+    if source.startswith(('http://', 'https://')):
+        # import ตอนใช้งาน (เหมือน views.send_telegram_notification)
+        import requests
+
+        # ไม่ตาม redirect เมื่อมาจาก admin: redirect อาจพาไป address ภายในที่เช็คไว้ไม่ได้
+        response = requests.get(source, timeout=30, allow_redirects=allow_local)
+        if response.is_redirect:
+            raise ValueError(f"image URL redirects to {response.headers.get('Location')!r}, use the final URL")
+        response.raise_for_status()
+        return response.content
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def _upload_image(source, allow_local=False):
+    """อ่าน + upload รูปหนึ่งรูป (รันใน thread pool) -> (CloudinaryResource, image_variants)"""
+    from cloudinary import uploader
+
+    data = _read_image(source, allow_local)
+    resource = uploader.upload_resource(data, filename=os.path.basename(source.split('?')[0]) or 'menu-image')
+    return resource, build_image_variants(resource, source=data)
+
+
+def _apply_row(item, data):
+    """ใส่ค่าจากแถวลงเมนู คืนรายชื่อ field ที่เปลี่ยน ('category' เก็บชื่อไว้ใน item._import_category)"""
+    changed = [
+        field for field in ('name', 'description', 'price', 'is_available')
+        if field in data and getattr(item, field) != data[field]
+    ]
+    for field in changed:
+        setattr(item, field, data[field])
+    if 'category' in data:
+        current = item.category.name if item.category_id else ''
+        if data['category'] != current:
+            item._import_category = data['category']
+            changed.append('category')
+    return changed
+
+
+def import_menu(rows, dry_run=False, batch_size=200, workers=4, replace_images=False, kitchen_id=None, allow_local_images=False):
+    kitchen_id = kitchen_id or kitchen_id_for()
+    result = ImportResult()
+    parsed = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            parsed.append((number, _parse_row(row)))
+        except ValueError as e:
+            result.errors.append(f"row {number}: {e}")
+
+    # ข้อมูลปัจจุบันของครัวนี้ใน 2 query แล้วเทียบใน memory
+    existing = list(MenuItem.objects.filter(kitchen_id=kitchen_id).select_related('category'))
+    by_id = {item.id: item for item in existing}
+    by_name = {item.name: item for item in existing}
+    categories = {category.name: category for category in Category.objects.filter(kitchen_id=kitchen_id)}
+
+    to_create = []
+    touched = set()  # id ของเมนูเดิมที่มีในไฟล์
+    changes = {}  # item.id -> (item, set ของ field ที่เปลี่ยน)
+    uploads = []
+    for number, data in parsed:
+        item = by_id.get(data['id']) if 'id' in data else by_name.get(data['name'])
+        if 'id' in data and item is None:
+            result.errors.append(f"row {number}: menu item {data['id']} does not exist")
+            continue
+        if item is None:
+            if 'price' not in data:
+                result.errors.append(f"row {number}: price is required for new item {data['name']!r}")
+                continue
+            item = MenuItem(kitchen_id=kitchen_id, name=data['name'], price=data['price'])
+            to_create.append(item)
+            by_name[item.name] = item
+
+        changed = _apply_row(item, data)
+        if item.pk is not None:
+            touched.add(item.pk)
+            if changed:
+                changes.setdefault(item.pk, (item, set()))[1].update(changed)
+        if 'image' in data and (not item.image or replace_images):
+            if not allow_local_images and not data['image'].startswith('https://'):
+                result.errors.append(f"row {number}: image must be an https:// URL")
+                continue
+            uploads.append((number, item, data['image']))
+
+    new_categories = sorted({
+        item._import_category
+        for item in to_create + [item for item, _ in changes.values()]
+        if getattr(item, '_import_category', '') and item._import_category not in categories
+    })
+    result.categories = len(new_categories)
+    result.created = len(to_create)
+    if result.errors or dry_run:
+        updated = set(changes) | {item.pk for _, item, _ in uploads if item.pk is not None}
+        result.updated = len(updated)
+        result.unchanged = len(touched - updated)
+        result.images = len(uploads)
+        return result
+
+    # upload รูปพร้อมกันหลาย thread ก่อนเปิด transaction (ไม่ถือ transaction ระหว่างรอ network)
+    if uploads:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='menu-import') as executor:
+            futures = [(number, item, executor.submit(_upload_image, source, allow_local_images)) for number, item, source in uploads]
+            for number, item, future in futures:
+                try:
+                    item.image, item.image_variants = future.result()
+                except Exception as e:
+                    result.errors.append(f"row {number}: image upload failed: {e}")
+                    continue
+                result.images += 1
+                if item.pk is not None:
+                    changes.setdefault(item.pk, (item, set()))[1].update({'image', 'image_variants'})
+        if result.errors:
+            return result
+
+    result.updated = len(changes)
+    result.unchanged = len(touched - set(changes))
+
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            [Category(kitchen_id=kitchen_id, name=name) for name in new_categories], batch_size=batch_size
+        )
+        if new_categories:
+            categories.update({
+                category.name: category
+                for category in Category.objects.filter(kitchen_id=kitchen_id, name__in=new_categories)
+            })
+        for item in to_create + [item for item, _ in changes.values()]:
+            if hasattr(item, '_import_category'):
+                item.category = categories[item._import_category] if item._import_category else None
+
+        MenuItem.objects.bulk_create(to_create, batch_size=batch_size)
+        update_fields = sorted(set().union(*(fields for _, fields in changes.values())))
+        if changes:
+            MenuItem.objects.bulk_update([item for item, _ in changes.values()], update_fields, batch_size=batch_size)
+
+        # bulk_create/bulk_update ไม่ยิง post_save -> invalidate cache เมนูของครัวนี้ครั้งเดียวหลัง commit
+        if to_create or changes or new_categories:
+            transaction.on_commit(lambda: bump_menu_version(kitchen_id))
+    return result
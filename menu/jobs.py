@@ -0,0 +1,78 @@
+# menu/jobs.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .events import WINDOWS, record_transition
+from .models import Order, OrderStageStat
+from .scheduler import periodic
+from .slots import ensure_slots
+
+# =======================================================
+#           PERIODIC MAINTENANCE JOBS
+# =======================================================
+# รันโดย scheduler (menu/scheduler.py) บน leader เพียงตัวเดียวของทั้ง fleet
+
+
+@periodic(interval=300, jitter=60, timeout=120)
+def expire_unpaid_orders():
+    """
+    ยกเลิกออเดอร์ที่ไม่ชำระเงินภายใน UNPAID_ORDER_EXPIRY_MINUTES (0 = ปิด, ค่า default)
+    นับจาก payment intent ล่าสุด (ไม่มี = ตอนสั่ง) -> ลูกค้าที่เพิ่งกดจ่ายใหม่ไม่โดนยกเลิกกลางทาง
+    ออเดอร์ที่ upload slip แล้วรอ admin ตรวจ -> ไม่ยกเลิก, ลูกค้าที่ผูก Telegram ไว้ได้ข้อความ "ยกเลิก"
+    """
+    # import ตอนเรียก: views import ทั้งแอป (jobs ถูก import ตอน scheduler เริ่ม)
+    from .views import get_customer_message, send_customer_telegram_notification
+
+    minutes = getattr(settings, 'UNPAID_ORDER_EXPIRY_MINUTES', 0)
+    if not minutes:
+        return 0
+
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            # ทีละ batch, ข้ามแถวที่ webhook กำลัง lock อยู่ (กำลังจะจ่ายสำเร็จ)
+            batch = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status='AWAITING_PAYMENT', payment_status='UNPAID', created_at__lt=cutoff)
+                # ลูกค้าเพิ่งสร้าง payment intent ใหม่ (กำลังจ่าย) -> นับเวลาใหม่จาก intent ล่าสุด
+                .alias(payment_started_at=Coalesce('payment_intent_created_at', 'created_at'))
+                .filter(payment_started_at__lt=cutoff)
+                .filter(Q(payment_slip__isnull=True) | Q(payment_slip=''))
+                .order_by('id')[:200]
+            )
+            for order in batch:
+                previous = (order.status, order.payment_status)
+                order.status = 'CANCELLED'
+                order.save(update_fields=['status'])
+                record_transition(order, *previous, source='system')
+        # แจ้งลูกค้าหลัง commit (ไม่ถือ lock ระหว่างส่งข้อความ)
+        for order in batch:
+            if order.customer_telegram_chat_id:
+                send_customer_telegram_notification(order, get_customer_message(order, 'cancelled'))
+        expired += len(batch)
+        if len(batch) < 200:
+            break
+    if expired:
+        print(f"Expired {expired} unpaid orders older than {minutes} minutes")
+    return expired
+
+
+@periodic(interval=3600, jitter=300, timeout=300)
+def prune_order_stage_stats():
+    """ลบ histogram รายชั่วโมงที่เก่ากว่า window ที่ยาวที่สุดของ /api/admin/sla/ (+1 วัน)"""
+    cutoff = timezone.now() - max(WINDOWS.values()) - timedelta(days=1)
+    deleted, _ = OrderStageStat.objects.filter(hour__lt=cutoff).delete()
+    return deleted
+
+
+@periodic(interval=3600, jitter=300, timeout=120)
+def generate_time_slots():
+    """เติมตาราง TimeSlot ให้มีถึง TIME_SLOT_DAYS_AHEAD วันข้างหน้า"""
+    return ensure_slots()
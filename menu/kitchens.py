@@ -0,0 +1,82 @@
+# menu/kitchens.py
+
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+
+from .models import DEFAULT_KITCHEN_SLUG, Kitchen
+
+# =======================================================
+#               KITCHENS (multi-location)
+# =======================================================
+# - ทุก request ฝั่งลูกค้าเลือกครัวด้วย ?kitchen=<slug> (หรือ "kitchen" ใน body) ไม่ระบุ = ครัวหลัก
+# - slug -> id จำไว้ใน process (หมดอายุตาม MENU_CACHE_TTL) -> ไม่เพิ่ม query ต่อ request
+# - id ของครัวใช้เป็น namespace ของ cache เมนู (menu/cache.py) และเป็นคอลัมน์แรกของ index ของทุกตารางที่แยกตามครัว
+
+_kitchens = {}  # slug -> (id, telegram_chat_id, expires_at)
+
+
+def _load(slug):
+    entry = _kitchens.get(slug)
+    if entry is None or entry[2] <= time.monotonic():
+        row = Kitchen.objects.filter(slug=slug, is_active=True).values_list('id', 'telegram_chat_id').first()
+        if row is None:
+            raise Kitchen.DoesNotExist(f"Kitchen {slug!r} not found")
+        entry = (*row, time.monotonic() + getattr(settings, 'MENU_CACHE_TTL', 60))
+        _kitchens[slug] = entry
+    return entry
+
+
+def kitchen_id_for(slug=None):
+    """slug -> id ของครัวที่เปิดอยู่ (Kitchen.DoesNotExist ถ้าไม่มี / ปิดแล้ว)"""
+    return _load(slug or DEFAULT_KITCHEN_SLUG)[0]
+
+
+async def akitchen_id_for(slug=None):
+    slug = slug or DEFAULT_KITCHEN_SLUG
+    entry = _kitchens.get(slug)
+    if entry is not None and entry[2] > time.monotonic():
+        return entry[0]
+    return await sync_to_async(kitchen_id_for)(slug)
+
+
+def kitchen_from_request(request):
+    """ครัวของ request (?kitchen= หรือ body) -> id, ไม่รู้จัก slug -> 404"""
+    slug = request.query_params.get('kitchen') or request.data.get('kitchen')
+    try:
+        return kitchen_id_for(slug if isinstance(slug, str) else None)
+    except Kitchen.DoesNotExist:
+        raise NotFound('Kitchen not found')
+
+
+def kitchen_chat_id(kitchen_id):
+    """กลุ่ม Telegram ของ admin ครัวนี้ (ไม่ได้ตั้งไว้ = TELEGRAM_CHAT_ID)"""
+    for cached_id, chat_id, _ in list(_kitchens.values()):
+        if cached_id == kitchen_id:
+            break
+    else:
+        chat_id = Kitchen.objects.filter(id=kitchen_id).values_list('telegram_chat_id', flat=True).first()
+    return chat_id or os.environ.get('TELEGRAM_CHAT_ID')
+
+
+def active_kitchen_ids():
+    return list(Kitchen.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+
+
+def clear_kitchens():
+    # เรียกจาก signal เมื่อ Kitchen เปลี่ยน (slug / chat id / ปิดครัว)
+    _kitchens.clear()
+
+
+def kitchen_filter(request):
+    """หน้า admin: ?kitchen=<slug> -> {'kitchen_id': id} ใช้กับ .filter(**...), ไม่ระบุ = ทุกครัว ({})"""
+    slug = request.query_params.get('kitchen')
+    if not slug:
+        return {}
+    try:
+        return {'kitchen_id': kitchen_id_for(slug)}
+    except Kitchen.DoesNotExist:
+        raise NotFound('Kitchen not found')
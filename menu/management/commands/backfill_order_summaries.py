@@ -0,0 +1,42 @@
+# menu/management/commands/backfill_order_summaries.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from menu.models import Order
+from menu.services import set_item_summary
+
+# =======================================================
+#       BACKFILL Order.item_count / Order.items_summary
+# =======================================================
+# ออเดอร์ที่สร้างก่อนมีคอลัมน์สรุปจะมี items_summary ว่าง -> ระหว่างนี้ยังอ่านจาก OrderItem ได้ (ช้ากว่า)
+# ทำทีละ batch ตาม id (keyset) เพื่อไม่ให้ lock ตารางนาน, รันซ้ำได้ (ข้ามออเดอร์ที่มีสรุปแล้ว)
+
+
+class Command(BaseCommand):
+    help = "Populate Order.item_count and Order.items_summary for orders created before the summary columns existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Orders updated per transaction.")
+        parser.add_argument('--all', action='store_true', help="Recompute every order, not only those without a summary.")
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(items_summary=[])
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).prefetch_related('items')[:options['batch_size']])
+            if not batch:
+                break
+            for order in batch:
+                set_item_summary(order, order.items.all())
+            with transaction.atomic():
+                Order.objects.bulk_update(batch, ['item_count', 'items_summary'])
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"  ... {updated} orders")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} orders."))
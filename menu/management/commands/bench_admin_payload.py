@@ -0,0 +1,128 @@
+# menu/management/commands/bench_admin_payload.py
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from kitsu_backend.renderers import FastJSONRenderer
+from menu.models import Order, OrderItem
+from menu.perf import format_table, summarize
+from menu.serializers import AdminOrderItemSerializer, AdminOrderSerializer
+from menu.services import set_item_summary
+
+# =======================================================
+#       ADMIN ORDER LIST PAYLOAD BENCHMARK
+# =======================================================
+# สร้างออเดอร์ปลอมใน transaction (rollback ตอนจบ ไม่เหลือข้อมูลใน DB) แล้ววัด
+# CPU ต่อ response ของ /api/admin/orders/ แยกเป็น serialize / render / gzip
+# เทียบ serializer + JSONRenderer ของ DRF ล้วนๆ (items แบบ nested จาก OrderItem)
+# กับของที่ใช้จริง (FastReadMixin + Order.items_summary + FastJSONRenderer)
+
+COLUMNS = [
+    ('variant', 'variant', '{}'),
+    ('serialize_ms', 'serialize ms', '{:.2f}'),
+    ('render_ms', 'render ms', '{:.2f}'),
+    ('gzip_ms', 'gzip ms', '{:.2f}'),
+    ('total_ms', 'total ms', '{:.2f}'),
+    ('bytes', 'bytes', '{:,}'),
+    ('gzip_bytes', 'gzip bytes', '{:,}'),
+]
+
+
+class BaselineOrderItemSerializer(serializers.ModelSerializer):
+    class Meta(AdminOrderItemSerializer.Meta):
+        pass
+
+
+class BaselineOrderSerializer(serializers.ModelSerializer):
+    items = BaselineOrderItemSerializer(many=True, read_only=True)
+    payment_slip_url = serializers.SerializerMethodField()
+
+    class Meta(AdminOrderSerializer.Meta):
+        pass
+
+    get_payment_slip_url = AdminOrderSerializer.get_payment_slip_url
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare CPU time and response size of the admin order list with the default and fast serialization paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500, help="Orders in the payload.")
+        parser.add_argument('--items', type=int, default=4, help="Items per order.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed repetitions per variant (median is reported).")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['orders'], options['items'])
+                orders = list(Order.objects.prefetch_related('items').order_by('-created_at'))
+                rows = [
+                    self.measure('drf default', BaselineOrderSerializer, JSONRenderer(), orders, options['repeat']),
+                    self.measure('fast', AdminOrderSerializer, FastJSONRenderer(), orders, options['repeat']),
+                ]
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{options['orders']} orders x {options['items']} items, median of {options['repeat']} runs\n")
+        self.stdout.write(format_table(rows, COLUMNS))
+
+    def seed(self, count, items):
+        address = "99/123 หมู่บ้านตัวอย่าง ซอยสุขุมวิท 101/1 แขวงบางจาก เขตพระโขนง กรุงเทพมหานคร 10260 (ตึกสีเทา ชั้น 4 ห้อง 402)"
+        lines = [
+            [
+                OrderItem(
+                    menu_item_name=f"ข้าวผัดกะเพราไก่ไข่ดาว {n}",
+                    quantity=random.randint(1, 3),
+                    price=Decimal(random.randint(4000, 20000)) / 100,
+                )
+                for n in range(items)
+            ]
+            for _ in range(count)
+        ]
+        orders = []
+        for i, order_items in enumerate(lines):
+            order = Order(
+                customer_name=f"ลูกค้า {i}",
+                customer_phone=f"08{random.randint(10000000, 99999999)}",
+                customer_address=address,
+                total_price=Decimal('0.00'),
+            )
+            set_item_summary(order, order_items)
+            orders.append(order)
+        Order.objects.bulk_create(orders)
+
+        for order, order_items in zip(orders, lines):
+            for item in order_items:
+                item.order = order
+        OrderItem.objects.bulk_create([item for order_items in lines for item in order_items])
+
+    def measure(self, variant, serializer_class, renderer, orders, repeat):
+        timings = {'serialize': [], 'render': [], 'gzip': []}
+        for _ in range(repeat):
+            started = time.process_time()
+            data = serializer_class(orders, many=True).data
+            serialized = time.process_time()
+            body = renderer.render(data, 'application/json')
+            rendered = time.process_time()
+            compressed = compress_string(body)
+            timings['serialize'].append(serialized - started)
+            timings['render'].append(rendered - serialized)
+            timings['gzip'].append(time.process_time() - rendered)
+
+        row = {'variant': variant, 'bytes': len(body), 'gzip_bytes': len(compressed)}
+        for stage, values in timings.items():
+            row[f"{stage}_ms"] = summarize(values)['p50'] * 1000
+        row['total_ms'] = row['serialize_ms'] + row['render_ms'] + row['gzip_ms']
+        return row
@@ -0,0 +1,93 @@
+# menu/management/commands/bench_db_connections.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from kitsu_backend.db_pool import database_stats
+from menu.perf import StageStats, format_table
+
+# =======================================================
+#       CONNECTION ACQUIRE BENCHMARK
+# =======================================================
+# จำลอง request พร้อมกันหลาย thread: แต่ละรอบทำแบบเดียวกับ request จริงของ Django
+#   close_old_connections() -> เปิด/ยืม connection -> SELECT 1 -> ถือไว้ --hold-ms -> close_old_connections()
+# เทียบโหมดโดยรันซ้ำด้วย env ต่างกัน เช่น
+#   DB_POOL=0 python manage.py bench_db_connections   (persistent connection ต่อ thread)
+#   DB_POOL=1 python manage.py bench_db_connections   (psycopg 3 pool, PostgreSQL เท่านั้น)
+
+COLUMNS = [
+    ('stage', 'stage', '{}'),
+    ('count', 'count', '{}'),
+    ('errors', 'errors', '{}'),
+    ('p50_ms', 'p50 ms', '{:.2f}'),
+    ('p95_ms', 'p95 ms', '{:.2f}'),
+    ('p99_ms', 'p99 ms', '{:.2f}'),
+    ('max_ms', 'max ms', '{:.2f}'),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure database connection-acquire latency under concurrent requests for the configured connection mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent request threads.")
+        parser.add_argument('--iterations', type=int, default=50, help="Requests per thread.")
+        parser.add_argument('--hold-ms', type=float, default=5.0, help="How long each request keeps its connection.")
+        parser.add_argument('--database', default='default', help="Database alias to benchmark.")
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        database = settings.DATABASES[alias]
+        pool = database.get('OPTIONS', {}).get('pool')
+        if pool:
+            mode = f"pool (min {pool.get('min_size')}, max {pool.get('max_size')}, timeout {pool.get('timeout')}s)"
+        else:
+            mode = f"no pool (CONN_MAX_AGE={database.get('CONN_MAX_AGE', 0)})"
+
+        stats = StageStats()
+        self.stdout.write(
+            f"{options['threads']} threads x {options['iterations']} requests against "
+            f"'{alias}' ({database['ENGINE'].rsplit('.', 1)[-1]}), {mode}"
+        )
+
+        threads = [
+            threading.Thread(target=self.worker, args=(alias, stats, options), name=f"bench-{i}")
+            for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("")
+        self.stdout.write(format_table(stats.rows(elapsed), COLUMNS))
+        self.stdout.write("")
+        total = options['threads'] * options['iterations']
+        self.stdout.write(f"Elapsed:      {elapsed:.2f}s ({total / elapsed:.1f} requests/s)")
+        self.stdout.write(f"Connection:   {database_stats()[alias]}")
+
+    def worker(self, alias, stats, options):
+        connection = connections[alias]
+        hold = options['hold_ms'] / 1000
+        try:
+            for _ in range(options['iterations']):
+                # เริ่ม request: Django ปิด connection ที่หมดอายุ/เสีย (request_started)
+                close_old_connections()
+                with stats.timed('acquire'):
+                    connection.ensure_connection()
+                with stats.timed('query'):
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                time.sleep(hold)
+                # จบ request (request_finished): โหมด pool จะคืน connection กลับเข้า pool ตรงนี้
+                with stats.timed('release'):
+                    close_old_connections()
+        finally:
+            connections.close_all()
@@ -0,0 +1,48 @@
+# menu/management/commands/build_image_variants.py
+
+import requests
+from django.core.management.base import BaseCommand
+
+from menu.cache import bump_menu_version
+from menu.images import build_image_variants, variant_url
+from menu.models import MenuItem
+
+# =======================================================
+#       BACKFILL MenuItem.image_variants
+# =======================================================
+# เมนูที่ upload รูปก่อนมี image_variants -> serializer ยังส่ง URL ต้นฉบับ (ไฟล์ใหญ่) ไปจนกว่าจะรันคำสั่งนี้
+# placeholder ทำจากรูปขนาดเล็กที่ดาวน์โหลดจาก Cloudinary (ไม่ต้องโหลดต้นฉบับทั้งไฟล์)
+# ใช้ .update() -> ไม่ยิง signal ทีละแถว, bump version ของ cache เมนูครั้งเดียวตอนจบ
+
+SOURCE_WIDTH = 64
+
+
+class Command(BaseCommand):
+    help = "Precompute responsive image URLs and placeholders for menu items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild every item, not only those without variants.")
+        parser.add_argument('--no-placeholder', action='store_true', help="Skip downloading images for placeholders.")
+
+    def handle(self, *args, **options):
+        updated = 0
+        for item in MenuItem.objects.exclude(image__isnull=True).exclude(image='').order_by('id'):
+            if item.image_variants.get('public_id') == item.image.public_id and not options['all']:
+                continue
+
+            source = None
+            if not options['no_placeholder']:
+                try:
+                    response = requests.get(variant_url(item.image, SOURCE_WIDTH), timeout=10)
+                    response.raise_for_status()
+                    source = response.content
+                except requests.RequestException as e:
+                    self.stderr.write(f"  {item.name}: could not download image ({e}), no placeholder")
+
+            MenuItem.objects.filter(pk=item.pk).update(image_variants=build_image_variants(item.image, source))
+            updated += 1
+            self.stdout.write(f"  {item.name}")
+
+        if updated:
+            bump_menu_version()
+        self.stdout.write(self.style.SUCCESS(f"Built image variants for {updated} menu items."))
@@ -0,0 +1,45 @@
+# menu/management/commands/check_query_plans.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.query_plans import HOT_QUERIES, SEED_DAYS, SEED_MENU_ITEMS, SEED_ORDERS, check_query_plans
+
+# =======================================================
+#               QUERY PLAN REGRESSION CHECK
+# =======================================================
+# python manage.py check_query_plans            (seed ใน transaction -> EXPLAIN -> rollback)
+# python manage.py check_query_plans --verbose  (พิมพ์ plan ของทุก statement)
+# exit code != 0 ถ้ามี hot query ที่อ่านทั้งตาราง / เกินงบจำนวนแถว ดู menu/query_plans.py
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries against seeded data and fail on sequential scans or row estimates over budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=SEED_ORDERS, help="Orders to seed.")
+        parser.add_argument('--menu-items', type=int, default=SEED_MENU_ITEMS, help="Menu items to seed.")
+        parser.add_argument('--days', type=int, default=SEED_DAYS, help="Days of order history to spread orders over.")
+        parser.add_argument('--query', action='append', choices=[query.name for query in HOT_QUERIES], help="Only check these hot queries.")
+        parser.add_argument('--verbose', action='store_true', help="Print the SQL and plan of every statement.")
+
+    def handle(self, *args, **options):
+        queries = [query for query in HOT_QUERIES if not options['query'] or query.name in options['query']]
+        results = check_query_plans(
+            queries, orders=options['orders'], menu_items=options['menu_items'], days=options['days'],
+        )
+
+        failed = 0
+        for result in results:
+            rows = '' if result.rows is None else f" (~{result.rows:,} rows)"
+            if result.problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"FAIL {result.query}{rows}: {'; '.join(result.problems)}"))
+            else:
+                self.stdout.write(f"ok   {result.query}{rows}")
+            if options['verbose'] or result.problems:
+                self.stdout.write(f"     {result.sql}")
+                self.stdout.write("     " + result.plan.replace("\n", "\n     "))
+
+        if failed:
+            raise CommandError(f"{failed} of {len(results)} statements have plan regressions.")
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} statements from {len(queries)} hot queries use indexes."))
@@ -0,0 +1,56 @@
+# menu/management/commands/import_menu.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.importer import import_menu, read_rows
+from menu.kitchens import kitchen_id_for
+from menu.models import Kitchen
+
+# =======================================================
+#               BULK MENU IMPORT
+# =======================================================
+# python manage.py import_menu menu.csv --dry-run   (ดูก่อนว่าจะเปลี่ยนอะไร)
+# คอลัมน์: id, name, description, price, category, is_available, image (URL หรือ path) ดู menu/importer.py
+
+
+class Command(BaseCommand):
+    help = "Create or update menu items from a CSV or JSON file (batched writes, one menu cache invalidation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with header row) or JSON (list of objects) file.")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension / content.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing or uploading.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows per INSERT/UPDATE statement.")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent image uploads.")
+        parser.add_argument('--replace-images', action='store_true', help="Upload images even for items that already have one.")
+        parser.add_argument('--kitchen', help="Slug of the kitchen whose menu is imported (default: main kitchen).")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                rows = read_rows(f.read(), options['format'], options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        try:
+            kitchen_id = kitchen_id_for(options['kitchen'])
+        except Kitchen.DoesNotExist:
+            raise CommandError(f"Kitchen {options['kitchen']!r} does not exist or is inactive.")
+
+        result = import_menu(
+            rows,
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            replace_images=options['replace_images'],
+            kitchen_id=kitchen_id,
+            # คนรันคำสั่งเข้าถึงเครื่องอยู่แล้ว -> อ่านรูปจาก path ในเครื่องได้
+            allow_local_images=True,
+        )
+        for error in result.errors:
+            self.stderr.write(f"  {error}")
+        if result.errors:
+            raise CommandError(f"Import aborted, nothing was written ({len(result.errors)} errors).")
+
+        prefix = "Dry run: would have " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
@@ -0,0 +1,54 @@
+# menu/management/commands/run_scheduler.py
+
+import signal
+
+from django.core.management.base import BaseCommand
+
+from menu.perf import format_table
+from menu.scheduler import Scheduler, load_jobs
+
+# =======================================================
+#               DEDICATED SCHEDULER PROCESS
+# =======================================================
+# ใช้แทน SCHEDULER_IN_WEB=1 เมื่ออยากแยกงาน maintenance ออกจาก web worker
+# รันหลาย instance ได้ (แต่ละตัวแย่ง lease เดียวกัน มีตัวเดียวที่ทำงาน)
+
+
+class Command(BaseCommand):
+    help = "Run registered periodic jobs (only the instance holding the scheduler lease does the work)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run every job once now, print timings and exit.")
+        parser.add_argument('--list', action='store_true', help="List registered jobs and exit.")
+        parser.add_argument('--tick', type=float, default=1.0, help="Seconds between scheduling checks.")
+
+    def handle(self, *args, **options):
+        jobs = load_jobs()
+        if options['list']:
+            self.stdout.write(format_table(
+                [{'name': job.name, 'interval': job.interval, 'jitter': job.jitter, 'timeout': job.timeout} for job in jobs.values()],
+                [('name', 'job', '{}'), ('interval', 'every s', '{}'), ('jitter', 'jitter s', '{}'), ('timeout', 'timeout s', '{}')],
+            ))
+            return
+
+        scheduler = Scheduler(jobs, tick=options['tick'])
+        if options['once']:
+            results = scheduler.run_all_now()
+            scheduler.shutdown()
+            if results is None:
+                self.stdout.write("Another instance holds the scheduler lease; nothing was run.")
+                return
+            self.stdout.write(format_table(
+                [{'name': name, 'ms': ms, 'error': error or '-'} for name, (ms, error) in results.items()],
+                [('name', 'job', '{}'), ('ms', 'ms', '{:.1f}'), ('error', 'error', '{}')],
+            ))
+            return
+
+        # SIGTERM (deploy / restart) -> หยุดรับงานใหม่ รองานที่รันอยู่ แล้วคืน lease
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop_event.set())
+        self.stdout.write(f"Scheduler {scheduler.holder} started with {len(jobs)} jobs")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Scheduler stopped")
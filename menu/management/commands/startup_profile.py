@@ -0,0 +1,75 @@
+# menu/management/commands/startup_profile.py
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.perf import format_table, import_cost_by_package, parse_importtime
+
+# =======================================================
+#               STARTUP (COLD START) PROFILE
+# =======================================================
+# รัน python process ใหม่ด้วย -X importtime แล้วโหลดแอปแบบเดียวกับ gunicorn worker
+# (django.setup + wsgi application + URLconf) จากนั้นสรุปเวลา import ต่อ module / package
+# --warmup: รัน warm_up() ต่อใน process เดียวกันแล้วแสดงเวลาของแต่ละ step
+
+CHILD_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from kitsu_backend.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+result = {'load_ms': round((time.perf_counter() - started) * 1000, 1)}
+if WARMUP:
+    from kitsu_backend.warmup import warm_up
+    started = time.perf_counter()
+    result['warmup_steps_ms'] = warm_up()
+    result['warmup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = "Report per-module import cost of a cold application start (python -X importtime)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Number of modules/packages to show.")
+        parser.add_argument('--warmup', action='store_true', help="Also run the warm-up steps and time them.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'kitsu_backend.settings')}
+        script = CHILD_SCRIPT.replace('WARMUP', 'True' if options['warmup'] else 'False')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr[-2000:])
+
+        rows = parse_importtime(result.stderr)
+        summary = json.loads(result.stdout.strip().splitlines()[-1])
+        top = options['top']
+
+        self.stdout.write(f"Application load: {summary['load_ms']} ms, {len(rows)} modules imported\n")
+
+        # depth 0 = import ที่ถูกเรียกตรงจาก top level -> cumulative คือค่าใช้จ่ายทั้งก้อนของ module นั้น
+        slowest = sorted((row for row in rows if row['depth'] <= 1), key=lambda row: -row['cumulative_us'])[:top]
+        self.stdout.write(format_table(
+            [{**row, 'cumulative_ms': row['cumulative_us'] / 1000, 'self_ms': row['self_us'] / 1000} for row in slowest],
+            [('name', 'module', '{}'), ('cumulative_ms', 'cumulative ms', '{:.1f}'), ('self_ms', 'self ms', '{:.1f}')],
+        ))
+        self.stdout.write("")
+        self.stdout.write(format_table(
+            import_cost_by_package(rows)[:top],
+            [('package', 'package', '{}'), ('modules', 'modules', '{}'), ('self_ms', 'self ms', '{:.1f}')],
+        ))
+
+        if options['warmup']:
+            self.stdout.write("")
+            self.stdout.write(f"Warm-up: {summary['warmup_ms']} ms")
+            for step, ms in summary['warmup_steps_ms'].items():
+                self.stdout.write(f"  {step:<10} {ms:.1f} ms")
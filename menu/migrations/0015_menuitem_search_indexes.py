@@ -0,0 +1,41 @@
+# menu/migrations/0015_menuitem_search_indexes.py
+
+from django.db import migrations
+
+# index สำหรับค้นหาเมนู (ใช้ได้เฉพาะ PostgreSQL)
+# - name gin_trgm_ops           -> trigram_word_similar (%>)
+# - UPPER(name / description)   -> istartswith / icontains ที่ Django สร้างเป็น UPPER(...) LIKE
+SEARCH_INDEXES = [
+    ('menu_item_name_trgm', 'name gin_trgm_ops'),
+    ('menu_item_name_upper_trgm', 'UPPER(name::text) gin_trgm_ops'),
+    ('menu_item_desc_upper_trgm', 'UPPER(description::text) gin_trgm_ops'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # SQLite ใช้ inverted index ใน memory แทน (menu/search.py)
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, expression in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON menu_menuitem USING gin ({expression})'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0014_category_menuitem_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:56
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize_existing_phones(apps, schema_editor):
+    # ทำให้เบอร์เก่าอยู่ในรูปแบบเดียวกับ menu.services.normalize_phone
+    Order = apps.get_model('menu', 'Order')
+    for order in Order.objects.only('id', 'customer_phone').iterator():
+        digits = re.sub(r'\D', '', order.customer_phone or '')
+        if digits.startswith('66') and len(digits) == 11:
+            digits = '0' + digits[2:]
+        if digits and digits != order.customer_phone:
+            Order.objects.filter(id=order.id).update(customer_phone=digits)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0015_menuitem_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_existing_phones, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_phone', 'created_at'], name='order_phone_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_telegram_chat_id', 'created_at'], name='order_chat_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0017_order_item_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_phone'], name='order_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0018_order_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStageStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=20)),
+                ('hour', models.DateTimeField()),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('stage', 'hour', 'bucket'), name='orderstagestat_unique_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('payment_status', models.CharField(max_length=20)),
+                ('source', models.CharField(choices=[('customer', 'Customer'), ('admin', 'Admin'), ('webhook', 'Payment webhook'), ('system', 'System')], default='system', max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='menu.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'created_at'], name='orderevent_order_created_idx')],
+            },
+        ),
+    ]
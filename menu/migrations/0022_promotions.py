@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0021_menuitem_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='applied_promotions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('PERCENT', 'Percentage off'), ('BUY_X_GET_Y', 'Buy X get Y free'), ('BUNDLE', 'Bundle price')], max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('priority', models.PositiveSmallIntegerField(default=100)),
+                ('percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('buy_quantity', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('free_quantity', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('bundle_price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('days_of_week', models.CharField(blank=True, help_text="Digits 0 (Mon) to 6 (Sun), e.g. '01234'. Empty = every day.", max_length=7)),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='menu.category')),
+                ('menu_items', models.ManyToManyField(blank=True, related_name='promotions', to='menu.menuitem')),
+            ],
+            options={
+                'ordering': ['priority', 'id'],
+            },
+        ),
+    ]
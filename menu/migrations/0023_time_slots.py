@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0022_promotions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='scheduled_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField(unique=True)),
+                ('ends_at', models.DateTimeField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['starts_at'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('booked__lte', models.F('capacity'))), name='timeslot_booked_lte_capacity')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='time_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='menu.timeslot'),
+        ),
+    ]
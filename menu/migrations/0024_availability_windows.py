@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0023_time_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.CharField(blank=True, help_text="Digits 0 (Mon) to 6 (Sun), e.g. '01234'. Empty = every day.", max_length=7)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(help_text='Earlier than start time = runs past midnight.')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='availability_windows', to='menu.category')),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='availability_windows', to='menu.menuitem')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', True), ('menu_item__isnull', False)), models.Q(('category__isnull', False), ('menu_item__isnull', True)), _connector='OR'), name='availability_window_item_xor_category')],
+            },
+        ),
+    ]
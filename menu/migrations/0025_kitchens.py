@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:29
+
+import django.db.models.deletion
+import menu.models
+from django.db import migrations, models
+
+
+def create_main_kitchen(apps, schema_editor):
+    # ข้อมูลเดิมทั้งหมดเป็นของครัวหลัก (AddField ด้านล่างใช้ default_kitchen_id ที่หาครัวนี้)
+    Kitchen = apps.get_model('menu', 'Kitchen')
+    Kitchen.objects.get_or_create(slug='main', defaults={'name': 'Main kitchen'})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0024_availability_windows'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Kitchen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+                ('telegram_chat_id', models.CharField(blank=True, max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunPython(create_main_kitchen, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timeslot',
+            name='starts_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='kitchen',
+            field=models.ForeignKey(default=menu.models.default_kitchen_id, on_delete=django.db.models.deletion.PROTECT, related_name='categories', to='menu.kitchen'),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='kitchen',
+            field=models.ForeignKey(default=menu.models.default_kitchen_id, on_delete=django.db.models.deletion.PROTECT, related_name='menu_items', to='menu.kitchen'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='kitchen',
+            field=models.ForeignKey(default=menu.models.default_kitchen_id, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='menu.kitchen'),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='kitchen',
+            field=models.ForeignKey(default=menu.models.default_kitchen_id, on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='menu.kitchen'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['kitchen', 'name'], name='category_kitchen_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['kitchen', 'is_available'], name='menuitem_kitchen_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['kitchen', 'created_at'], name='order_kitchen_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['kitchen', 'status', 'created_at'], name='order_kitchen_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.UniqueConstraint(fields=('kitchen', 'starts_at'), name='timeslot_kitchen_start_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0025_kitchens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_intent_created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,12 +1,49 @@
 # menu/models.py (Correct Final Version)
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
+from .images import build_image_variants, is_upload
+
+DEFAULT_KITCHEN_SLUG = 'main'
+_default_kitchen = {}
+
+
+class Kitchen(models.Model):
+    """
+    ครัว (สาขา) แต่ละแห่ง: เมนู หมวดหมู่ ออเดอร์ และ slot แยกตามครัว
+    query ฝั่ง admin / เมนูกรองด้วย kitchen_id ก่อนเสมอ (index นำด้วย kitchen_id) และ cache เมนูแยก namespace ต่อครัว
+    """
+
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, unique=True)
+    # กลุ่ม Telegram ของ admin ครัวนี้ (ว่าง = ใช้ TELEGRAM_CHAT_ID)
+    telegram_chat_id = models.CharField(max_length=50, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+def default_kitchen_id():
+    """ครัวหลัก (สร้างใน migration 0025) เป็นค่า default ของ kitchen ทุกตาราง, จำ id ไว้ใน process"""
+    if DEFAULT_KITCHEN_SLUG not in _default_kitchen:
+        kitchen_id = Kitchen.objects.filter(slug=DEFAULT_KITCHEN_SLUG).values_list('id', flat=True).first()
+        if kitchen_id is None:
+            kitchen_id = Kitchen.objects.create(slug=DEFAULT_KITCHEN_SLUG, name="Main kitchen").id
+        _default_kitchen[DEFAULT_KITCHEN_SLUG] = kitchen_id
+    return _default_kitchen[DEFAULT_KITCHEN_SLUG]
+
+
 class MenuItem(models.Model):
+    kitchen = models.ForeignKey(Kitchen, on_delete=models.PROTECT, default=default_kitchen_id, related_name='menu_items')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     image = CloudinaryField('image', blank=True, null=True)
+    # URL หลายขนาด (srcset) + placeholder ของรูป คำนวณตอนรูปเปลี่ยน (ดู menu/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     category = models.ForeignKey(
         'Category',
@@ -16,10 +53,33 @@ class MenuItem(models.Model):
         related_name='menu_items'
     )
 
+    class Meta:
+        indexes = [
+            # payload เมนู / ตารางราคา build ต่อครัว
+            models.Index(fields=['kitchen', 'is_available'], name='menuitem_kitchen_avail_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        image_field = self._meta.get_field('image')
+        upload = self.image if is_upload(self.image) else None
+        if upload is not None:
+            # upload เองก่อน (CloudinaryField.pre_save) เพื่อให้ได้ public_id มาสร้าง variants
+            # ตอน super().save() ค่าเป็น CloudinaryResource แล้วจึงไม่ upload ซ้ำ
+            image_field.pre_save(self, self._state.adding)
+        image = image_field.to_python(self.image)
+
+        public_id = getattr(image, 'public_id', None) if image else None
+        if upload is not None or public_id != self.image_variants.get('public_id'):
+            self.image_variants = build_image_variants(image, source=upload)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'image_variants'}
+        super().save(*args, **kwargs)
+
 class Order(models.Model):
+    kitchen = models.ForeignKey(Kitchen, on_delete=models.PROTECT, default=default_kitchen_id, related_name='orders')
 
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -43,6 +103,15 @@ class Order(models.Model):
     customer_telegram_chat_id = models.CharField(max_length=50, blank=True, null=True)
 
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # ส่วนลดจากโปรโมชัน (total_price = ราคารวมหลังหักส่วนลดแล้ว), applied_promotions = [{'id', 'name', 'amount'}]
+    discount_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    applied_promotions = models.JSONField(default=list, blank=True)
+
+    # สรุปรายการอาหาร เขียนครั้งเดียวตอนสร้างออเดอร์ (services.set_item_summary)
+    # หน้า status / admin list / ข้อความ Telegram อ่านจากแถวนี้แถวเดียว ไม่ต้อง join OrderItem
+    # ออเดอร์เก่า: python manage.py backfill_order_summaries
+    item_count = models.PositiveIntegerField(default=0)
+    items_summary = models.JSONField(default=list, blank=True)
 
     status = models.CharField(
         max_length=20,
@@ -71,11 +140,45 @@ class Order(models.Model):
     )
 
     paid_at = models.DateTimeField(blank=True, null=True)
+    # เวลาที่สร้าง payment intent ล่าสุด -> งานยกเลิกออเดอร์ค้างชำระนับจากตรงนี้ (ไม่ใช่ created_at)
+    payment_intent_created_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # สั่งล่วงหน้า: slot ที่จองไว้ (null = ASAP), scheduled_for = เวลาเริ่ม slot (เก็บซ้ำไว้ ไม่ต้อง join ตอนแสดง)
+    time_slot = models.ForeignKey('TimeSlot', on_delete=models.PROTECT, null=True, blank=True, related_name='orders')
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # ใช้ค้นประวัติออเดอร์ของลูกค้า (เบอร์โทร / Telegram) เรียงตามเวลา
+            models.Index(fields=['customer_phone', 'created_at'], name='order_phone_created_idx'),
+            models.Index(fields=['customer_telegram_chat_id', 'created_at'], name='order_chat_created_idx'),
+            # หน้า admin: เรียง / กรอง / date_hierarchy ตามวันที่
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            # ค้นเบอร์โทรแบบ prefix (LIKE '081%') บน PostgreSQL ต้องใช้ pattern ops (backend อื่นไม่สนใจ opclasses)
+            models.Index(fields=['customer_phone'], name='order_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # admin / สถิติของแต่ละครัว: อ่านเฉพาะ partition ของครัวตัวเอง
+            models.Index(fields=['kitchen', 'created_at'], name='order_kitchen_created_idx'),
+            models.Index(fields=['kitchen', 'status', 'created_at'], name='order_kitchen_status_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} | {self.payment_status}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding or self.status != 'CANCELLED' or not self.time_slot_id:
+            return super().save(*args, **kwargs)
+        # ยกเลิกออเดอร์ที่จอง slot ไว้ -> คืนที่ครั้งเดียว ไม่ว่าจะยกเลิกจาก view / admin / job
+        # UPDATE แบบมีเงื่อนไขบอกว่าเป็นการยกเลิกครั้งแรกหรือไม่ (save ซ้ำ / ยกเลิกพร้อมกัน ไม่คืนซ้ำ)
+        # .update(status='CANCELLED') แบบ bulk ไม่ผ่านตรงนี้ -> ห้ามใช้ยกเลิกออเดอร์
+        from .slots import release_slot
+
+        with transaction.atomic(using=kwargs.get('using')):
+            first_cancel = type(self).objects.filter(pk=self.pk).exclude(status='CANCELLED').update(status='CANCELLED')
+            super().save(*args, **kwargs)
+            if first_cancel:
+                release_slot(self.time_slot_id)
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     menu_item = models.ForeignKey(MenuItem, on_delete=models.SET_NULL, null=True, blank=True)
@@ -86,7 +189,156 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.menu_item_name}"
 
+class OrderEvent(models.Model):
+    """
+    log การเปลี่ยนสถานะของออเดอร์ (เพิ่มอย่างเดียว ไม่แก้ไม่ลบ)
+    เขียนผ่าน menu.events.record_transition() ทุกครั้งที่ status / payment_status เปลี่ยน
+    """
+
+    SOURCE_CHOICES = [
+        ('customer', 'Customer'),
+        ('admin', 'Admin'),
+        ('webhook', 'Payment webhook'),
+        ('system', 'System'),
+    ]
+
+    order = models.ForeignKey(Order, related_name='events', on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='system')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='orderevent_order_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("OrderEvent is append-only.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status or '-'} -> {self.to_status} ({self.payment_status})"
+
+
+class OrderStageStat(models.Model):
+    """
+    histogram ของเวลาที่ออเดอร์อยู่ในแต่ละช่วง (ดู menu.events.SLA_STAGES) แยกรายชั่วโมง
+    นับเพิ่มทีละออเดอร์ตอนเปลี่ยนสถานะ -> หา percentile ของช่วงเวลาใดๆ ได้โดยไม่ต้องอ่าน OrderEvent ทั้งหมด
+    """
+
+    stage = models.CharField(max_length=20)
+    hour = models.DateTimeField()
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'hour', 'bucket'], name='orderstagestat_unique_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage} @ {self.hour:%Y-%m-%d %H}:00 bucket {self.bucket}: {self.count}"
+
+
+class AvailabilityWindow(models.Model):
+    """
+    ช่วงเวลาที่เมนู (หรือทุกเมนูในหมวด) เปิดขาย เช่น อาหารเช้า จ-ศ 07:00-10:30
+    เมนูที่ไม่มี window เลยขายตลอด (ตาม is_available), window ของเมนูเองใช้แทน window ของหมวด
+    คอมไพล์เป็นตารางรายสัปดาห์ใน memory (menu/availability.py) ไม่ query ตามเวลาต่อ request
+    """
+
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, null=True, blank=True, related_name='availability_windows')
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, null=True, blank=True, related_name='availability_windows')
+    days_of_week = models.CharField(max_length=7, blank=True, help_text="Digits 0 (Mon) to 6 (Sun), e.g. '01234'. Empty = every day.")
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text="Earlier than start time = runs past midnight.")
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(menu_item__isnull=False, category__isnull=True) | models.Q(menu_item__isnull=True, category__isnull=False),
+                name='availability_window_item_xor_category',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item or self.category}: {self.days_of_week or 'daily'} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    def clean(self):
+        # ทั้งคู่ว่างได้ตอน validate inline ของเมนู/หมวดที่ยังไม่ถูกบันทึก (Django ใส่ FK ให้ตอน save)
+        if self.menu_item_id is not None and self.category_id is not None:
+            raise ValidationError("Choose either a menu item or a category, not both.")
+        if self.days_of_week and not all(day in '0123456' for day in self.days_of_week):
+            raise ValidationError({'days_of_week': "Use digits 0 (Mon) to 6 (Sun)."})
+        if self.start_time == self.end_time:
+            raise ValidationError({'end_time': "End time must differ from start time."})
+
+
+class TimeSlot(models.Model):
+    """
+    ช่วงเวลารับ/ส่งอาหารที่สั่งล่วงหน้าได้ (สร้างล่วงหน้าโดยงาน generate_time_slots ใน menu/jobs.py)
+    booked นับด้วย conditional UPDATE ตอนจอง/ยกเลิก (menu/slots.py) ไม่ต้องนับออเดอร์
+    """
+
+    kitchen = models.ForeignKey(Kitchen, on_delete=models.CASCADE, default=default_kitchen_id, related_name='time_slots')
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    capacity = models.PositiveIntegerField()
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['starts_at']
+        constraints = [
+            # ความจุเป็นของแต่ละครัว -> slot เวลาเดียวกันมีได้ครัวละหนึ่ง (index นี้ใช้หา slot ที่ว่างของครัวด้วย)
+            models.UniqueConstraint(fields=['kitchen', 'starts_at'], name='timeslot_kitchen_start_uniq'),
+            models.CheckConstraint(condition=models.Q(booked__lte=models.F('capacity')), name='timeslot_booked_lte_capacity'),
+        ]
+
+    def clean(self):
+        # booked ไม่อยู่ในฟอร์ม admin -> Django ข้าม CheckConstraint ตอน validate ต้องเช็คเอง
+        if self.capacity is not None and self.capacity < self.booked:
+            raise ValidationError({'capacity': f"Capacity cannot be lower than the {self.booked} orders already booked."})
+
+    def __str__(self):
+        return f"{timezone.localtime(self.starts_at):%Y-%m-%d %H:%M} ({self.booked}/{self.capacity})"
+
+
+class SchedulerLease(models.Model):
+    """แถว lock สำหรับเลือก leader ของ scheduler (menu/scheduler.py) -> ทั้ง fleet มีคนรันงานคนเดียว"""
+
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=100, blank=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.holder or '-'} until {self.expires_at:%H:%M:%S}"
+
+
+class ScheduledJobState(models.Model):
+    """สถิติการรันของงานแต่ละตัวของ scheduler (อัปเดตหลังรันทุกครั้ง)"""
+
+    name = models.CharField(max_length=100, unique=True)
+    last_started_at = models.DateTimeField(blank=True, null=True)
+    last_duration_ms = models.FloatField(default=0)
+    last_ok = models.BooleanField(default=True)
+    last_error = models.TextField(blank=True)
+    last_holder = models.CharField(max_length=100, blank=True)
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    timeouts = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.runs} runs, {self.failures} failures"
+
+
 class Category(models.Model):
+    kitchen = models.ForeignKey(Kitchen, on_delete=models.PROTECT, default=default_kitchen_id, related_name='categories')
     name = models.CharField(max_length=100)
 
     def __str__(self):
@@ -94,3 +346,69 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(fields=['kitchen', 'name'], name='category_kitchen_name_idx'),
+        ]
+
+
+class Promotion(models.Model):
+    """
+    โปรโมชัน (แก้ใน admin) ถูกคอมไพล์เป็น rule ใน memory (menu/promotions.py)
+    แล้วใช้คิดราคาตอน quote ตะกร้า / สร้างออเดอร์ โดยไม่ query DB ต่อ rule
+    ขอบเขต: menu_items (ว่าง = ทุกเมนู) และ/หรือ category, แต่ละชิ้นได้ส่วนลดจากโปรเดียว (priority น้อยคิดก่อน)
+    """
+
+    KIND_CHOICES = [
+        ('PERCENT', 'Percentage off'),
+        ('BUY_X_GET_Y', 'Buy X get Y free'),
+        ('BUNDLE', 'Bundle price'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    is_active = models.BooleanField(default=True)
+    priority = models.PositiveSmallIntegerField(default=100)
+
+    menu_items = models.ManyToManyField(MenuItem, blank=True, related_name='promotions')
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+
+    # PERCENT: ลด percent% / BUY_X_GET_Y: ซื้อ buy_quantity แถม free_quantity (ชิ้นถูกสุดของแต่ละชุดฟรี)
+    # BUNDLE: ทุก buy_quantity ชิ้น (ในขอบเขต) ราคา bundle_price
+    percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    buy_quantity = models.PositiveSmallIntegerField(null=True, blank=True)
+    free_quantity = models.PositiveSmallIntegerField(null=True, blank=True)
+    bundle_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    # ช่วงเวลา: starts_at..ends_at, วันในสัปดาห์ (0=จันทร์ ... 6=อาทิตย์), ช่วงเวลาในวัน (ข้ามเที่ยงคืนได้)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    days_of_week = models.CharField(max_length=7, blank=True, help_text="Digits 0 (Mon) to 6 (Sun), e.g. '01234'. Empty = every day.")
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['priority', 'id']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        errors = {}
+        if self.kind == 'PERCENT' and not (self.percent and 0 < self.percent <= 100):
+            errors['percent'] = "Percentage promotions need a percent between 0 and 100."
+        if self.kind in ('BUY_X_GET_Y', 'BUNDLE') and not self.buy_quantity:
+            errors['buy_quantity'] = "This promotion type needs a buy quantity."
+        if self.kind == 'BUY_X_GET_Y' and not self.free_quantity:
+            errors['free_quantity'] = "Buy X get Y promotions need a free quantity."
+        if self.kind == 'BUNDLE' and self.bundle_price is None:
+            errors['bundle_price'] = "Bundle promotions need a bundle price."
+        if self.days_of_week and not all(day in '0123456' for day in self.days_of_week):
+            errors['days_of_week'] = "Use digits 0 (Mon) to 6 (Sun)."
+        if (self.start_time is None) != (self.end_time is None):
+            errors['end_time'] = "Set both start and end time, or neither."
+        if self.starts_at and self.ends_at and self.ends_at <= self.starts_at:
+            errors['ends_at'] = "End must be after start."
+        if errors:
+            raise ValidationError(errors)
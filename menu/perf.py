@@ -0,0 +1,145 @@
+# menu/perf.py
+
+import math
+import threading
+import time
+
+# =======================================================
+#               PERF / BENCHMARK HELPERS
+# =======================================================
+# ใช้ร่วมกันระหว่าง management command ที่วัดผล (loadtest, bench_*)
+
+
+def percentile(values, pct):
+    """percentile แบบ linear interpolation (pct 0-100) ของ list ที่ยังไม่ได้เรียง"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else 0.0,
+    }
+
+
+class StageStats:
+    """เก็บ latency (วินาที) และจำนวน error ต่อ stage แบบ thread-safe"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.order = []
+
+    def record(self, stage, seconds, ok=True):
+        with self.lock:
+            if stage not in self.latencies:
+                self.latencies[stage] = []
+                self.errors[stage] = 0
+                self.order.append(stage)
+            self.latencies[stage].append(seconds)
+            if not ok:
+                self.errors[stage] += 1
+
+    def timed(self, stage):
+        return _Timer(self, stage)
+
+    def rows(self, elapsed):
+        rows = []
+        for stage in self.order:
+            latencies = self.latencies[stage]
+            summary = summarize(latencies)
+            rows.append({
+                'stage': stage,
+                'count': summary['count'],
+                'errors': self.errors[stage],
+                'error_rate': self.errors[stage] / summary['count'] if summary['count'] else 0.0,
+                'rps': summary['count'] / elapsed if elapsed else 0.0,
+                'p50_ms': summary['p50'] * 1000,
+                'p95_ms': summary['p95'] * 1000,
+                'p99_ms': summary['p99'] * 1000,
+                'max_ms': summary['max'] * 1000,
+            })
+        return rows
+
+
+class _Timer:
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+        self.ok = True
+
+    def fail(self):
+        self.ok = False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.record(self.stage, time.perf_counter() - self.started, ok=self.ok and exc_type is None)
+        # ไม่กลืน exception: ให้คนเรียกตัดสินใจว่าจะหยุด journey หรือไม่
+        return False
+
+
+def format_table(rows, columns):
+    """แปลง list ของ dict เป็นตารางข้อความ (columns = [(key, header, format)])"""
+    header = [title for _, title, _ in columns]
+    body = [[fmt.format(row[key]) for key, _, fmt in columns] for row in rows]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *body)]
+    lines = ["  ".join(str(cell).rjust(width) for cell, width in zip(header, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    for row in body:
+        lines.append("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def parse_importtime(text):
+    """
+    แปลง output ของ `python -X importtime` เป็น list ของ dict
+    (name, self_us, cumulative_us, depth) ตามลำดับที่ import เสร็จ (depth 0 = import ชั้นบนสุด)
+    """
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, raw_name = line[len('import time:'):].split('|', 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            # บรรทัด header ("self [us] | cumulative | ...")
+            continue
+        name = raw_name.lstrip()
+        rows.append({
+            'name': name.strip(),
+            'self_us': self_us,
+            'cumulative_us': cumulative_us,
+            'depth': (len(raw_name) - len(name)) // 2,
+        })
+
+    if rows:
+        top = min(row['depth'] for row in rows)
+        for row in rows:
+            row['depth'] -= top
+    return rows
+
+
+def import_cost_by_package(rows):
+    """รวม self time ของทุก module ตาม package ชั้นบนสุด (เช่น cloudinary, rest_framework)"""
+    totals = {}
+    for row in rows:
+        package = row['name'].split('.')[0]
+        entry = totals.setdefault(package, {'package': package, 'modules': 0, 'self_ms': 0.0})
+        entry['modules'] += 1
+        entry['self_ms'] += row['self_us'] / 1000
+    return sorted(totals.values(), key=lambda entry: -entry['self_ms'])
@@ -0,0 +1,227 @@
+# menu/promotions.py
+
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Promotion
+
+# =======================================================
+#           PROMOTION RULES (compiled, in-memory)
+# =======================================================
+# - Promotion ที่ active ถูกคอมไพล์เป็น Rule ครั้งเดียว แล้วเก็บไว้ใน memory ของ process
+#   ผ่าน get_menu_payload('promotions') -> build ใหม่เมื่อเวอร์ชันเมนูถูก bump (menu/signals.py) หรือหมด TTL
+# - คิดราคาตะกร้า (quote_cart) ใช้แค่ข้อมูลใน memory: ไม่มี query ต่อ rule
+# - rule เรียงตาม priority, แต่ละชิ้นในตะกร้าได้ส่วนลดจาก rule แรกที่ใช้กับมันได้เท่านั้น (ไม่ซ้อนโปร)
+# - buy X get Y / bundle คิดจากชิ้นที่แพงก่อน: ชิ้นที่ฟรี / ส่วนต่างราคา bundle ตกที่ชิ้นถูกกว่าในแต่ละชุด
+
+CENT = Decimal('0.01')
+
+
+def money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class CartLine:
+    def __init__(self, menu_item_id, name, price, quantity, category_id=None):
+        self.menu_item_id = menu_item_id
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.category_id = category_id
+
+    @classmethod
+    def from_menu_item(cls, menu_item, quantity):
+        return cls(menu_item.id, menu_item.name, menu_item.price, quantity, menu_item.category_id)
+
+    @property
+    def line_total(self):
+        return self.price * self.quantity
+
+
+class Rule:
+    def __init__(self, promotion, item_ids=()):
+        self.id = promotion.id
+        self.name = promotion.name
+        self.kind = promotion.kind
+        self.item_ids = frozenset(item_ids)
+        self.category_id = promotion.category_id
+        self.rate = promotion.percent / 100 if promotion.percent else Decimal(0)
+        self.buy = promotion.buy_quantity or 0
+        self.free = promotion.free_quantity or 0
+        self.bundle_price = promotion.bundle_price
+        self.starts_at = promotion.starts_at
+        self.ends_at = promotion.ends_at
+        self.days = frozenset(int(day) for day in promotion.days_of_week) if promotion.days_of_week else None
+        self.start_time = promotion.start_time
+        self.end_time = promotion.end_time
+
+    def is_live(self, now):
+        if self.starts_at and now < self.starts_at:
+            return False
+        if self.ends_at and now >= self.ends_at:
+            return False
+        local = timezone.localtime(now)
+        if self.days is not None and local.weekday() not in self.days:
+            return False
+        if self.start_time is not None and self.end_time is not None:
+            current = local.time()
+            if self.start_time <= self.end_time:
+                return self.start_time <= current < self.end_time
+            # เช่น 22:00-02:00 (ข้ามเที่ยงคืน)
+            return current >= self.start_time or current < self.end_time
+        return True
+
+    def matches(self, line):
+        return (
+            (not self.item_ids or line.menu_item_id in self.item_ids)
+            and (self.category_id is None or line.category_id == self.category_id)
+        )
+
+    def apply(self, lines, remaining):
+        """remaining[i] = จำนวนชิ้นของ lines[i] ที่ยังไม่ได้ส่วนลด -> คืนส่วนลด และหักชิ้นที่ rule นี้ใช้ไปออกจาก remaining"""
+        pool = [index for index, line in enumerate(lines) if remaining[index] and self.matches(line)]
+        if not pool:
+            return Decimal(0)
+
+        if self.kind == 'PERCENT':
+            discount = sum(lines[index].price * remaining[index] for index in pool) * self.rate
+            for index in pool:
+                remaining[index] = 0
+            return discount
+
+        pool.sort(key=lambda index: lines[index].price, reverse=True)
+        if self.kind == 'BUY_X_GET_Y':
+            return self._apply_buy_x_get_y(lines, remaining, pool)
+        if self.kind == 'BUNDLE':
+            return self._apply_bundle(lines, remaining, pool)
+        return Decimal(0)
+
+    def _apply_buy_x_get_y(self, lines, remaining, pool):
+        size = self.buy + self.free
+        limit = sum(remaining[index] for index in pool) // size * size
+
+        def free_before(position):
+            # จำนวนชิ้นฟรีในตำแหน่ง [0, position): ทุกชุด size ชิ้น ชิ้นที่ buy+1..size ฟรี
+            return position // size * self.free + max(0, position % size - self.buy)
+
+        # เดินทีละบรรทัด (ไม่แตกเป็นทีละชิ้น) -> quantity เยอะแค่ไหนก็ O(จำนวนบรรทัด)
+        discount = Decimal(0)
+        position = 0
+        for index in pool:
+            take = min(remaining[index], limit - position)
+            if take <= 0:
+                break
+            discount += lines[index].price * (free_before(position + take) - free_before(position))
+            remaining[index] -= take
+            position += take
+        return discount
+
+    def _apply_bundle(self, lines, remaining, pool):
+        # ชิ้นเรียงแพงก่อน แบ่งเป็นชุดละ buy ชิ้นตามลำดับ -> ราคารวมของชุดที่ k ไม่เพิ่มขึ้นตาม k
+        # หาจำนวนชุดที่ยังคุ้ม (ราคารวม > bundle_price) ด้วย binary search บน prefix sum ของแต่ละบรรทัด
+        # -> O(จำนวนบรรทัด + log จำนวนชุด) ไม่ขึ้นกับ quantity
+        starts, values, position, value = [], [], 0, Decimal(0)
+        for index in pool:
+            starts.append(position)
+            values.append(value)
+            position += remaining[index]
+            value += lines[index].price * remaining[index]
+
+        def value_before(position):
+            # ราคารวมของชิ้นในตำแหน่ง [0, position)
+            line = bisect_right(starts, position) - 1
+            return values[line] + lines[pool[line]].price * (position - starts[line])
+
+        def worth_it(group):
+            return value_before((group + 1) * self.buy) - value_before(group * self.buy) > self.bundle_price
+
+        low, high = 0, position // self.buy
+        while low < high:
+            middle = (low + high + 1) // 2
+            if worth_it(middle - 1):
+                low = middle
+            else:
+                high = middle - 1
+
+        taken = low * self.buy
+        discount = value_before(taken) - low * self.bundle_price
+        for index in pool:
+            take = min(remaining[index], taken)
+            remaining[index] -= take
+            taken -= take
+        return discount
+
+class Quote:
+    def __init__(self, lines, promotions):
+        self.lines = lines
+        self.promotions = promotions
+        self.subtotal = sum((line.line_total for line in lines), Decimal(0))
+        self.discount_total = min(sum((promotion['amount'] for promotion in promotions), Decimal(0)), self.subtotal)
+        self.total = self.subtotal - self.discount_total
+
+    def applied_promotions(self):
+        """สำหรับเก็บใน Order.applied_promotions (JSON)"""
+        return [
+            {'id': promotion['id'], 'name': promotion['name'], 'amount': f"{promotion['amount']:.2f}"}
+            for promotion in self.promotions
+        ]
+
+    def as_dict(self):
+        return {
+            'items': [
+                {
+                    'id': line.menu_item_id,
+                    'name': line.name,
+                    'quantity': line.quantity,
+                    'price': f"{line.price:.2f}",
+                    'line_total': f"{line.line_total:.2f}",
+                }
+                for line in self.lines
+            ],
+            'subtotal': f"{self.subtotal:.2f}",
+            'discount_total': f"{self.discount_total:.2f}",
+            'total': f"{self.total:.2f}",
+            'promotions': self.applied_promotions(),
+        }
+
+
+def compile_rules(now=None):
+    """Promotion ที่ active และยังไม่หมดอายุ -> [Rule] (2 query: promotion + menu_items ของทุกโปร)"""
+    now = now or timezone.now()
+    promotions = list(
+        Promotion.objects.filter(is_active=True)
+        .filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+        .order_by('priority', 'id')
+    )
+    item_ids = defaultdict(set)
+    links = Promotion.menu_items.through.objects.filter(promotion__in=[promotion.id for promotion in promotions])
+    for promotion_id, menu_item_id in links.values_list('promotion_id', 'menuitem_id'):
+        item_ids[promotion_id].add(menu_item_id)
+    return [Rule(promotion, item_ids[promotion.id]) for promotion in promotions]
+
+
+def get_rules(kitchen_id=None):
+    # import ตอนเรียก: menu/cache.py -> serializers -> services -> promotions (import วน)
+    from .cache import get_menu_payload
+
+    # โปรโมชันใช้ได้ทุกครัว แต่ cache ตามเวอร์ชันเมนูของแต่ละครัว (เปลี่ยนโปร = bump ทุกครัว ดู menu/signals.py)
+    return get_menu_payload('promotions', compile_rules, kitchen_id=kitchen_id)
+
+
+def quote_cart(lines, now=None, rules=None, kitchen_id=None):
+    """lines = [CartLine] -> Quote (ราคาก่อน/หลังส่วนลด และโปรที่ใช้)"""
+    now = now or timezone.now()
+    rules = get_rules(kitchen_id) if rules is None else rules
+    remaining = [line.quantity for line in lines]
+    applied = []
+    for rule in rules:
+        if not rule.is_live(now):
+            continue
+        amount = money(rule.apply(lines, remaining))
+        if amount > 0:
+            applied.append({'id': rule.id, 'name': rule.name, 'amount': amount})
+    return Quote(lines, applied)
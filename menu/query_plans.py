@@ -0,0 +1,241 @@
+# menu/query_plans.py
+
+import json
+import random
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+from .models import Category, Kitchen, MenuItem, Order
+
+# =======================================================
+#           QUERY PLAN REGRESSION HARNESS
+# =======================================================
+# รัน query ที่ถูกเรียกบ่อยที่สุดผ่าน code จริง (view / builder) บนข้อมูลที่ seed ไว้
+# แล้ว EXPLAIN ทุก SELECT ที่ยิงออกไป -> ผิดถ้า:
+# - ต้องอ่านทั้งตาราง (SQLite: "SCAN <table>" ที่ไม่มี USING INDEX, PostgreSQL: Seq Scan)
+# - PostgreSQL: จำนวนแถวที่ planner ประเมินว่าต้องอ่าน (Plan Rows, นับใต้ Limit ไม่เกิน Limit) เกินงบของ query นั้น
+#   (SQLite ไม่มีค่าประมาณจำนวนแถว -> เช็คแค่ scan)
+# PostgreSQL: ปิด enable_seqscan ระหว่าง EXPLAIN -> ถ้ายังได้ Seq Scan แปลว่าไม่มี index ที่ใช้ได้เลย
+# (ตารางที่ seed ไว้เล็ก planner จะเลือก Seq Scan เองเพราะถูกกว่า ไม่ได้แปลว่า index หาย)
+# ใช้โดย manage.py check_query_plans และ QueryPlanTest (ทุกอย่างอยู่ใน transaction ที่ rollback ตอนจบ)
+
+SEED_ORDERS = 2000
+SEED_MENU_ITEMS = 200
+SEED_DAYS = 30
+PLAN_KITCHEN_SLUG = 'query-plan-check'
+# ตาราง lookup เล็กๆ ที่อ่านทั้งตารางได้ (เช่น ตัวเลือกครัวใน list_filter ของ admin)
+SMALL_TABLES = {Kitchen._meta.db_table}
+
+# name, ฟังก์ชันที่รัน query (รับ dict จาก seed), งบจำนวนแถวต่อ statement
+HotQuery = namedtuple('HotQuery', ['name', 'run', 'max_rows'])
+PlanResult = namedtuple('PlanResult', ['query', 'sql', 'plan', 'rows', 'problems'])
+
+
+class _Rollback(Exception):
+    pass
+
+
+# =======================================================
+#               SEED
+# =======================================================
+
+def seed(orders=SEED_ORDERS, menu_items=SEED_MENU_ITEMS, days=SEED_DAYS):
+    """ข้อมูลตัวอย่างสองครัว (bulk, ไม่ผ่าน signal) -> dict ที่ hot query ใช้"""
+    rng = random.Random(0)
+    kitchens = [Kitchen.objects.get_or_create(slug=PLAN_KITCHEN_SLUG, defaults={'name': "Query plan check"})[0]]
+    kitchens.append(Kitchen.objects.exclude(id=kitchens[0].id).filter(is_active=True).order_by('id').first() or kitchens[0])
+
+    categories = Category.objects.bulk_create([
+        Category(kitchen=kitchen, name=f"หมวด {index}") for kitchen in kitchens for index in range(10)
+    ])
+    MenuItem.objects.bulk_create([
+        MenuItem(
+            kitchen=kitchens[index % 2],
+            category=categories[(index % 2) * 10 + index % 10],
+            name=f"เมนู {index}",
+            price=Decimal(rng.randint(4000, 20000)) / 100,
+            is_available=index % 7 != 0,
+        )
+        for index in range(menu_items)
+    ])
+
+    now = timezone.now()
+    statuses = [status for status, _ in Order.STATUS_CHOICES]
+    rows = Order.objects.bulk_create([
+        Order(
+            kitchen=kitchens[index % 2],
+            customer_name=f"ลูกค้า {index}",
+            customer_phone=f"08{rng.randint(10000000, 99999999)}",
+            customer_address="-",
+            total_price=Decimal(rng.randint(5000, 90000)) / 100,
+            status=rng.choice(statuses),
+            payment_status='PAID' if index % 3 else 'UNPAID',
+            payment_intent_id=f"pi_plan_{index}",
+        )
+        for index in range(orders)
+    ])
+    # created_at เป็น auto_now_add -> กระจายย้อนหลังด้วย bulk_update (ไม่เรียก pre_save)
+    for index, order in enumerate(rows):
+        order.created_at = now - timedelta(minutes=index * days * 24 * 60 // max(orders, 1))
+    Order.objects.bulk_update(rows, ['created_at'], batch_size=500)
+
+    if connection.vendor == 'postgresql':
+        # ให้ planner เห็นขนาดตารางจริงหลัง seed
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Order._meta.db_table}, {MenuItem._meta.db_table}, {Category._meta.db_table}")
+
+    paid = next(order for order in rows if order.payment_status == 'PAID')
+    return {
+        'kitchen_id': kitchens[0].id,
+        'payment_intent_id': paid.payment_intent_id,
+        'user': User(username='query-plan', is_active=True, is_staff=True, is_superuser=True),
+        'factory': RequestFactory(),
+    }
+
+
+# =======================================================
+#               HOT QUERIES
+# =======================================================
+# import ตอนเรียก: views / admin import ทั้งแอป (harness นี้ถูก import จาก management command)
+
+def run_menu_list(context):
+    from .cache import build_menu_items
+
+    # /api/items/ ตอบจาก cache, DB ถูกอ่านตอน build payload ของครัว
+    build_menu_items(context['kitchen_id'])
+
+
+def run_admin_order_page(context):
+    from django.contrib import admin
+
+    request = context['factory'].get('/admin/menu/order/', {'kitchen__id__exact': context['kitchen_id']})
+    request.user = context['user']
+    request.resolver_match = resolve('/admin/menu/order/')
+    changelist = admin.site._registry[Order].get_changelist_instance(request)
+    list(changelist.result_list)
+
+
+def run_stats_rollup(context):
+    from .views import dashboard_stats
+
+    dashboard_stats(Order.objects.filter(kitchen_id=context['kitchen_id']))
+
+
+def run_payment_intent_lookup(context):
+    from .views import PaymentStatusAPIView
+
+    request = context['factory'].get(f"/api/payment/status/{context['payment_intent_id']}/")
+    PaymentStatusAPIView.as_view()(request, payment_intent_id=context['payment_intent_id'])
+
+
+def run_simulator_webhook_lock(context):
+    from .webhooks import SimulatorWebhookAPIView
+
+    # ออเดอร์ที่จ่ายแล้ว -> view หยุดหลัง select_for_update (ไม่แจ้ง Telegram / ไม่เขียน)
+    body = json.dumps({'intent_id': context['payment_intent_id'], 'status': 'success'})
+    request = context['factory'].post('/api/webhook/simulator/', body, content_type='application/json')
+    SimulatorWebhookAPIView.as_view()(request)
+
+
+HOT_QUERIES = [
+    HotQuery('menu list', run_menu_list, 1000),
+    # count ของ changelist ถูกจำกัดที่ EstimatedCountPaginator.max_count แถว
+    HotQuery('admin order page', run_admin_order_page, 10000),
+    # total_orders_count นับทั้งครัว (index only) -> งบเท่ากับ count ของ admin
+    HotQuery('stats rollup', run_stats_rollup, 10000),
+    HotQuery('payment intent lookup', run_payment_intent_lookup, 1),
+    HotQuery('simulator webhook lock', run_simulator_webhook_lock, 1),
+]
+
+
+# =======================================================
+#               EXPLAIN
+# =======================================================
+
+def capture_selects(run, context):
+    """รัน hot query หนึ่งตัว -> [(sql, params)] ของทุก SELECT ที่ยิงออกไป"""
+    statements = []
+
+    def wrapper(execute, sql, params, many, execute_context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            statements.append((sql, params))
+        return execute(sql, params, many, execute_context)
+
+    with connection.execute_wrapper(wrapper):
+        run(context)
+    return statements
+
+
+def sqlite_plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        details = [row[-1] for row in cursor.fetchall()]
+    # "SCAN x USING (COVERING) INDEX" = ไล่ index ตามลำดับ (ORDER BY + LIMIT), "SCAN subquery" = ผลของ subquery ไม่ใช่ตาราง
+    tables = set(connection.introspection.table_names()) - SMALL_TABLES
+    problems = [
+        f"full table scan: {detail}"
+        for detail in details
+        if detail.startswith('SCAN ') and ' USING ' not in detail and detail.split()[1] in tables
+    ]
+    return "\n".join(details), None, problems
+
+
+def _walk(node, cap=None):
+    """node ของ EXPLAIN (FORMAT JSON) -> (node, จำนวนแถวที่ประเมิน โดยใต้ Limit ไม่เกินค่าของ Limit)"""
+    rows = node.get('Plan Rows', 0)
+    rows = rows if cap is None else min(rows, cap)
+    yield node, rows
+    child_cap = rows if node.get('Node Type') == 'Limit' else cap
+    for child in node.get('Plans', []):
+        yield from _walk(child, child_cap)
+
+
+def postgresql_plan(sql, params, max_rows):
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        cursor.execute('SET LOCAL enable_seqscan = on')
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    nodes = list(_walk(plan[0]['Plan']))
+    problems = [
+        f"sequential scan on {node.get('Relation Name')}"
+        for node, _ in nodes
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') not in SMALL_TABLES
+    ]
+    rows = max((rows for node, rows in nodes if node.get('Relation Name', SMALL_TABLES) not in SMALL_TABLES), default=0)
+    if rows > max_rows:
+        problems.append(f"estimated {rows:,} rows, budget is {max_rows:,}")
+    return json.dumps(plan, indent=2), rows, problems
+
+
+def explain(sql, params, max_rows):
+    """-> (ข้อความ plan, จำนวนแถวที่ประเมิน หรือ None, [ปัญหา])"""
+    if connection.vendor == 'postgresql':
+        return postgresql_plan(sql, params, max_rows)
+    if connection.vendor == 'sqlite':
+        return sqlite_plan(sql, params)
+    raise NotImplementedError(f"EXPLAIN checks are not implemented for {connection.vendor}")
+
+
+def check_query_plans(queries=HOT_QUERIES, **seed_options):
+    """seed -> รัน + EXPLAIN ทุก hot query -> [PlanResult] แล้ว rollback ทั้งหมด"""
+    results = []
+    try:
+        with transaction.atomic():
+            context = seed(**seed_options)
+            for query in queries:
+                for sql, params in capture_selects(query.run, context):
+                    plan, rows, problems = explain(sql, params, query.max_rows)
+                    results.append(PlanResult(query.name, sql, plan, rows, problems))
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
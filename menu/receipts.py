@@ -0,0 +1,252 @@
+# menu/receipts.py
+
+import hashlib
+import hmac
+import io
+import json
+import os
+import uuid
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Order
+from .services import get_items_summary
+
+# =======================================================
+#               RECEIPTS (PNG + HTML)
+# =======================================================
+# - ใบเสร็จของออเดอร์หนึ่ง render จากแถว Order แถวเดียว (items_summary ไม่ต้อง join OrderItem)
+# - cache บน disk แบบ content-addressed: ชื่อไฟล์ = sha256 ของข้อมูลที่พิมพ์บนใบเสร็จ + RECEIPT_LAYOUT
+#   -> ข้อมูลเปลี่ยน (เช่น จ่ายเงินแล้ว) = hash ใหม่ = render ใหม่, ไม่ต้องสั่งล้าง cache เอง
+#   -> status การจัดส่งไม่อยู่บนใบเสร็จ: PREPARING -> DELIVERING -> COMPLETED ใช้ไฟล์เดิม
+# - ขอซ้ำ = query แถวเดียว + อ่านไฟล์ (แตะ mtime ไว้ทำ LRU) ไม่ render ใหม่
+# - เขียนไฟล์ใหม่แล้วลบไฟล์ที่ mtime เก่าสุดจนขนาดรวมไม่เกิน RECEIPT_CACHE_MAX_BYTES
+# - ลูกค้าเปิดได้ด้วย ?token=<receipt_token> (ส่งไปพร้อม receipt_url ตอนสั่งอาหาร), admin เปิดได้ทุกใบ
+
+# เปลี่ยนเลขนี้เมื่อแก้หน้าตาใบเสร็จ -> ทุกใบได้ hash ใหม่ ไฟล์เก่าถูก LRU ไล่ออกเอง
+RECEIPT_LAYOUT = 1
+TOKEN_DIGEST_LENGTH = 20
+FORMATS = {
+    'png': 'image/png',
+    'html': 'text/html; charset=utf-8',
+}
+# เฉพาะคอลัมน์ที่ใช้บนใบเสร็จ
+RECEIPT_FIELDS = (
+    'id', 'kitchen__name', 'created_at', 'scheduled_for', 'customer_name', 'customer_address',
+    'total_price', 'discount_total', 'applied_promotions', 'items_summary', 'payment_status',
+)
+
+PNG_WIDTH = 576  # กระดาษใบเสร็จ 80mm ที่ 203 dpi
+PNG_MARGIN = 24
+PNG_FONT_SIZE = 22
+PNG_LINE_HEIGHT = 32
+
+PAYMENT_LABELS = {
+    'UNPAID': "ยังไม่ชำระ",
+    'PAID': "ชำระแล้ว",
+    'FAILED': "ชำระไม่สำเร็จ",
+    'REFUNDED': "คืนเงินแล้ว",
+}
+
+
+def receipt_token(order_id):
+    message = f"receipt:{order_id}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:TOKEN_DIGEST_LENGTH]
+
+
+def check_receipt_token(order_id, token):
+    return hmac.compare_digest(token or '', receipt_token(order_id))
+
+
+def receipt_url(order_id, fmt='html'):
+    return f"/api/orders/{order_id}/receipt.{fmt}?token={receipt_token(order_id)}"
+
+
+# =======================================================
+#               DATA + VERSION HASH
+# =======================================================
+
+def receipt_queryset():
+    return Order.objects.select_related('kitchen').only(*RECEIPT_FIELDS)
+
+
+def receipt_data(order):
+    """Order -> dict ของทุกอย่างที่พิมพ์บนใบเสร็จ (string ล้วน -> hash ได้ตรงๆ)"""
+    items = [
+        {
+            'name': item['name'],
+            'quantity': item['quantity'],
+            'price': item['price'],
+            'amount': f"{Decimal(item['price']) * item['quantity']:.2f}",
+        }
+        for item in get_items_summary(order)
+    ]
+    return {
+        'order_id': order.id,
+        'kitchen': order.kitchen.name,
+        'created_at': f"{timezone.localtime(order.created_at):%d/%m/%Y %H:%M}",
+        'scheduled_for': f"{timezone.localtime(order.scheduled_for):%d/%m/%Y %H:%M}" if order.scheduled_for else '',
+        'customer_name': order.customer_name,
+        'customer_address': order.customer_address,
+        'items': items,
+        'subtotal': f"{sum(Decimal(item['amount']) for item in items):.2f}",
+        'promotions': [
+            {'name': promotion['name'], 'amount': f"{Decimal(str(promotion['amount'])):.2f}"}
+            for promotion in order.applied_promotions or []
+        ],
+        'discount_total': f"{order.discount_total:.2f}",
+        'total_price': f"{order.total_price:.2f}",
+        'payment_status': PAYMENT_LABELS.get(order.payment_status, order.payment_status),
+    }
+
+
+def receipt_version(data):
+    encoded = json.dumps([RECEIPT_LAYOUT, data], ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# =======================================================
+#               RENDERERS
+# =======================================================
+
+def render_html(data):
+    return render_to_string('menu/receipt.html', {'receipt': data}).encode()
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    from PIL import ImageFont
+
+    # ฟอนต์ default ของ Pillow ไม่มีตัวอักษรไทย -> production ตั้ง RECEIPT_FONT_PATH เป็นไฟล์ .ttf ที่มีภาษาไทย (เช่น Noto Sans Thai)
+    path = getattr(settings, 'RECEIPT_FONT_PATH', '')
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError as e:
+            print(f"WARNING: could not load receipt font {path}: {e}")
+    return ImageFont.load_default(size)
+
+
+def _png_lines(data):
+    """-> [(ข้อความซ้าย, ข้อความขวา)] ทีละบรรทัด, None = เส้นคั่น"""
+    lines = [(data['kitchen'], ''), (f"Order #{data['order_id']}", data['created_at'])]
+    if data['scheduled_for']:
+        lines.append(("นัดส่ง", data['scheduled_for']))
+    lines += [(data['customer_name'], ''), None]
+    lines += [(f"{item['name']} x{item['quantity']}", item['amount']) for item in data['items']]
+    lines += [None, ("รวม", data['subtotal'])]
+    lines += [(promotion['name'], f"-{promotion['amount']}") for promotion in data['promotions']]
+    lines += [("ยอดสุทธิ", f"฿{data['total_price']}"), ("การชำระเงิน", data['payment_status'])]
+    return lines
+
+
+def render_png(data):
+    from PIL import Image, ImageDraw
+
+    font = _font(PNG_FONT_SIZE)
+    lines = _png_lines(data)
+    image = Image.new('L', (PNG_WIDTH, PNG_MARGIN * 2 + PNG_LINE_HEIGHT * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    right = PNG_WIDTH - PNG_MARGIN
+
+    for index, line in enumerate(lines):
+        top = PNG_MARGIN + index * PNG_LINE_HEIGHT
+        if line is None:
+            middle = top + PNG_LINE_HEIGHT // 2
+            draw.line([(PNG_MARGIN, middle), (right, middle)], fill=128, width=1)
+            continue
+        left_text, right_text = line
+        draw.text((PNG_MARGIN, top), left_text, font=font, fill=0)
+        if right_text:
+            draw.text((right, top), right_text, font=font, fill=0, anchor='ra')
+
+    buffer = io.BytesIO()
+    # greyscale + optimize -> ใบละไม่กี่ KB
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'png': render_png,
+    'html': render_html,
+}
+
+
+# =======================================================
+#               CONTENT-ADDRESSED DISK CACHE
+# =======================================================
+
+def cache_dir():
+    return settings.RECEIPT_CACHE_DIR
+
+
+def _write(path, content):
+    # เขียนไฟล์ชั่วคราวแล้ว rename -> คนที่อ่านพร้อมกันไม่เจอไฟล์ครึ่งๆ, render ซ้อนกันก็ได้ไฟล์เดียวกัน
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def evict(max_bytes=None):
+    """ลบไฟล์ที่ถูกใช้ล่าสุดนานที่สุด (mtime เก่าสุด) จนขนาดรวมไม่เกิน max_bytes -> จำนวนไฟล์ที่ลบ"""
+    max_bytes = settings.RECEIPT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(cache_dir()) as scan:
+        for entry in scan:
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def get_receipt(order, fmt):
+    """Order -> (bytes, version) ของใบเสร็จ; มีไฟล์แล้ว = อ่านไฟล์ ไม่ render"""
+    data = receipt_data(order)
+    version = receipt_version(data)
+    path = os.path.join(cache_dir(), f"{version}.{fmt}")
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        # LRU: ไฟล์ที่ถูกอ่านเลื่อนไปท้ายคิวการลบ
+        os.utime(path)
+        return content, version
+    except FileNotFoundError:
+        pass
+
+    content = RENDERERS[fmt](data)
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        _write(path, content)
+        evict()
+    except OSError as e:
+        # disk เต็ม / read-only -> ยังตอบใบเสร็จได้ แค่ไม่ได้ cache
+        print(f"WARNING: could not cache receipt for Order {order.id}: {e}")
+    return content, version
+
+
+def receipt_photo(order):
+    """PNG สำหรับแนบข้อความ Telegram "จัดส่งสำเร็จ" (None = ไม่แนบ: ปิดไว้ / render ไม่ได้ -> ส่งข้อความอย่างเดียว)"""
+    if not getattr(settings, 'RECEIPT_ON_COMPLETED', False):
+        return None
+    try:
+        return get_receipt(order, 'png')[0]
+    except Exception as e:
+        print(f"WARNING: could not render receipt for Order {order.id}: {e}")
+        return None
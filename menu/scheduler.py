@@ -0,0 +1,324 @@
+# menu/scheduler.py
+
+import importlib
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ScheduledJobState, SchedulerLease
+
+# =======================================================
+#           IN-PROCESS PERIODIC JOB SCHEDULER
+# =======================================================
+# - งานลงทะเบียนด้วย @periodic(...) ใน module ที่อยู่ใน settings.SCHEDULER_JOB_MODULES (เช่น menu/jobs.py)
+# - ทุก process ที่รัน scheduler (gunicorn worker เมื่อ SCHEDULER_IN_WEB=1 หรือ manage.py run_scheduler)
+#   แย่งกันถือ SchedulerLease แถวเดียวกัน -> ทั้ง fleet มี leader คนเดียวที่รันงานจริง
+# - leader ต่ออายุ lease ทุก 1/3 ของอายุ lease, ถ้า process ตาย lease หมดอายุแล้วคนอื่นรับต่อ
+# - แต่ละงานรันใน thread แยก มี jitter กันทุกงานรันพร้อมกัน และ timeout:
+#   thread ฆ่าไม่ได้ -> บน PostgreSQL ตั้ง statement_timeout ให้ connection ของงาน
+#   และไม่เริ่มรอบใหม่ของงานที่ยังไม่จบ (นับเป็น timeout ในสถิติ)
+# - ข้อจำกัดของ timeout: หยุดได้แค่ SQL statement ที่รันนานเกิน บน PostgreSQL เท่านั้น
+#   โค้ด Python ที่วนนาน / รอ HTTP ไม่ถูกหยุด, บน SQLite ไม่มีผลเลย (แค่นับ timeouts ในสถิติ + log เตือน)
+#   สิ่งที่กันได้จริงคือไม่รันงานเดียวกันซ้อน: run_pending และ run_all_now ข้ามงานที่ future ยังไม่จบ
+
+JOBS = {}
+LEASE_NAME = 'scheduler'
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter, timeout):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.next_run = None
+        self.future = None
+        self.started = None
+        self.warned = False
+
+    def schedule_next(self, now):
+        self.next_run = now + self.interval + random.uniform(0, self.jitter)
+
+
+def periodic(interval, jitter=0, timeout=None, name=None):
+    """ลงทะเบียนฟังก์ชันเป็นงานที่รันทุก `interval` วินาที (+ สุ่มเพิ่ม 0..jitter วินาที)"""
+
+    def decorator(func):
+        job_name = name or func.__name__
+        JOBS[job_name] = Job(job_name, func, interval, jitter, timeout or interval)
+        return func
+
+    return decorator
+
+
+def load_jobs():
+    for module in getattr(settings, 'SCHEDULER_JOB_MODULES', []):
+        importlib.import_module(module)
+    return JOBS
+
+
+def default_holder():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class Lease:
+    def __init__(self, name, holder, seconds):
+        self.name = name
+        self.holder = holder
+        self.seconds = seconds
+
+    def acquire(self):
+        """ได้/ต่ออายุ lease ถ้าว่าง หมดอายุแล้ว หรือเป็นของเราอยู่แล้ว"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.seconds)
+        updated = SchedulerLease.objects.filter(
+            Q(holder=self.holder) | Q(expires_at__lt=now) | Q(holder=''),
+            name=self.name,
+        ).update(holder=self.holder, expires_at=expires_at)
+        if updated:
+            return True
+        if SchedulerLease.objects.filter(name=self.name).exists():
+            return False
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(name=self.name, holder=self.holder, expires_at=expires_at)
+            return True
+        except IntegrityError:
+            return False
+
+    def release(self):
+        SchedulerLease.objects.filter(name=self.name, holder=self.holder).update(holder='', expires_at=timezone.now())
+
+
+def _run_job(job, holder):
+    started_at = timezone.now()
+    started = time.perf_counter()
+    error = ''
+    timeout_set = False
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('statement_timeout', %s, false)", [str(int(job.timeout * 1000))])
+            timeout_set = True
+        job.func()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"ERROR: scheduled job {job.name} failed: {error}")
+    finally:
+        if timeout_set:
+            _reset_statement_timeout()
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    try:
+        _record_run(job, holder, started_at, duration_ms, error)
+    finally:
+        # thread ของ executor ถูกใช้ซ้ำ -> ปิด connection ของ thread นี้ทุกครั้ง
+        connections.close_all()
+    return duration_ms, error
+
+
+def _reset_statement_timeout():
+    # statement_timeout ตั้งแบบ session: ต้องคืนค่าก่อนปิด connection
+    # DB_POOL=1 -> close_all() คืน connection เข้า pool ให้ request อื่นใช้ต่อ ไม่ได้ปิดจริง
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("RESET statement_timeout")
+    except Exception as e:
+        # reset ไม่ได้ (connection เสีย) -> ทิ้ง connection นี้ไปเลย ไม่คืนเข้า pool
+        print(f"WARNING: could not reset statement_timeout, discarding connection: {e}")
+        connection.close()
+
+
+def _record_run(job, holder, started_at, duration_ms, error):
+    timed_out = duration_ms > job.timeout * 1000
+    ScheduledJobState.objects.get_or_create(name=job.name)
+    ScheduledJobState.objects.filter(name=job.name).update(
+        last_started_at=started_at,
+        last_duration_ms=duration_ms,
+        last_ok=not error,
+        last_error=error,
+        last_holder=holder,
+        runs=F('runs') + 1,
+        failures=F('failures') + (1 if error else 0),
+        timeouts=F('timeouts') + (1 if timed_out else 0),
+        total_ms=F('total_ms') + duration_ms,
+        max_ms=Greatest(F('max_ms'), duration_ms),
+    )
+
+
+class Scheduler:
+    def __init__(self, jobs=None, lease_name=LEASE_NAME, lease_seconds=None, tick=1.0, holder=None):
+        # สำเนาของงานที่ลงทะเบียนไว้ (เวลารอบถัดไป / งานที่กำลังรัน เป็นของ scheduler ตัวนี้)
+        self.jobs = [
+            Job(job.name, job.func, job.interval, job.jitter, job.timeout)
+            for job in (jobs if jobs is not None else load_jobs()).values()
+        ]
+        self.holder = holder or default_holder()
+        self.lease = Lease(lease_name, self.holder, lease_seconds or getattr(settings, 'SCHEDULER_LEASE_SECONDS', 30))
+        self.tick = tick
+        self.is_leader = False
+        self.lease_checked = None
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.jobs)), thread_name_prefix='scheduler-job')
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def check_lease(self, now):
+        if self.lease_checked is not None and now - self.lease_checked < self.lease.seconds / 3:
+            return self.is_leader
+        self.lease_checked = now
+        was_leader = self.is_leader
+        try:
+            self.is_leader = self.lease.acquire()
+        except Exception as e:
+            print(f"ERROR: scheduler lease check failed: {e}")
+            self.is_leader = False
+        if self.is_leader != was_leader:
+            print(f"Scheduler {self.holder}: {'became leader' if self.is_leader else 'lost leadership'}")
+            if self.is_leader:
+                # leader ใหม่เริ่มรอบแรกของแต่ละงานแบบกระจายกัน
+                for job in self.jobs:
+                    job.next_run = now + random.uniform(0, job.jitter)
+        return self.is_leader
+
+    def run_pending(self, now=None):
+        """รันงานที่ถึงเวลา (เฉพาะ leader) คืนชื่องานที่เริ่มรันในรอบนี้"""
+        now = time.monotonic() if now is None else now
+        if not self.check_lease(now):
+            return []
+
+        started = []
+        for job in self.jobs:
+            if job.future is not None:
+                if not job.future.done():
+                    if not job.warned and now - job.started > job.timeout:
+                        job.warned = True
+                        print(f"WARNING: scheduled job {job.name} is still running after {job.timeout}s")
+                    continue
+                job.future = None
+            if job.next_run is None or now >= job.next_run:
+                job.schedule_next(now)
+                job.started = now
+                job.warned = False
+                job.future = self.executor.submit(_run_job, job, self.holder)
+                started.append(job.name)
+        return started
+
+    def run_all_now(self):
+        """
+        รันทุกงานทันทีหนึ่งรอบแล้วรอจนเสร็จ (ถ้าได้เป็น leader) ใช้กับ manage.py run_scheduler --once
+        งานที่รอบก่อนยังไม่จบ -> ไม่รันซ้อน คืน (0.0, 'skipped: still running')
+        """
+        now = time.monotonic()
+        if not self.check_lease(now):
+            return None
+        futures = {}
+        for job in self.jobs:
+            if job.future is not None and not job.future.done():
+                print(f"WARNING: scheduled job {job.name} is still running; skipped")
+                continue
+            job.started = now
+            job.warned = False
+            job.future = futures[job.name] = self.executor.submit(_run_job, job, self.holder)
+        return {
+            job.name: futures[job.name].result() if job.name in futures else (0.0, 'skipped: still running')
+            for job in self.jobs
+        }
+
+    def run_forever(self):
+        try:
+            while not self.stop_event.is_set():
+                self.run_pending()
+                self.stop_event.wait(self.tick)
+        finally:
+            self.shutdown()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        if self.is_leader:
+            try:
+                self.lease.release()
+            except Exception as e:
+                print(f"ERROR: could not release scheduler lease: {e}")
+            self.is_leader = False
+        connections.close_all()
+
+
+_background = None
+
+
+def start_background_scheduler():
+    """เรียกจาก gunicorn post_worker_init เมื่อ SCHEDULER_IN_WEB=1 (ทุก worker แข่งกัน มี leader คนเดียว)"""
+    global _background
+    if _background is None:
+        _background = Scheduler().start()
+    return _background
+
+
+def stop_background_scheduler():
+    global _background
+    if _background is not None:
+        _background.stop(timeout=10)
+        _background = None
+
+
+def _job_summary(job, state):
+    summary = {
+        'name': job.name,
+        'interval_seconds': job.interval,
+        'timeout_seconds': job.timeout,
+        'runs': 0,
+        'failures': 0,
+        'timeouts': 0,
+        'last_started_at': None,
+        'last_duration_ms': None,
+        'mean_ms': None,
+        'max_ms': None,
+        'last_ok': None,
+        'last_error': '',
+    }
+    if state is not None and state.runs:
+        summary.update(
+            runs=state.runs,
+            failures=state.failures,
+            timeouts=state.timeouts,
+            last_started_at=state.last_started_at,
+            last_duration_ms=round(state.last_duration_ms, 1),
+            mean_ms=round(state.total_ms / state.runs, 1),
+            max_ms=round(state.max_ms, 1),
+            last_ok=state.last_ok,
+            last_error=state.last_error,
+        )
+    return summary
+
+
+def scheduler_status():
+    lease = SchedulerLease.objects.filter(name=LEASE_NAME).values('holder', 'expires_at').first()
+    if lease and (not lease['holder'] or lease['expires_at'] < timezone.now()):
+        lease = None
+    states = {state.name: state for state in ScheduledJobState.objects.all()}
+    return {
+        'leader': lease,
+        'jobs': [_job_summary(job, states.get(name)) for name, job in sorted(load_jobs().items())],
+    }
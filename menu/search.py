@@ -0,0 +1,164 @@
+# menu/search.py
+
+import bisect
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import get_menu_items, get_schedule
+from .kitchens import kitchen_id_for
+from .models import MenuItem
+from .serializers import MenuItemSerializer
+
+# =======================================================
+#               MENU SEARCH
+# =======================================================
+# - PostgreSQL: ใช้ index ของ database (pg_trgm, ดู migration 0015)
+# - SQLite / อื่นๆ: ใช้ inverted index ใน memory ที่ build จาก payload เมนู
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+TRIGRAM_THRESHOLD = 0.3
+
+# ไม่ใช้ \w เพราะสระ/วรรณยุกต์ไทยไม่นับเป็น word character ของ re
+_TOKEN_RE = re.compile(r'[^\s.,;:!?()\[\]{}"\'/\\|+*&%$#@~^=<>-]+')
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN_RE.findall(text or '')]
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def use_database_search():
+    backend = getattr(settings, 'MENU_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'database'
+
+
+class MenuSearchIndex:
+    """Inverted index ของเมนูที่เปิดขาย (prefix + trigram) สำหรับ backend ที่ไม่มี pg_trgm"""
+
+    def __init__(self, items):
+        self.items = {item['id']: item for item in items}
+        self.name_tokens = {}
+        self.description_tokens = {}
+        self.trigram_index = {}
+        self.names = {}
+
+        for item in items:
+            name = (item['name'] or '').lower()
+            self.names[item['id']] = name
+            for token in tokenize(item['name']):
+                self.name_tokens.setdefault(token, set()).add(item['id'])
+                for gram in trigrams(token):
+                    self.trigram_index.setdefault(gram, set()).add(item['id'])
+            for token in tokenize(item['description']):
+                self.description_tokens.setdefault(token, set()).add(item['id'])
+
+        self.sorted_name_tokens = sorted(self.name_tokens)
+        self.sorted_description_tokens = sorted(self.description_tokens)
+
+    @staticmethod
+    def _prefix_matches(sorted_tokens, index, prefix):
+        ids = set()
+        start = bisect.bisect_left(sorted_tokens, prefix)
+        for token in sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            ids |= index[token]
+        return ids
+
+    def _similar(self, token):
+        grams = trigrams(token)
+        counts = {}
+        for gram in grams:
+            for item_id in self.trigram_index.get(gram, ()):
+                counts[item_id] = counts.get(item_id, 0) + 1
+        return {
+            item_id: shared / len(grams)
+            for item_id, shared in counts.items()
+            if shared / len(grams) >= TRIGRAM_THRESHOLD
+        }
+
+    def search(self, query, limit=DEFAULT_LIMIT, category=None):
+        query = (query or '').strip().lower()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores = {}
+        for token in tokens:
+            for item_id in self.name_tokens.get(token, ()):
+                scores[item_id] = scores.get(item_id, 0) + 4
+            for item_id in self._prefix_matches(self.sorted_name_tokens, self.name_tokens, token):
+                scores[item_id] = scores.get(item_id, 0) + 3
+            for item_id in self._prefix_matches(self.sorted_description_tokens, self.description_tokens, token):
+                scores[item_id] = scores.get(item_id, 0) + 1
+            for item_id, similarity in self._similar(token).items():
+                scores[item_id] = scores.get(item_id, 0) + 2 * similarity
+
+        # ภาษาไทยไม่เว้นวรรคระหว่างคำ -> ให้คะแนนถ้าเจอเป็น substring ของชื่อด้วย
+        for item_id, name in self.names.items():
+            if name.startswith(query):
+                scores[item_id] = scores.get(item_id, 0) + 3
+            elif query in name:
+                scores[item_id] = scores.get(item_id, 0) + 2
+
+        if category:
+            # กรองหมวดก่อนตัด limit -> ได้ครบ limit ถ้าหมวดนั้นมีผลพอ
+            scores = {item_id: score for item_id, score in scores.items() if str(self.items[item_id]['category_id']) == category}
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], self.names[pair[0]]))
+        return [self.items[item_id] for item_id, _ in ranked[:limit]]
+
+
+_indexes = {}  # kitchen_id -> (payload, index)
+
+
+def get_search_index(kitchen_id=None):
+    # build index ใหม่เฉพาะเมื่อ payload เมนูของครัวนั้นถูก build ใหม่ (เวอร์ชันเปลี่ยน / TTL หมด)
+    kitchen_id = kitchen_id or kitchen_id_for()
+    payload = get_menu_items(kitchen_id=kitchen_id)
+    entry = _indexes.get(kitchen_id)
+    if entry is None or entry[0] is not payload:
+        entry = _indexes[kitchen_id] = (payload, MenuSearchIndex(payload))
+    return entry[1]
+
+
+def search_menu_items(query, limit=DEFAULT_LIMIT, kitchen_id=None, category=None):
+    """
+    คืนผลการค้นหาเมนูของครัวหนึ่งเป็น list ของ dict ที่ serialize แล้ว (เรียงตามความเกี่ยวข้อง)
+    category = id ของหมวด (string จาก ?category=) กรองก่อนตัด limit
+    """
+    kitchen_id = kitchen_id or kitchen_id_for()
+    if use_database_search():
+        if category and not category.isdigit():
+            return []
+        # import ตรงนี้เพราะ django.contrib.postgres ใช้ได้เฉพาะบน PostgreSQL
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        queryset = (
+            MenuItem.objects.filter(kitchen_id=kitchen_id, is_available=True)
+            .exclude(id__in=get_schedule(kitchen_id=kitchen_id).hidden_at(timezone.now()))
+            .select_related('category')
+            .filter(
+                Q(name__istartswith=query)
+                | Q(name__trigram_word_similar=query)
+                | Q(description__icontains=query)
+            )
+            .annotate(similarity=TrigramWordSimilarity(query, 'name'))
+            .order_by('-similarity', 'name')
+        )
+        if category:
+            queryset = queryset.filter(category_id=int(category))
+        queryset = queryset[:limit]
+        return MenuItemSerializer(queryset, many=True).data
+
+    return get_search_index(kitchen_id).search(query, limit, category)
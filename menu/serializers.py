@@ -1,22 +1,100 @@
 # menu/serializers.py
 
+from decimal import Decimal
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import MenuItem, Order, OrderItem
+from .services import get_items_summary
+
+
+# --- ตัวช่วยสำหรับ serializer ที่ใช้ "แสดงผลอย่างเดียว" (payload ใหญ่ของ admin) ---
+class FixedDecimalField(serializers.DecimalField):
+    """
+    DecimalField ที่แปลงเป็น string ด้วย format ตรงๆ แทน quantize ทีละค่า
+    (ค่าจาก DB มีทศนิยมตาม decimal_places อยู่แล้ว ผลลัพธ์เหมือน DecimalField เดิม)
+    """
+
+    def to_representation(self, value):
+        coerce_to_string = getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if (
+            not isinstance(value, Decimal) or self.decimal_places is None
+            or not coerce_to_string or self.localize or self.normalize_output
+        ):
+            return super().to_representation(value)
+        return f"{value:.{self.decimal_places}f}"
+
+
+class FastReadMixin:
+    """
+    ใส่หน้า ModelSerializer ที่ใช้อ่านอย่างเดียว:
+    - DecimalField ของ model ใช้ FixedDecimalField
+    - เตรียมรายการ field ที่อ่านได้ (และวิธีอ่านค่าของแต่ละ field) ไว้ครั้งเดียวต่อ serializer แล้ววนตรงๆ ทุก row
+      (ไม่ต้องสร้าง generator / OrderedDict / ตรวจ SkipField ซ้ำทุก row เหมือน to_representation ปกติ)
+    """
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.DecimalField: FixedDecimalField,
+    }
+
+    def _attribute_reader(self, field):
+        # field ที่ตรงกับคอลัมน์ของ model -> อ่าน attribute ตรงๆ
+        # (Field.get_attribute ปกติต้องไล่ source ทีละชั้นและเช็คว่าเป็น callable ไหมทุก row)
+        model = self.Meta.model
+        if len(field.source_attrs) == 1:
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is not None and model_field.concrete and not model_field.is_relation:
+                return attrgetter(field.source)
+        return field.get_attribute
+
+    def to_representation(self, instance):
+        readers = self.__dict__.get('_readers')
+        if readers is None:
+            readers = self._readers = [
+                (field.field_name, self._attribute_reader(field), field.to_representation)
+                for field in self._readable_fields
+            ]
+        data = {}
+        for name, get_attribute, to_representation in readers:
+            attribute = get_attribute(instance)
+            data[name] = None if attribute is None else to_representation(attribute)
+        return data
 
 class MenuItemSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    image_placeholder = serializers.SerializerMethodField()
     category_name = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuItem
-        fields = ['id', 'name', 'description', 'price', 'image_url', 'is_available', 'category_name']
+        fields = [
+            'id', 'name', 'description', 'price', 'image_url', 'image_srcset', 'image_placeholder',
+            'is_available', 'category_id', 'category_name',
+        ]
 
     def get_image_url(self, obj):
-        # ถ้าเมนูชิ้นนั้นมีรูปภาพ (obj.image)
+        # ใช้ URL ที่คำนวณไว้แล้วตอนบันทึกรูป (ขนาดใหญ่สุดของ srcset, format/quality อัตโนมัติ)
+        if obj.image_variants.get('src'):
+            return obj.image_variants['src']
+        # ถ้าเมนูชิ้นนั้นมีรูปภาพ (obj.image) แต่ยังไม่มี variants (ยังไม่ได้รัน build_image_variants)
         if obj.image:
             url = obj.image.url
             return url.replace('http://', 'https://')
         return None
+
+    def get_image_srcset(self, obj):
+        return obj.image_variants.get('srcset') or None
+
+    def get_image_placeholder(self, obj):
+        return obj.image_variants.get('placeholder') or None
     
     def get_category_name(self, obj):
         if obj.category:
@@ -41,20 +119,20 @@ class OrderStatusSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'status', 'payment_status', 'created_at', 'total_price', 'items']
+        fields = ['id', 'status', 'payment_status', 'created_at', 'scheduled_for', 'total_price', 'discount_total', 'items']
     
     def get_items(self, obj):
-        # ดึงข้อมูล OrderItem ทั้งหมดที่เกี่ยวข้องกับ Order นี้
-        order_items = OrderItem.objects.filter(order=obj)
-        # สร้างข้อมูลที่จะส่งกลับไป
-        return [
-            {
-                'name': item.menu_item_name,
-                'quantity': item.quantity,
-                'price': f"{item.price:.2f}"
-            }
-            for item in order_items
-        ]
+        # อ่านจาก Order.items_summary (รูปแบบเดียวกับที่ API นี้ส่งกลับอยู่แล้ว) ไม่ต้อง query OrderItem
+        return get_items_summary(obj)
+
+# --- Projection เล็กๆ สำหรับค้นประวัติออเดอร์ของลูกค้า (ไม่มีข้อมูลส่วนตัว) ---
+class OrderLookupSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    payment_status = serializers.CharField(read_only=True)
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+
 # --- ต่อท้ายคลาส OrderStatusSerializer ---
 
 # --- Serialirzer สำหรับแสดง OrderItem ในหน้า Dashboard ---
@@ -71,19 +149,29 @@ class OrderDashboardSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'customer_name', 'customer_phone', 'customer_address', 'status', 'created_at', 'total_price', 'items']
 
-class AdminOrderItemSerializer(serializers.ModelSerializer):
+class AdminOrderItemSerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['menu_item_name', 'quantity', 'price']
 
-class AdminOrderSerializer(serializers.ModelSerializer):
-    items = AdminOrderItemSerializer(many=True, read_only=True)
+class AdminOrderSerializer(FastReadMixin, serializers.ModelSerializer):
+    # รูปแบบเดียวกับ AdminOrderItemSerializer แต่สร้างจาก Order.items_summary (ไม่ต้อง join OrderItem)
+    items = serializers.SerializerMethodField()
     
     payment_slip_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Order
-        fields = ['id', 'customer_name', 'customer_phone', 'customer_address', 'status', 'created_at', 'total_price', 'items', 'payment_slip_url']
+        fields = [
+            'id', 'customer_name', 'customer_phone', 'customer_address', 'status', 'created_at', 'scheduled_for',
+            'total_price', 'discount_total', 'applied_promotions', 'items', 'payment_slip_url',
+        ]
+
+    def get_items(self, obj):
+        return [
+            {'menu_item_name': item['name'], 'quantity': item['quantity'], 'price': item['price']}
+            for item in get_items_summary(obj)
+        ]
 
     def get_payment_slip_url(self, obj):
         if obj.payment_slip and hasattr(obj.payment_slip, 'url'):
@@ -101,6 +189,8 @@ class FinalOrderSubmissionSerializer(serializers.Serializer):
     customer_address = serializers.CharField()
     customer_telegram_chat_id = serializers.CharField(max_length=50, required=False, allow_blank=True)
     items = serializers.CharField() # เราจะรับ items เป็น JSON string
+    # สั่งล่วงหน้า: id จาก /api/slots/ (ไม่ส่ง = ASAP)
+    time_slot_id = serializers.IntegerField(required=False, allow_null=True)
     payment_slip = serializers.ImageField(
         required=False,
         allow_null=True,
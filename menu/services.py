@@ -1,28 +1,87 @@
+import hashlib
+import hmac
+import re
+
+from django.conf import settings
 from django.db import transaction
-from decimal import Decimal
+from .events import record_transition
+from .kitchens import kitchen_id_for
 from .models import Order, OrderItem, MenuItem
+from .promotions import CartLine, quote_cart
+
+def normalize_phone(phone):
+    """'+66 81-234-5678' / '081-234-5678' -> '0812345678'"""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('66') and len(digits) == 11:
+        digits = '0' + digits[2:]
+    return digits
+
+
+LOOKUP_TOKEN_LENGTH = 20
+
+
+def lookup_token(phone=None, chat_id=None):
+    """
+    token สำหรับดูประวัติออเดอร์ (/api/orders/lookup/) ของเบอร์ / chat นี้
+    ลูกค้าได้ token ของเบอร์ตัวเองตอนสั่งอาหาร -> รู้เบอร์คนอื่นอย่างเดียวดูประวัติไม่ได้
+    """
+    key = f"phone:{normalize_phone(phone)}" if phone else f"chat:{chat_id}"
+    message = f"order-lookup:{key}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:LOOKUP_TOKEN_LENGTH]
+
+
+def check_lookup_token(token, phone=None, chat_id=None):
+    return hmac.compare_digest(token or '', lookup_token(phone=phone, chat_id=chat_id))
+
+
+def summarize_order_items(order_items):
+    """(จำนวนชิ้นรวม, [{'name', 'quantity', 'price'}]) สำหรับ Order.item_count / Order.items_summary"""
+    summary = [
+        {'name': item.menu_item_name, 'quantity': item.quantity, 'price': f"{item.price:.2f}"}
+        for item in order_items
+    ]
+    return sum(item['quantity'] for item in summary), summary
+
+
+def set_item_summary(order, order_items):
+    order.item_count, order.items_summary = summarize_order_items(order_items)
+
+
+def get_items_summary(order):
+    # ออเดอร์เก่าที่ยังไม่ได้ backfill -> คำนวณจาก OrderItem (ใช้ผล prefetch ถ้ามี)
+    if order.items_summary:
+        return order.items_summary
+    return summarize_order_items(order.items.all())[1]
+
 
 @transaction.atomic
 def create_order(validated_data, items_data):
 
+    # ออเดอร์เป็นของครัวเดียว: เมนูของครัวอื่นนับเป็น "ไม่พบ"
+    kitchen_id = validated_data.get('kitchen_id') or kitchen_id_for()
     item_ids = [item_data['id'] for item_data in items_data]
-    menu_items_in_db = MenuItem.objects.filter(id__in=item_ids)
+    menu_items_in_db = MenuItem.objects.filter(kitchen_id=kitchen_id, id__in=item_ids)
     menu_items_map = {item.id: item for item in menu_items_in_db}
 
     if len(menu_items_map) != len(item_ids):
         missing_ids = set(item_ids) - set(menu_items_map.keys())
         raise ValueError(f"Menu items with ids {list(missing_ids)} not found.")
 
+    validated_data = {
+        **validated_data,
+        'kitchen_id': kitchen_id,
+        'customer_phone': normalize_phone(validated_data.get('customer_phone')),
+    }
     order = Order.objects.create(total_price=0, **validated_data)
 
     order_items_to_create = []
-    total_price = Decimal(0)
+    cart_lines = []
 
     for item_data in items_data:
         menu_item = menu_items_map.get(item_data['id'])
         price = menu_item.price
         quantity = item_data['quantity']
-        total_price += price * quantity
+        cart_lines.append(CartLine.from_menu_item(menu_item, quantity))
 
         order_items_to_create.append(
             OrderItem(
@@ -36,7 +95,12 @@ def create_order(validated_data, items_data):
 
     OrderItem.objects.bulk_create(order_items_to_create)
 
-    order.total_price = total_price
+    quote = quote_cart(cart_lines, kitchen_id=kitchen_id)
+    order.total_price = quote.total
+    order.discount_total = quote.discount_total
+    order.applied_promotions = quote.applied_promotions()
+    set_item_summary(order, order_items_to_create)
     order.save()
+    record_transition(order, '', '', source='customer')
 
     return order
@@ -0,0 +1,44 @@
+# menu/signals.py
+
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_menu_version
+from .kitchens import clear_kitchens
+from .models import AvailabilityWindow, Category, Kitchen, MenuItem, Promotion
+
+
+# เมื่อเมนู หมวดหมู่ โปรโมชัน หรือตารางเวลาขายเปลี่ยน ให้ bump เวอร์ชันเมนูของครัวที่เกี่ยวข้อง
+# (payload ที่ cache ไว้, search index และ rule โปรโมชัน จะถูก build ใหม่ในการเรียกครั้งถัดไป)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_kitchen_menu_cache(sender, instance, **kwargs):
+    bump_menu_version(instance.kitchen_id)
+
+
+@receiver(post_save, sender=AvailabilityWindow)
+@receiver(post_delete, sender=AvailabilityWindow)
+def invalidate_window_kitchen_cache(sender, instance, **kwargs):
+    # อ่าน kitchen_id ด้วย query แทนการแตะ relation (ตอนลบแบบ cascade เมนู/หมวดอาจถูกลบไปแล้ว -> bump ทุกครัว)
+    owner = MenuItem if instance.menu_item_id else Category
+    owner_id = instance.menu_item_id or instance.category_id
+    bump_menu_version(owner.objects.filter(id=owner_id).values_list('kitchen_id', flat=True).first())
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+@receiver(m2m_changed, sender=Promotion.menu_items.through)
+def invalidate_menu_cache(sender, **kwargs):
+    # โปรโมชันใช้ได้ทุกครัว -> bump ทุกครัว
+    # m2m_changed ยิงทั้ง pre_ และ post_ -> bump ครั้งเดียวหลังเปลี่ยนจริง
+    if kwargs.get('action', '').startswith('pre_'):
+        return
+    bump_menu_version()
+
+
+@receiver(post_save, sender=Kitchen)
+@receiver(post_delete, sender=Kitchen)
+def invalidate_kitchen_lookup(sender, **kwargs):
+    clear_kitchens()
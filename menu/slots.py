@@ -0,0 +1,117 @@
+# menu/slots.py
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .kitchens import active_kitchen_ids, kitchen_id_for
+from .models import TimeSlot
+
+# =======================================================
+#           PRE-ORDER TIME SLOTS
+# =======================================================
+# - ตาราง TimeSlot ถูกเติมล่วงหน้า TIME_SLOT_DAYS_AHEAD วัน ตามเวลาเปิด/ปิดครัว (ensure_slots, รันโดย scheduler)
+# - slot แยกตามครัว (ความจุเป็นของแต่ละครัว) ทุก query กรองด้วย kitchen_id ก่อน (unique (kitchen, starts_at))
+# - จอง = UPDATE ... SET booked = booked + 1 WHERE booked < capacity (atomic ในคำสั่งเดียว ไม่มี race, ไม่ต้อง lock / นับออเดอร์)
+# - ยกเลิกออเดอร์ = คืนที่ (release_slot ถูกเรียกจาก Order.save() ตอน status เปลี่ยนเป็น CANCELLED)
+# - ความจุต่อ slot แก้ได้ใน admin (เช่น วันที่มีพ่อครัวน้อย)
+
+
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def booking_cutoff(now=None):
+    """slot ที่เริ่มก่อนเวลานี้จองไม่ได้แล้ว (ครัวต้องมีเวลาเตรียม)"""
+    now = now or timezone.now()
+    return now + timedelta(minutes=settings.TIME_SLOT_LEAD_MINUTES)
+
+
+def slot_starts(day):
+    """เวลาเริ่มของทุก slot ในวัน (ตามเวลาท้องถิ่น) ตั้งแต่ครัวเปิดจนถึง slot สุดท้ายที่จบก่อนครัวปิด"""
+    step = timedelta(minutes=settings.TIME_SLOT_MINUTES)
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, _parse_time(settings.TIME_SLOT_OPEN)), tz)
+    close = timezone.make_aware(datetime.combine(day, _parse_time(settings.TIME_SLOT_CLOSE)), tz)
+    while start + step <= close:
+        yield start
+        start += step
+
+
+def ensure_slots(now=None):
+    """สร้าง slot ที่ยังไม่มีของทุกครัวที่เปิดอยู่ สำหรับวันนี้ถึง TIME_SLOT_DAYS_AHEAD วันข้างหน้า คืนจำนวน slot ที่สร้าง"""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    starts = [
+        start
+        for offset in range(settings.TIME_SLOT_DAYS_AHEAD + 1)
+        for start in slot_starts(today + timedelta(days=offset))
+        if start > now
+    ]
+    if not starts:
+        return 0
+    existing = set(
+        TimeSlot.objects.filter(starts_at__gte=starts[0], starts_at__lte=starts[-1]).values_list('kitchen_id', 'starts_at')
+    )
+    step = timedelta(minutes=settings.TIME_SLOT_MINUTES)
+    missing = [
+        TimeSlot(kitchen_id=kitchen_id, starts_at=start, ends_at=start + step, capacity=settings.TIME_SLOT_CAPACITY)
+        for kitchen_id in active_kitchen_ids()
+        for start in starts
+        if (kitchen_id, start) not in existing
+    ]
+    # ignore_conflicts: scheduler สองตัวสร้างพร้อมกันช่วงเปลี่ยน leader ก็ไม่พัง (unique kitchen + starts_at)
+    TimeSlot.objects.bulk_create(missing, ignore_conflicts=True)
+    return len(missing)
+
+
+def open_slots(now=None, day=None, kitchen_id=None):
+    """slot ที่ยังจองได้ของครัวหนึ่ง (อ่านจากตาราง slot อย่างเดียว, query เดียว)"""
+    slots = TimeSlot.objects.filter(
+        kitchen_id=kitchen_id or kitchen_id_for(), starts_at__gte=booking_cutoff(now), booked__lt=F('capacity'),
+    )
+    if day is not None:
+        slots = slots.filter(starts_at__date=day)
+    return [
+        {'id': slot_id, 'starts_at': starts_at, 'ends_at': ends_at, 'remaining': capacity - booked}
+        for slot_id, starts_at, ends_at, capacity, booked in slots.order_by('starts_at').values_list(
+            'id', 'starts_at', 'ends_at', 'capacity', 'booked'
+        )
+    ]
+
+
+def parse_slot_id(value):
+    """time_slot_id จาก client -> int, รูปแบบผิด -> ValueError (view ตอบ 400 ไม่ใช่ 409 "slot เต็ม")"""
+    if isinstance(value, bool):
+        raise ValueError('time_slot_id must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('time_slot_id must be an integer')
+
+
+def claim_slot(slot_id, now=None, kitchen_id=None):
+    """จองหนึ่งที่ใน slot -> เวลาเริ่มของ slot หรือ None ถ้า slot เต็ม / เลยเวลาจอง / ไม่มีอยู่ / เป็นของครัวอื่น"""
+    claimed = TimeSlot.objects.filter(
+        id=slot_id, kitchen_id=kitchen_id or kitchen_id_for(), starts_at__gte=booking_cutoff(now), booked__lt=F('capacity'),
+    ).update(booked=F('booked') + 1)
+    if not claimed:
+        return None
+    return TimeSlot.objects.values_list('starts_at', flat=True).get(id=slot_id)
+
+
+def slot_starts_at(slot_id, now=None, kitchen_id=None):
+    """เวลาเริ่มของ slot ที่ยังจองได้ (ไม่จอง) -> None ถ้าเต็ม / เลยเวลาจอง / ไม่มีอยู่ / เป็นของครัวอื่น"""
+    try:
+        slot_id = int(slot_id)
+    except (TypeError, ValueError):
+        return None
+    return TimeSlot.objects.filter(
+        id=slot_id, kitchen_id=kitchen_id or kitchen_id_for(), starts_at__gte=booking_cutoff(now), booked__lt=F('capacity'),
+    ).values_list('starts_at', flat=True).first()
+
+
+def release_slot(slot_id):
+    TimeSlot.objects.filter(id=slot_id, booked__gt=0).update(booked=F('booked') - 1)
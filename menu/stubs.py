@@ -0,0 +1,112 @@
+# menu/stubs.py
+
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =======================================================
+#       LOCAL STAND-INS FOR EXTERNAL SERVICES
+# =======================================================
+# HTTP server เล็กๆ ที่ทำตัวเหมือน Telegram Bot API และ Cloudinary upload API
+# ใช้ใน load test / local development เพื่อไม่ต้องยิงออกอินเทอร์เน็ต
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler_class, host='127.0.0.1', port=0):
+        super().__init__((host, port), handler_class)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name=self.__class__.__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        # เงียบ ไม่ต้อง log ทุก request ระหว่าง load test
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TelegramStubHandler(_JSONHandler):
+    """POST /bot<token>/<method> -> ok เสมอ, หรือ 429 ทุกๆ server.throttle_every request"""
+
+    def do_POST(self):
+        self.read_body()
+        number = self.server.count()
+        every = getattr(self.server, 'throttle_every', 0)
+        if every and number % every == 0:
+            self.send_json(429, {
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            })
+            return
+        self.send_json(200, {'ok': True, 'result': {'message_id': number}})
+
+
+class CloudinaryStubHandler(_JSONHandler):
+    """POST /v1_1/<cloud>/<resource_type>/upload -> คืน response หน้าตาแบบ Cloudinary"""
+
+    def do_POST(self):
+        self.read_body()
+        self.server.count()
+        parts = self.path.strip('/').split('/')
+        cloud_name = parts[1] if len(parts) > 1 else 'stub'
+        resource_type = parts[2] if len(parts) > 2 else 'image'
+        public_id = f"stub/{uuid.uuid4().hex[:12]}"
+        url = f"{self.server.url}/{cloud_name}/{resource_type}/upload/v1/{public_id}.jpg"
+        self.send_json(200, {
+            'public_id': public_id,
+            'version': 1,
+            'format': 'jpg',
+            'resource_type': resource_type,
+            'type': 'upload',
+            'width': 800,
+            'height': 600,
+            'bytes': 1024,
+            'url': url,
+            'secure_url': url,
+        })
+
+
+def start_telegram_stub(throttle_every=0):
+    server = StubServer(TelegramStubHandler)
+    server.throttle_every = throttle_every
+    return server.start()
+
+
+def start_cloudinary_stub():
+    return StubServer(CloudinaryStubHandler).start()
@@ -0,0 +1,305 @@
+# menu/telegram.py
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+# =======================================================
+#               TELEGRAM API HELPERS
+# =======================================================
+
+def telegram_api_url(bot_token, method='sendMessage'):
+    base = getattr(settings, 'TELEGRAM_API_BASE', 'https://api.telegram.org')
+    return f"{base.rstrip('/')}/bot{bot_token}/{method}"
+
+
+def format_order_ids(order_ids):
+    """[101, 102, 103] -> '#101–#103' , [101, 105] -> '#101, #105'"""
+    ids = sorted(set(order_ids))
+    if len(ids) > 2 and ids[-1] - ids[0] == len(ids) - 1:
+        return f"#{ids[0]}–#{ids[-1]}"
+    return ", ".join(f"#{order_id}" for order_id in ids)
+
+
+def build_digest(messages, max_lines=20):
+    """รวมข้อความ "ออเดอร์ใหม่" หลายอันเป็นข้อความเดียว"""
+    orders = [message.meta for message in messages]
+    header = (
+        f"🔔 Kitsu Kitchen: {len(orders)} new orders: "
+        f"{format_order_ids(order['order_id'] for order in orders)}\n"
+    )
+    lines = [
+        f"#{order['order_id']} {order.get('customer_name', '')} – {order.get('total', '')} บาท"
+        for order in orders[:max_lines]
+    ]
+    if len(orders) > max_lines:
+        lines.append(f"… and {len(orders) - max_lines} more")
+    return header + "\n" + "\n".join(lines)
+
+
+# =======================================================
+#               RATE LIMITING
+# =======================================================
+
+class TokenBucket:
+    """Token bucket ต่อ chat id: rate = token ต่อวินาที, capacity = burst สูงสุด"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return now
+
+    def delay(self):
+        """เวลาที่ต้องรอ (วินาที) ก่อนจะส่งได้ ถ้าเป็น 0 แปลว่าส่งได้ทันที"""
+        now = self._refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def block_for(self, seconds):
+        # Telegram ตอบ 429 พร้อม retry_after -> ห้ามส่งจนกว่าจะครบเวลา
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+        self.tokens = 0
+
+
+# =======================================================
+#               ASYNC SENDER
+# =======================================================
+
+class TelegramMessage:
+    def __init__(self, bot_token, chat_id, text, parse_mode=None, coalesce=False, meta=None, photo=None):
+        self.bot_token = bot_token
+        self.chat_id = str(chat_id)
+        self.text = text
+        self.parse_mode = parse_mode
+        self.coalesce = coalesce
+        self.meta = meta or {}
+        # bytes ของรูป PNG -> ส่งด้วย sendPhoto (text เป็น caption)
+        self.photo = photo
+        self.attempts = 0
+
+    @property
+    def method(self):
+        return 'sendPhoto' if self.photo else 'sendMessage'
+
+    def payload(self):
+        payload = {'chat_id': self.chat_id, 'caption' if self.photo else 'text': self.text}
+        if self.parse_mode:
+            payload['parse_mode'] = self.parse_mode
+        return payload
+
+    def files(self):
+        return {'photo': ('receipt.png', self.photo, 'image/png')} if self.photo else None
+
+
+async def requests_transport(url, payload, files=None):
+    # requests เป็น sync -> รันใน thread เพื่อไม่ให้ block event loop
+    import requests
+
+    def post():
+        if files:
+            # sendPhoto: multipart (ฟิลด์อื่นเป็น form field)
+            response = requests.post(url, data=payload, files=files, timeout=10)
+        else:
+            response = requests.post(url, json=payload, timeout=5)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return response.status_code, body
+
+    return await asyncio.to_thread(post)
+
+
+class TelegramSender:
+    """
+    ส่งข้อความ Telegram แบบ asyncio
+    - แต่ละ chat มีคิวและ token bucket ของตัวเอง (chat ที่โดน throttle ไม่ block chat อื่น)
+    - เคารพ retry_after เมื่อ Telegram ตอบ 429
+    - 5xx / network error ลองใหม่แบบ exponential backoff (retry_base * 2^n สูงสุด retry_max วินาที) ไม่เกิน max_attempts ครั้ง
+    - ข้อความที่ coalesce=True ซึ่งค้างอยู่ในคิวเดียวกันจะถูกรวมเป็น digest ข้อความเดียว
+    """
+
+    def __init__(self, transport=requests_transport, chat_rate=1.0, chat_burst=3,
+                 group_rate=20 / 60, coalesce_window=1.0, max_attempts=3,
+                 retry_base=1.0, retry_max=30.0, clock=time.monotonic, sleep=asyncio.sleep):
+        self.transport = transport
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.coalesce_window = coalesce_window
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.clock = clock
+        self.sleep = sleep
+        self.queues = {}
+        self.buckets = {}
+        self.workers = {}
+        self.sent = 0
+        self.failed = 0
+
+    def bucket_for(self, chat_id):
+        if chat_id not in self.buckets:
+            # chat id ติดลบคือ group -> Telegram จำกัด ~20 ข้อความ/นาที
+            if chat_id.startswith('-'):
+                self.buckets[chat_id] = TokenBucket(self.group_rate, 1, clock=self.clock)
+            else:
+                self.buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, clock=self.clock)
+        return self.buckets[chat_id]
+
+    async def enqueue(self, message):
+        queue = self.queues.setdefault(message.chat_id, deque())
+        queue.append(message)
+        worker = self.workers.get(message.chat_id)
+        if worker is None or worker.done():
+            self.workers[message.chat_id] = asyncio.ensure_future(self._drain(message.chat_id))
+
+    async def join(self):
+        while any(not worker.done() for worker in self.workers.values()):
+            await asyncio.gather(*self.workers.values())
+
+    def pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _next_batch(self, queue):
+        first = queue.popleft()
+        if not first.coalesce:
+            return first, [first]
+        batch = [first]
+        # ดึงข้อความที่ coalesce ได้ของ chat เดียวกันที่ค้างอยู่ทั้งหมด
+        rest = deque()
+        while queue:
+            message = queue.popleft()
+            if message.coalesce and message.bot_token == first.bot_token:
+                batch.append(message)
+            else:
+                rest.append(message)
+        queue.extend(rest)
+        if len(batch) == 1:
+            return first, batch
+        digest = TelegramMessage(first.bot_token, first.chat_id, build_digest(batch), coalesce=True)
+        return digest, batch
+
+    async def _drain(self, chat_id):
+        queue = self.queues[chat_id]
+        bucket = self.bucket_for(chat_id)
+
+        while queue:
+            if queue[0].coalesce and self.coalesce_window:
+                # รอสักครู่ให้ออเดอร์ที่ตามมาติดๆ ได้รวมอยู่ใน digest เดียวกัน
+                await self.sleep(self.coalesce_window)
+
+            delay = bucket.delay()
+            while delay > 0:
+                await self.sleep(delay)
+                delay = bucket.delay()
+
+            message, batch = self._next_batch(queue)
+            bucket.consume()
+
+            try:
+                # transport รับ files เฉพาะข้อความที่มีรูป (transport ของ test / stub รับแค่ url, payload)
+                extra = {'files': message.files()} if message.photo else {}
+                status_code, body = await self.transport(
+                    telegram_api_url(message.bot_token, message.method), message.payload(), **extra
+                )
+            except Exception as e:
+                status_code, body = None, {'description': str(e)}
+
+            if status_code == 200:
+                self.sent += 1
+                continue
+
+            if status_code == 429:
+                retry_after = body.get('parameters', {}).get('retry_after', 1)
+                print(f"WARNING: Telegram rate limited chat {chat_id}, retry after {retry_after}s")
+                bucket.block_for(retry_after)
+                # ใส่กลับหัวคิว (แยกเป็นข้อความเดิม เผื่อจะได้รวมกับข้อความใหม่อีกรอบ)
+                queue.extendleft(reversed(batch))
+                continue
+
+            for original in batch:
+                original.attempts += 1
+            # network error / 5xx ของ Telegram = ชั่วคราว -> ลองใหม่, 4xx อื่น (chat ไม่มี / bot โดน block) = ไม่ลองซ้ำ
+            transient = status_code is None or status_code >= 500
+            retry = [original for original in batch if original.attempts < self.max_attempts] if transient else []
+            if retry:
+                backoff = min(self.retry_max, self.retry_base * 2 ** (max(original.attempts for original in retry) - 1))
+                print(f"WARNING: Telegram send to {chat_id} failed ({status_code}), retry in {backoff:.0f}s")
+                # หน่วงทั้ง chat เหมือน 429 -> ลำดับข้อความใน chat ไม่สลับกัน
+                bucket.block_for(backoff)
+                queue.extendleft(reversed(retry))
+            failed = len(batch) - len(retry)
+            if failed:
+                self.failed += failed
+                print(f"ERROR: Could not send Telegram message to {chat_id}: {status_code} {body.get('description', '')}")
+
+
+# =======================================================
+#               PROCESS-WIDE SENDER
+# =======================================================
+# sender หนึ่งตัวต่อ process รันอยู่ใน event loop ของ thread แยก
+# ใช้ได้ทั้งจาก view ที่รันใต้ WSGI (gunicorn) และ ASGI
+# (ถ้าต้องการรันใน event loop ที่มีอยู่แล้ว ให้สร้าง TelegramSender แล้ว await enqueue() เอง)
+
+_sender = None
+_loop = None
+_lock = threading.Lock()
+
+
+def get_sender():
+    global _sender, _loop
+    with _lock:
+        if _sender is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='telegram-sender', daemon=True)
+            thread.start()
+            _sender = TelegramSender(
+                chat_rate=settings.TELEGRAM_CHAT_RATE,
+                chat_burst=settings.TELEGRAM_CHAT_BURST,
+                coalesce_window=settings.TELEGRAM_COALESCE_WINDOW,
+            )
+    return _sender
+
+
+def submit_message(bot_token, chat_id, text, parse_mode=None, coalesce=False, meta=None, photo=None):
+    """thread-safe: ส่งข้อความเข้าคิวของ sender แล้ว return ทันที"""
+    sender = get_sender()
+    message = TelegramMessage(bot_token, chat_id, text, parse_mode=parse_mode, coalesce=coalesce, meta=meta, photo=photo)
+    asyncio.run_coroutine_threadsafe(sender.enqueue(message), _loop)
+
+
+def flush_sender(timeout):
+    """
+    รอให้ข้อความที่ค้างในคิวส่งออกให้หมด ไม่เกิน timeout วินาที (เรียกจาก gunicorn worker_exit)
+    thread ของ sender เป็น daemon -> ไม่รอตรงนี้ = ข้อความที่ค้างหายเงียบตอน worker ปิด
+    คืน True ถ้าส่งหมด
+    """
+    if _sender is None:
+        return True
+    future = asyncio.run_coroutine_threadsafe(_sender.join(), _loop)
+    try:
+        future.result(timeout)
+        return True
+    except TimeoutError:
+        print(f"WARNING: {_sender.pending()} Telegram messages still queued after {timeout}s; dropping them")
+        return False
@@ -1,10 +1,78 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from html import unescape
+from unittest.mock import patch
+
+import cloudinary
+import requests
+
+from cloudinary import CloudinaryResource
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
+
+from kitsu_backend.db_pool import pool_saturation
+from kitsu_backend.profiling import list_profiles
+from kitsu_backend.renderers import FastJSONRenderer
+from kitsu_backend.db_router import ReplicaPinningMiddleware, ReplicaRouter, read_from_replica
+from kitsu_backend.warmup import reset_readiness, warm_up
 from decimal import Decimal
-from .models import MenuItem, Order, OrderItem
+from . import async_views
+from .cache import get_menu_grouped, get_menu_items
+from .availability import build_schedule
+from .bot import order_token, parse_order_token
+from .admin_helpers import EstimatedCountPaginator, RangeDrilldownQuerySet
+from .management.commands.bench_admin_payload import BaselineOrderSerializer
+from .events import bucket_for, percentile_from_histogram, record_transition
+from .images import build_image_variants, build_placeholder
+from .importer import check_public_url, import_menu, read_rows
+from .jobs import expire_unpaid_orders
+from .models import AvailabilityWindow, Category, Kitchen, MenuItem, Order, OrderEvent, OrderItem, Promotion, ScheduledJobState, SchedulerLease, TimeSlot
+from .serializers import AdminOrderSerializer, MenuItemSerializer
+from .scheduler import Job, Lease, Scheduler, _record_run, _run_job
+from .services import lookup_token
+from .slots import claim_slot, ensure_slots, open_slots
+from .promotions import CartLine, Rule, quote_cart
+from .query_plans import HOT_QUERIES, HotQuery, check_query_plans
+from .receipts import evict, receipt_data, receipt_queryset, receipt_token, receipt_version
+from .perf import StageStats, import_cost_by_package, parse_importtime, percentile
+from .stubs import start_telegram_stub
+from .throttling import AbuseSheddingMiddleware, hit, reset_throttles
+from .telegram import TelegramMessage, TelegramSender, flush_sender
+
+
+class ResetSharedStateMixin:
+    """
+    rate limit / menu version / cache เมนูอยู่ใน cache และ memory ของ process -> ล้างก่อนทุก test
+    (ครอบ run() -> ได้ทั้ง pytest และ manage.py test ไม่ว่า setUp ของแต่ละ class จะเรียก super() หรือไม่)
+    """
+
+    def run(self, result=None):
+        cache.clear()
+        reset_throttles()
+        return super().run(result)
 
 
-class MenuItemAPITest(TestCase):
+class MenuItemAPITest(ResetSharedStateMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         MenuItem.objects.create(
@@ -26,7 +94,7 @@ class MenuItemAPITest(TestCase):
         self.assertEqual(response.data[0]['name'], 'ชุดข้าวเช้า')
 
 
-class CreateOrderAPITest(TestCase):
+class CreateOrderAPITest(ResetSharedStateMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.menu_item = MenuItem.objects.create(
@@ -71,7 +139,7 @@ class CreateOrderAPITest(TestCase):
         self.assertEqual(response.status_code, 400)
 
 
-class OrderStatusAPITest(TestCase):
+class OrderStatusAPITest(ResetSharedStateMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.order = Order.objects.create(
@@ -95,7 +163,7 @@ class OrderStatusAPITest(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
-class PaymentWebhookTest(TestCase):
+class PaymentWebhookTest(ResetSharedStateMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.order = Order.objects.create(
@@ -132,4 +200,1551 @@ class PaymentWebhookTest(TestCase):
         payload = {"intent_id": "KT-TEST-001", "status": "success"}
         response = self.client.post('/api/webhook/simulator/', payload, format='json')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['message'], 'Already processed')
\ No newline at end of file
+        self.assertEqual(response.data['message'], 'Already processed')
+
+class MenuGroupedAndSearchAPITest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.rice = Category.objects.create(name="ข้าว")
+        self.drink = Category.objects.create(name="เครื่องดื่ม")
+        self.breakfast = MenuItem.objects.create(
+            name="ชุดข้าวเช้า",
+            description="ข้าวต้มกับไข่",
+            price=Decimal("120.00"),
+            category=self.rice
+        )
+        MenuItem.objects.create(name="Thai Iced Tea", price=Decimal("45.00"), category=self.drink)
+        MenuItem.objects.create(name="Chicken Rice", price=Decimal("60.00"))
+        MenuItem.objects.create(name="Green Tea", price=Decimal("40.00"), category=self.drink, is_available=False)
+
+    def test_grouped_menu_by_category(self):
+        """เมนูต้องถูกจัดกลุ่มตามหมวดหมู่ และเมนูที่ไม่มีหมวดอยู่ท้ายสุด"""
+        response = self.client.get('/api/items/grouped/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.data], [self.rice.id, self.drink.id, None])
+        self.assertEqual(len(response.data[1]['items']), 1)
+
+    def test_items_filtered_by_category(self):
+        response = self.client.get(f'/api/items/?category={self.drink.id}')
+        self.assertEqual([item['name'] for item in response.data], ["Thai Iced Tea"])
+
+    def test_search_prefix_and_fuzzy(self):
+        response = self.client.get('/api/items/search/?q=te')
+        self.assertEqual([item['name'] for item in response.data], ["Thai Iced Tea"])
+        response = self.client.get('/api/items/search/?q=chiken')
+        self.assertEqual(response.data[0]['name'], "Chicken Rice")
+
+    def test_search_thai_substring(self):
+        response = self.client.get('/api/items/search/?q=ข้าว')
+        self.assertEqual(response.data[0]['id'], self.breakfast.id)
+
+    def test_search_category_applied_before_limit(self):
+        """กรองหมวดก่อนตัด limit: เมนูหมวดอื่นที่คะแนนสูงกว่าต้องไม่กินที่ในผลลัพธ์"""
+        MenuItem.objects.create(name="Rice", price=Decimal("20.00"), category=self.drink)
+        MenuItem.objects.create(name="Rice Porridge Special", price=Decimal("70.00"), category=self.rice)
+        response = self.client.get(f'/api/items/search/?q=rice&limit=1&category={self.rice.id}')
+        self.assertEqual([item['name'] for item in response.data], ["Rice Porridge Special"])
+
+    def test_search_requires_query(self):
+        response = self.client.get('/api/items/search/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_menu_cache_invalidated_on_change(self):
+        """แก้เมนูแล้ว payload ที่ cache ไว้ต้องถูก build ใหม่"""
+        self.client.get('/api/items/')
+        self.breakfast.is_available = False
+        self.breakfast.save()
+        response = self.client.get('/api/items/')
+        self.assertNotIn(self.breakfast.id, [item['id'] for item in response.data])
+
+
+class TelegramSenderTest(ResetSharedStateMixin, SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.calls = []
+        self.responses = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+    async def transport(self, url, payload):
+        self.calls.append((self.now, payload))
+        if self.responses:
+            return self.responses.pop(0)
+        return 200, {'ok': True}
+
+    def make_sender(self):
+        return TelegramSender(transport=self.transport, clock=self.clock, sleep=self.sleep)
+
+    def run_messages(self, messages):
+        async def run():
+            sender = self.make_sender()
+            for message in messages:
+                await sender.enqueue(message)
+            await sender.join()
+            return sender
+        return asyncio.run(run())
+
+    def test_burst_is_coalesced_into_digest(self):
+        """ออเดอร์ใหม่ที่เข้ามาพร้อมกันต้องถูกรวมเป็นข้อความเดียว"""
+        messages = [
+            TelegramMessage('token', '42', f'order {i}', coalesce=True,
+                            meta={'order_id': i, 'customer_name': 'ทดสอบ', 'total': '100.00'})
+            for i in range(101, 106)
+        ]
+        self.run_messages(messages)
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn("5 new orders: #101–#105", self.calls[0][1]['text'])
+
+    def test_retry_after_is_honored(self):
+        self.responses = [(429, {'ok': False, 'parameters': {'retry_after': 7}})]
+        sender = self.run_messages([TelegramMessage('token', '42', 'hello')])
+        self.assertEqual(len(self.calls), 2)
+        self.assertGreaterEqual(self.calls[1][0] - self.calls[0][0], 7)
+        self.assertEqual(sender.sent, 1)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        self.responses = [(502, {}), (None, {}), (200, {'ok': True})]
+
+        async def flaky(url, payload):
+            self.calls.append((self.now, payload))
+            status_code, body = self.responses.pop(0)
+            if status_code is None:
+                raise requests.ConnectionError("reset")
+            return status_code, body
+
+        async def run():
+            sender = TelegramSender(transport=flaky, clock=self.clock, sleep=self.sleep)
+            await sender.enqueue(TelegramMessage('token', '42', 'hello'))
+            await sender.join()
+            return sender
+
+        sender = asyncio.run(run())
+        self.assertEqual(sender.sent, 1)
+        # รอ 1 วินาที แล้ว 2 วินาที
+        self.assertEqual([round(at) for at, _ in self.calls], [0, 1, 3])
+
+    def test_client_errors_are_not_retried(self):
+        self.responses = [(400, {'description': 'chat not found'})]
+        sender = self.run_messages([TelegramMessage('token', '42', 'hello')])
+        self.assertEqual((len(self.calls), sender.failed), (1, 1))
+
+    def test_flush_sender_waits_for_queue(self):
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        self.addCleanup(lambda: (loop.call_soon_threadsafe(loop.stop), thread.join(5), loop.close()))
+        sent = []
+
+        async def slow(url, payload):
+            await asyncio.sleep(0.05)
+            sent.append(payload['text'])
+            return 200, {'ok': True}
+
+        sender = TelegramSender(transport=slow, chat_burst=10)
+        with patch('menu.telegram._sender', sender), patch('menu.telegram._loop', loop):
+            for index in range(3):
+                asyncio.run_coroutine_threadsafe(sender.enqueue(TelegramMessage('token', '42', f'msg {index}')), loop)
+            self.assertTrue(flush_sender(5))
+            self.assertEqual(sent, ['msg 0', 'msg 1', 'msg 2'])
+
+            asyncio.run_coroutine_threadsafe(sender.enqueue(TelegramMessage('token', '42', 'late')), loop)
+            self.assertFalse(flush_sender(0.001))
+            self.assertTrue(flush_sender(5))
+
+    def test_per_chat_token_bucket(self):
+        """chat เดียวกันส่งเกิน burst ต้องโดนหน่วงตาม rate"""
+        messages = [TelegramMessage('token', '42', f'msg {i}') for i in range(5)]
+        self.run_messages(messages)
+        self.assertEqual(len(self.calls), 5)
+        # burst 3 ข้อความแรกทันที จากนั้น 1 ข้อความ/วินาที
+        self.assertEqual(self.calls[2][0], 0)
+        self.assertGreaterEqual(self.calls[4][0], 2)
+
+
+class CustomerOrderLookupAPITest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.orders = [
+            Order.objects.create(
+                customer_name="ทดสอบ",
+                customer_phone="0812345678",
+                customer_address="123 ถนนทดสอบ",
+                customer_telegram_chat_id="555",
+                total_price=Decimal("100.00"),
+            )
+            for _ in range(3)
+        ]
+        Order.objects.create(
+            customer_name="คนอื่น",
+            customer_phone="0899999999",
+            customer_address="456 ถนนอื่น",
+            total_price=Decimal("50.00"),
+        )
+
+    def test_lookup_by_normalized_phone(self):
+        """ค้นด้วยเบอร์รูปแบบไหนก็ได้ ต้องเจอออเดอร์เดียวกัน เรียงใหม่สุดก่อน"""
+        response = self.client.get('/api/orders/lookup/', {'phone': '+66 81-234-5678', 'token': lookup_token(phone='0812345678')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [order['id'] for order in response.data['results']],
+            [order.id for order in reversed(self.orders)]
+        )
+        self.assertNotIn('customer_address', response.data['results'][0])
+
+    def test_lookup_keyset_pagination(self):
+        token = lookup_token(chat_id='555')
+        first = self.client.get('/api/orders/lookup/', {'chat_id': '555', 'limit': 2, 'token': token})
+        self.assertEqual(len(first.data['results']), 2)
+        second = self.client.get('/api/orders/lookup/', {'chat_id': '555', 'limit': 2, 'token': token, 'cursor': first.data['next_cursor']})
+        self.assertEqual([order['id'] for order in second.data['results']], [self.orders[0].id])
+        self.assertIsNone(second.data['next_cursor'])
+
+    def test_lookup_requires_key(self):
+        self.assertEqual(self.client.get('/api/orders/lookup/').status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/lookup/', {'phone': '081', 'token': lookup_token(phone='081'), 'cursor': '!!'}).status_code, 400)
+
+    def test_lookup_requires_token_or_staff(self):
+        # รู้เบอร์อย่างเดียวไม่พอ, token ของเบอร์อื่นก็ใช้ไม่ได้
+        self.assertEqual(self.client.get('/api/orders/lookup/', {'phone': '0812345678'}).status_code, 403)
+        self.assertEqual(self.client.get('/api/orders/lookup/', {'phone': '0812345678', 'token': lookup_token(phone='0899999999')}).status_code, 403)
+        self.assertEqual(self.client.get('/api/orders/lookup/', {'chat_id': '555', 'token': lookup_token(phone='555')}).status_code, 403)
+        self.client.force_authenticate(User.objects.create_superuser('lookup-admin', 'lookup@example.com', 'pw'))
+        self.assertEqual(len(self.client.get('/api/orders/lookup/', {'phone': '0812345678'}).data['results']), 3)
+
+
+@override_settings(REPLICA_DATABASE_ALIAS='default')
+class ReplicaRouterTest(ResetSharedStateMixin, SimpleTestCase):
+    # ใช้ alias 'default' แทน replica เพราะ test มี database เดียว
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_outside_replica_context_use_primary(self):
+        self.assertIsNone(self.router.db_for_read(Order))
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Order), 'default')
+
+    def test_write_pins_request_to_primary(self):
+        with read_from_replica():
+            self.router.db_for_write(Order)
+            self.assertIsNone(self.router.db_for_read(Order))
+
+    def test_middleware_pins_client_after_write(self):
+        """หลังจาก client เขียนแล้ว request ถัดไปของ client เดียวกันต้องอ่านจาก primary"""
+        seen = []
+
+        def write_view(request):
+            self.router.db_for_write(Order)
+            return HttpResponse()
+
+        def read_view(request):
+            with read_from_replica():
+                seen.append(self.router.db_for_read(Order))
+            return HttpResponse()
+
+        headers = {'HTTP_AUTHORIZATION': 'Token abc'}
+        ReplicaPinningMiddleware(read_view)(self.factory.get('/', **headers))
+        ReplicaPinningMiddleware(write_view)(self.factory.patch('/', **headers))
+        ReplicaPinningMiddleware(read_view)(self.factory.get('/', **headers))
+        ReplicaPinningMiddleware(read_view)(self.factory.get('/', HTTP_AUTHORIZATION='Token other'))
+        self.assertEqual(seen, ['default', None, 'default'])
+
+
+class AsyncPublicViewsTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.menu_item = MenuItem.objects.create(name="ชุดพรีเมียม", price=Decimal("400.00"))
+        self.order = Order.objects.create(
+            customer_name="ทดสอบ",
+            customer_phone="0812345678",
+            customer_address="123 ถนนทดสอบ",
+            total_price=Decimal("800.00"),
+            payment_intent_id="KT-TEST-ASYNC",
+        )
+        OrderItem.objects.create(
+            order=self.order, menu_item=self.menu_item,
+            menu_item_name=self.menu_item.name, quantity=2, price=Decimal("400.00")
+        )
+
+    async def test_async_menu_item_list(self):
+        response = await async_views.menu_item_list(self.factory.get('/api/items/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)[0]['name'], "ชุดพรีเมียม")
+
+    async def test_async_order_status_matches_sync_view(self):
+        response = await async_views.order_status(self.factory.get('/'), id=self.order.id)
+        data = json.loads(response.content)
+        self.assertEqual(data['items'], [{'name': "ชุดพรีเมียม", 'quantity': 2, 'price': '400.00'}])
+        self.assertEqual(data['total_price'], '800.00')
+
+        response = await async_views.order_status(self.factory.get('/'), id=9999)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_payment_status(self):
+        response = await async_views.payment_status(self.factory.get('/'), payment_intent_id="KT-TEST-ASYNC")
+        self.assertEqual(json.loads(response.content)['payment_status'], 'UNPAID')
+
+    @override_settings(DEBUG=True, REQUEST_PROFILER=True)
+    def test_asgi_middleware_chain_stays_async(self):
+        """middleware ทุกตัวต้องรองรับ async -> ASGI ไม่ต้องย้าย request ไป thread (Django log 'adapted' เมื่อ DEBUG)"""
+        with patch('django.core.handlers.base.logger') as logger:
+            ASGIHandler()
+        adapted = [call.args[1] for call in logger.debug.call_args_list if 'adapted' in call.args[0]]
+        self.assertEqual(adapted, [])
+
+    @override_settings(THROTTLE_IP_RULES=[(r'^/api/orders/submit-final/$', 1, 60)])
+    async def test_shedding_middleware_async_path(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        middleware = AbuseSheddingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual((await middleware(self.factory.get('/api/orders/submit-final/'))).status_code, 200)
+        self.assertEqual((await middleware(self.factory.post('/api/orders/submit-final/'))).status_code, 200)
+        self.assertEqual((await middleware(self.factory.post('/api/orders/submit-final/'))).status_code, 429)
+
+
+class LoadTestHelpersTest(ResetSharedStateMixin, SimpleTestCase):
+    def test_percentile_interpolates(self):
+        values = [0.1, 0.2, 0.3, 0.4, 0.5]
+        self.assertAlmostEqual(percentile(values, 50), 0.3)
+        self.assertAlmostEqual(percentile(values, 95), 0.48)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_stage_stats_counts_errors(self):
+        stats = StageStats()
+        with stats.timed('menu'):
+            pass
+        with stats.timed('menu') as timer:
+            timer.fail()
+        row = stats.rows(elapsed=1.0)[0]
+        self.assertEqual((row['stage'], row['count'], row['errors']), ('menu', 2, 1))
+
+    def test_telegram_stub_throttles_every_nth_request(self):
+        stub = start_telegram_stub(throttle_every=2)
+        try:
+            url = f"{stub.url}/botTOKEN/sendMessage"
+            first = requests.post(url, json={'chat_id': 1, 'text': 'a'}, timeout=5)
+            second = requests.post(url, json={'chat_id': 1, 'text': 'b'}, timeout=5)
+        finally:
+            stub.stop()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second.json()['parameters']['retry_after'], 1)
+
+    def test_in_process_loadtest_refuses_real_database(self):
+        from django.core.management.base import CommandError
+
+        with patch.object(connection, 'vendor', 'postgresql'), patch.dict(connection.settings_dict, {'NAME': 'kitsu'}):
+            with self.assertRaisesMessage(CommandError, "Refusing to write load-test orders"):
+                call_command('loadtest', customers=0)
+
+
+class ThrottlingTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.menu_item = MenuItem.objects.create(name="ชุดพรีเมียม", price=Decimal("400.00"))
+
+    def order_payload(self, phone="0812345678"):
+        return {
+            "customer_name": "ทดสอบ",
+            "customer_phone": phone,
+            "customer_address": "123 ถนนทดสอบ",
+            "items": f'[{{"id": {self.menu_item.id}, "quantity": 1}}]'
+        }
+
+    def test_sliding_window_estimate(self):
+        for _ in range(3):
+            self.assertTrue(hit('test', 'a', 3, 60, now=110)[0])
+        allowed, retry_after = hit('test', 'a', 3, 60, now=119)
+        self.assertFalse(allowed)
+        self.assertGreaterEqual(retry_after, 1)
+        # window ถัดไป: ของเก่ายังนับอยู่ตามสัดส่วนที่ทับกัน
+        self.assertFalse(hit('test', 'a', 3, 60, now=125)[0])
+        self.assertTrue(hit('test', 'a', 3, 60, now=175)[0])
+
+    def test_phone_throttle_ignores_non_object_body(self):
+        response = self.client.post('/api/orders/submit-final/', [self.order_payload()], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(THROTTLE_IP_RULES=[(r'^/api/orders/submit-final/$', 2, 60)])
+    def test_ip_limit_rejects_before_view(self):
+        """เกิน limit ต่อ IP ต้องได้ 429 พร้อม Retry-After"""
+        for phone in ("0811111111", "0822222222"):
+            response = self.client.post('/api/orders/submit-final/', self.order_payload(phone), format='multipart')
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/orders/submit-final/', self.order_payload("0833333333"), format='multipart')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    @override_settings(THROTTLE_PHONE_RATE=(1, 600))
+    def test_phone_limit(self):
+        response = self.client.post('/api/orders/submit-final/', self.order_payload(), format='multipart')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/orders/submit-final/', self.order_payload("081-234-5678"), format='multipart')
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(CONCURRENCY_LIMITS={r'^/api/orders/submit-final/$': 0})
+    def test_concurrency_cap_returns_503(self):
+        response = self.client.post('/api/orders/submit-final/', self.order_payload(), format='multipart')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(CONCURRENCY_LIMITS={r'^/api/orders/submit-final/$': 1})
+    def test_concurrency_cap_is_shared_between_workers(self):
+        """middleware 2 ตัว (= 2 worker) นับผ่าน DB cache ตัวเดียวกัน: ตัวแรกถือช่องอยู่ -> ตัวที่สองได้ 503"""
+        self.assertIsInstance(caches['shared'], DatabaseCache)
+        factory = RequestFactory()
+        inner = {}
+        other_worker = AbuseSheddingMiddleware(lambda request: HttpResponse('ok'))
+
+        def view(request):
+            inner['response'] = other_worker(factory.post('/api/orders/submit-final/'))
+            return HttpResponse('ok')
+
+        self.assertEqual(AbuseSheddingMiddleware(view)(factory.post('/api/orders/submit-final/')).status_code, 200)
+        self.assertEqual(inner['response'].status_code, 503)
+        # request แรกจบแล้ว -> คืนช่อง
+        self.assertEqual(other_worker(factory.post('/api/orders/submit-final/')).status_code, 200)
+
+    @override_settings(CONCURRENCY_CACHE='default')
+    def test_concurrency_cap_refuses_process_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            AbuseSheddingMiddleware(lambda request: HttpResponse('ok'))
+        with override_settings(CONCURRENCY_LIMITS={}):
+            AbuseSheddingMiddleware(lambda request: HttpResponse('ok'))
+
+
+class HealthAndWarmupTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        reset_readiness()
+
+    def tearDown(self):
+        reset_readiness()
+
+    def test_healthz_always_ok(self):
+        response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+
+    def test_readyz_flips_after_warm_up(self):
+        """/readyz ต้องตอบ 503 จนกว่า warm-up จะเสร็จ"""
+        with patch('kitsu_backend.views.warm_up_in_background') as background:
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        background.assert_called_once()
+
+        steps = warm_up()
+        self.assertEqual(set(steps), {'database', 'urls', 'imports', 'menu'})
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ready')
+
+    def test_parse_importtime(self):
+        rows = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   json.decoder\n"
+            "import time:       300 |        400 | json\n"
+        )
+        self.assertEqual([(row['name'], row['depth']) for row in rows], [('json.decoder', 1), ('json', 0)])
+        self.assertEqual(import_cost_by_package(rows)[0]['self_ms'], 0.4)
+
+
+class DatabasePoolTest(ResetSharedStateMixin, TestCase):
+    def test_pool_saturation(self):
+        stats = pool_saturation({'pool_min': 2, 'pool_max': 4, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 3})
+        self.assertEqual(stats['in_use'], 3)
+        self.assertEqual(stats['saturation'], 0.75)
+        self.assertEqual(stats['requests_waiting'], 3)
+
+    def test_admin_db_pool_endpoint(self):
+        client = APIClient()
+        response = client.get('/api/admin/db-pool/')
+        self.assertIn(response.status_code, (401, 403))
+
+        client.force_authenticate(User.objects.create_superuser('pool-admin', 'pool@example.com', 'pw'))
+        response = client.get('/api/admin/db-pool/')
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['default']
+        # SQLite ไม่มี pool -> รายงานเป็น persistent connection พร้อม health check
+        self.assertFalse(default['pooled'])
+        self.assertTrue(default['health_checks'])
+
+
+class AdminPayloadTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        for i in range(30):
+            order = Order.objects.create(
+                customer_name=f"ลูกค้า {i}", customer_phone='0812345678',
+                customer_address='99/1 ถนนสุขุมวิท กรุงเทพฯ ' * 3, total_price=Decimal('150.50'),
+            )
+            OrderItem.objects.create(order=order, menu_item_name='ข้าวผัด', quantity=2, price=Decimal('75.25'))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('payload-admin', 'payload@example.com', 'pw'))
+
+    def test_fast_paths_match_drf_output(self):
+        """serializer / renderer ที่เร่งความเร็วต้องให้ผลลัพธ์เหมือน DRF ทุก byte"""
+        orders = list(Order.objects.prefetch_related('items'))
+        fast = AdminOrderSerializer(orders, many=True).data
+        baseline = BaselineOrderSerializer(orders, many=True).data
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(baseline))
+        self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(baseline))
+
+        extra = {'price': Decimal('1.50'), 'when': orders[0].created_at, 'name': 'ข้าวผัด'}
+        self.assertEqual(FastJSONRenderer().render(extra), JSONRenderer().render(extra))
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get('/api/admin/orders/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 30)
+
+        # response เล็ก (ต่ำกว่า GZIP_MIN_LENGTH) ไม่ต้องบีบอัด
+        order = Order.objects.first()
+        response = self.client.get(f'/api/orders/{order.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class OrderSummaryTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.menu_item = MenuItem.objects.create(name="ข้าวมันไก่", price=Decimal("55.00"))
+
+    def test_submit_stores_summary_and_status_reads_one_row(self):
+        payload = {
+            "customer_name": "ทดสอบ",
+            "customer_phone": "0812345678",
+            "customer_address": "123 ถนนทดสอบ",
+            "items": f'[{{"id": {self.menu_item.id}, "quantity": 3}}]'
+        }
+        response = self.client.post('/api/orders/submit-final/', payload, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(id=response.data['order_id'])
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.items_summary, [{'name': 'ข้าวมันไก่', 'quantity': 3, 'price': '55.00'}])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/orders/{order.id}/')
+        self.assertEqual(response.data['items'], order.items_summary)
+
+    def test_backfill_command(self):
+        """ออเดอร์เก่า (ไม่มีสรุป) ยังอ่านได้จาก OrderItem และ backfill แล้วได้ผลเหมือนกัน"""
+        order = Order.objects.create(customer_name="เก่า", customer_phone="0812345678", customer_address="-")
+        OrderItem.objects.create(order=order, menu_item_name="ข้าวมันไก่", quantity=2, price=Decimal("55.00"))
+        before = self.client.get(f'/api/orders/{order.id}/').data['items']
+
+        call_command('backfill_order_summaries', stdout=io.StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.item_count, 2)
+        self.assertEqual(order.items_summary, before)
+
+
+class OrderAdminChangelistTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('list-admin', 'list@example.com', 'pw'))
+        self.first = Order.objects.create(
+            customer_name="สมชาย", customer_phone="0812345678", customer_address="ถนนพระราม 9", payment_intent_id="pi_abc",
+        )
+        self.second = Order.objects.create(customer_name="สมหญิง", customer_phone="0899999999", customer_address="ถนนสุขุมวิท")
+
+    def search(self, term):
+        response = self.client.get('/admin/menu/order/', {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return {order.id for order in response.context['cl'].result_list}
+
+    def test_indexed_search(self):
+        self.assertEqual(self.search('081'), {self.first.id})
+        self.assertEqual(self.search('+66 89-999'), {self.second.id})
+        self.assertEqual(self.search('pi_abc'), {self.first.id})
+        self.assertEqual(self.search(f'#{self.second.id}'), {self.second.id})
+        # ที่อยู่ / ชื่อ ค้นได้เฉพาะเมื่อขอเอง
+        self.assertEqual(self.search('สุขุมวิท'), set())
+        self.assertEqual(self.search('address: สุขุมวิท'), {self.second.id})
+        self.assertEqual(self.search('name: สมชาย'), {self.first.id})
+
+    def test_date_hierarchy_matches_django(self):
+        Order.objects.filter(id=self.second.id).update(created_at=self.first.created_at.replace(year=2024, month=2, day=29))
+        queryset = RangeDrilldownQuerySet(Order)
+        for kind in ('year', 'month', 'day'):
+            scoped = queryset if kind == 'year' else queryset.filter(id=self.first.id)
+            self.assertEqual(list(scoped.datetimes('created_at', kind)), list(Order.objects.filter(id__in=scoped.values('id')).datetimes('created_at', kind)))
+
+        response = self.client.get('/admin/menu/order/', {'created_at__year': '2024', 'created_at__month': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order.id for order in response.context['cl'].result_list], [self.second.id])
+
+    def test_paginator_caps_filtered_count(self):
+        paginator = EstimatedCountPaginator(Order.objects.filter(status='AWAITING_PAYMENT'), 1)
+        paginator.max_count = 1
+        self.assertEqual(paginator.count, 1)
+
+
+class OrderEventSLATest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('sla-admin', 'sla@example.com', 'pw'))
+        self.menu_item = MenuItem.objects.create(name="ข้าวผัด", price=Decimal("60.00"))
+
+    def test_transitions_are_logged_and_timed(self):
+        response = self.client.post('/api/orders/submit-final/', {
+            "customer_name": "ทดสอบ", "customer_phone": "0812345678", "customer_address": "-",
+            "items": f'[{{"id": {self.menu_item.id}, "quantity": 1}}]',
+        }, format='multipart')
+        order_id = response.data['order_id']
+        intent_id = self.client.post('/api/payment/create-intent/', {'order_id': order_id}, format='json').data['intent_id']
+        self.client.post('/api/webhook/simulator/', {'intent_id': intent_id, 'status': 'success'}, format='json')
+        for new_status in ('DELIVERING', 'COMPLETED'):
+            response = self.client.patch(f'/api/admin/orders/{order_id}/update-status/', {'status': new_status}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        events = OrderEvent.objects.filter(order_id=order_id).order_by('id')
+        self.assertEqual(
+            [(event.from_status, event.to_status, event.source) for event in events],
+            [
+                ('', 'AWAITING_PAYMENT', 'customer'),
+                ('AWAITING_PAYMENT', 'PREPARING', 'webhook'),
+                ('PREPARING', 'DELIVERING', 'admin'),
+                ('DELIVERING', 'COMPLETED', 'admin'),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            events[0].save()
+
+        response = self.client.get('/api/admin/sla/', {'window': '1h'})
+        self.assertEqual(response.status_code, 200)
+        stages = response.json()['1h']
+        self.assertEqual([stages[name]['count'] for name in ('pay_to_prep', 'prep_to_delivery', 'delivery_to_complete')], [1, 1, 1])
+        self.assertEqual(self.client.get('/api/admin/sla/', {'window': '2y'}).status_code, 400)
+
+    def test_percentile_from_histogram(self):
+        # 10 ออเดอร์ใน bucket 300-420 วินาที, 10 ออเดอร์ใน bucket 600-900 วินาที
+        counts = {bucket_for(400): 10, bucket_for(700): 10}
+        self.assertEqual(percentile_from_histogram(counts, 25), 360)
+        self.assertEqual(percentile_from_histogram(counts, 100), 900)
+        self.assertIsNone(percentile_from_histogram({}, 50))
+
+
+class SchedulerTest(ResetSharedStateMixin, TransactionTestCase):
+    def test_lease_has_one_holder(self):
+        first = Lease('test', 'worker-1', seconds=30)
+        second = Lease('test', 'worker-2', seconds=30)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())  # ต่ออายุ
+
+        first.release()
+        self.assertTrue(second.acquire())
+
+        # leader ตาย (ไม่ต่ออายุ) -> lease หมดอายุแล้วคนอื่นรับต่อ
+        SchedulerLease.objects.filter(name='test').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(first.acquire())
+
+    def test_only_leader_runs_jobs_and_records_timing(self):
+        calls = []
+        jobs = {
+            'ok': Job('ok', lambda: calls.append('ok'), interval=60, jitter=0, timeout=5),
+            'broken': Job('broken', lambda: 1 / 0, interval=60, jitter=0, timeout=5),
+        }
+        leader = Scheduler(jobs, holder='leader', tick=0)
+        follower = Scheduler(jobs, holder='follower', tick=0)
+        # SQLite ของเทสต์เขียนพร้อมกันหลาย thread ไม่ได้ (table is locked) -> ให้สองงานบันทึกผลทีละงาน
+        record_lock = threading.Lock()
+
+        def record_one_at_a_time(*args):
+            with record_lock:
+                return _record_run(*args)
+
+        try:
+            with patch('menu.scheduler._record_run', side_effect=record_one_at_a_time):
+                self.assertEqual(sorted(leader.run_pending(now=0)), ['broken', 'ok'])
+                for job in leader.jobs:
+                    job.future.result(timeout=5)
+            self.assertEqual(follower.run_pending(now=0), [])
+            # ยังไม่ถึงรอบถัดไป
+            self.assertEqual(leader.run_pending(now=1), [])
+        finally:
+            leader.shutdown()
+            follower.shutdown()
+
+        self.assertEqual(calls, ['ok'])
+        states = {state.name: state for state in ScheduledJobState.objects.all()}
+        self.assertEqual((states['ok'].runs, states['ok'].failures), (1, 0))
+        self.assertEqual((states['broken'].runs, states['broken'].failures), (1, 1))
+        self.assertIn('ZeroDivisionError', states['broken'].last_error)
+        # shutdown คืน lease แล้ว
+        self.assertEqual(SchedulerLease.objects.get(name='scheduler').holder, '')
+
+    def test_run_all_now_skips_job_still_running(self):
+        release = threading.Event()
+        calls = []
+        jobs = {'slow': Job('slow', lambda: calls.append('slow') or release.wait(5), interval=60, jitter=0, timeout=1)}
+        scheduler = Scheduler(jobs, holder='leader', tick=0)
+        try:
+            with patch('menu.scheduler._record_run'):
+                self.assertEqual(scheduler.run_pending(now=0), ['slow'])
+                self.assertEqual(scheduler.run_all_now(), {'slow': (0.0, 'skipped: still running')})
+                release.set()
+                scheduler.jobs[0].future.result(timeout=5)
+                self.assertEqual(scheduler.run_all_now()['slow'][1], '')
+        finally:
+            release.set()
+            scheduler.shutdown()
+        self.assertEqual(calls, ['slow', 'slow'])
+
+    def test_statement_timeout_is_reset_after_job(self):
+        # DB_POOL=1: connection ถูกคืนเข้า pool -> timeout ของงานต้องไม่ติดไปกับ request ถัดไป
+        seen = []
+
+        def fake_postgres(execute, sql, params, many, context):
+            if 'statement_timeout' in sql:
+                seen.append(sql)
+                return None
+            return execute(sql, params, many, context)
+
+        # _record_run ใช้ GREATEST (compile ตาม vendor) -> ข้ามไป เทสต์แค่การตั้ง / คืนค่า timeout
+        with patch.object(connection, 'vendor', 'postgresql'), patch('menu.scheduler._record_run'), connection.execute_wrapper(fake_postgres):
+            _run_job(Job('boom', lambda: 1 / 0, interval=60, jitter=0, timeout=5), 'leader')
+        self.assertEqual(len(seen), 2)
+        self.assertIn('set_config', seen[0])
+        self.assertEqual(seen[1], 'RESET statement_timeout')
+
+
+class MaintenanceJobsTest(ResetSharedStateMixin, TestCase):
+    @override_settings(UNPAID_ORDER_EXPIRY_MINUTES=60)
+    def test_expire_unpaid_orders(self):
+        stale = Order.objects.create(customer_name="ค้าง", customer_phone="0812345678", customer_address="-", customer_telegram_chat_id='555')
+        fresh = Order.objects.create(customer_name="ใหม่", customer_phone="0812345678", customer_address="-")
+        # upload slip แล้ว รอ admin ตรวจ -> ไม่ยกเลิก
+        slip = Order.objects.create(customer_name="สลิป", customer_phone="0812345678", customer_address="-", payment_slip='slips/abc')
+        Order.objects.filter(id__in=[stale.id, slip.id]).update(created_at=timezone.now() - timedelta(hours=2))
+
+        with patch('menu.views.send_customer_telegram_notification') as notify:
+            self.assertEqual(expire_unpaid_orders(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        slip.refresh_from_db()
+        self.assertEqual((stale.status, fresh.status, slip.status), ('CANCELLED', 'AWAITING_PAYMENT', 'AWAITING_PAYMENT'))
+        self.assertEqual(stale.events.get().source, 'system')
+        [(order, message), _] = notify.call_args
+        self.assertEqual(order.id, stale.id)
+        self.assertIn("ยกเลิก", message)
+
+    @override_settings(UNPAID_ORDER_EXPIRY_MINUTES=60)
+    def test_expiry_counts_from_latest_payment_intent(self):
+        order = Order.objects.create(customer_name="จ่ายใหม่", customer_phone="0812345678", customer_address="-")
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(hours=5))
+        response = APIClient().post('/api/payment/create-intent/', {'order_id': order.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(expire_unpaid_orders(), 0)
+
+        Order.objects.filter(id=order.id).update(payment_intent_created_at=timezone.now() - timedelta(hours=2))
+        with patch('menu.views.send_customer_telegram_notification'):
+            self.assertEqual(expire_unpaid_orders(), 1)
+
+    def test_expiry_is_off_by_default(self):
+        stale = Order.objects.create(customer_name="ค้าง", customer_phone="0812345678", customer_address="-")
+        Order.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(expire_unpaid_orders(), 0)
+
+
+class MenuImageVariantsTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cloudinary.config(cloud_name='test')
+        self.addCleanup(cloudinary.reset_config)
+
+    def make_jpeg(self, size=(800, 600)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 80, 20)).save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def test_placeholder_is_tiny_data_uri(self):
+        placeholder = build_placeholder(self.make_jpeg())
+        self.assertTrue(placeholder.startswith('data:image/jpeg;base64,'))
+        self.assertLess(len(placeholder), 1000)
+
+    def test_unreadable_image_skips_placeholder_but_bugs_propagate(self):
+        resource = CloudinaryResource('menu/broken', format='jpg', version=1, type='upload', resource_type='image')
+        variants = build_image_variants(resource, b'not an image')
+        self.assertEqual(variants['placeholder'], '')
+        self.assertTrue(variants['srcset'])
+        # ตัดไฟล์ JPEG กลางคัน -> OSError ตอนอ่าน
+        self.assertEqual(build_image_variants(resource, self.make_jpeg()[:200])['placeholder'], '')
+
+        with patch('menu.images.build_placeholder', side_effect=TypeError('bug')):
+            with self.assertRaises(TypeError):
+                build_image_variants(resource, self.make_jpeg())
+
+    @patch('cloudinary.models.uploader.upload_resource')
+    def test_upload_precomputes_srcset_and_placeholder(self, upload_resource):
+        upload_resource.return_value = CloudinaryResource('menu/khao', format='jpg', version=1, type='upload', resource_type='image')
+        item = MenuItem.objects.create(
+            name="ข้าวผัด", price=Decimal("60.00"),
+            image=SimpleUploadedFile('khao.jpg', self.make_jpeg(), content_type='image/jpeg'),
+        )
+        upload_resource.assert_called_once()
+
+        data = MenuItemSerializer(MenuItem.objects.get(id=item.id)).data
+        self.assertIn('w_960', data['image_url'])
+        self.assertIn('f_auto', data['image_url'])
+        self.assertEqual(data['image_srcset'].count('w,'), 4)
+        self.assertIn('w_160', data['image_srcset'])
+        self.assertTrue(data['image_placeholder'].startswith('data:image/jpeg;base64,'))
+
+        # บันทึกซ้ำโดยไม่เปลี่ยนรูป -> ไม่ upload ใหม่ และ variants เดิมยังอยู่
+        item = MenuItem.objects.get(id=item.id)
+        item.name = "ข้าวผัดกุ้ง"
+        item.save()
+        upload_resource.assert_called_once()
+        self.assertEqual(MenuItem.objects.get(id=item.id).image_variants['public_id'], 'menu/khao')
+
+    def test_existing_image_without_variants_falls_back_to_original_url(self):
+        item = MenuItem.objects.create(name="ต้มยำ", price=Decimal("80.00"), image='image/upload/v1/menu/tom.jpg')
+        self.assertEqual(item.image_variants['public_id'], 'menu/tom')
+
+        MenuItem.objects.filter(id=item.id).update(image_variants={})
+        data = MenuItemSerializer(MenuItem.objects.get(id=item.id)).data
+        self.assertTrue(data['image_url'].startswith('https://'))
+        self.assertIsNone(data['image_srcset'])
+        self.assertIsNone(data['image_placeholder'])
+
+        item = MenuItem.objects.get(id=item.id)
+        item.image = None
+        item.save()
+        self.assertEqual(MenuItem.objects.get(id=item.id).image_variants, {})
+
+
+class PromotionTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.drinks = Category.objects.create(name="เครื่องดื่ม")
+        self.rice = MenuItem.objects.create(name="ข้าวมันไก่", price=Decimal("60.00"))
+        self.tea = MenuItem.objects.create(name="ชาไทย", price=Decimal("40.00"), category=self.drinks)
+        self.coffee = MenuItem.objects.create(name="กาแฟ", price=Decimal("50.00"), category=self.drinks)
+
+    def rule(self, **fields):
+        item_ids = fields.pop('item_ids', ())
+        return Rule(Promotion(id=fields.pop('id', 1), name=fields.pop('name', 'promo'), **fields), item_ids)
+
+    def test_buy_x_get_y_frees_cheapest_in_each_group(self):
+        lines = [CartLine(1, 'a', Decimal('50'), 3), CartLine(2, 'b', Decimal('40'), 2)]
+        quote = quote_cart(lines, rules=[self.rule(kind='BUY_X_GET_Y', buy_quantity=1, free_quantity=1)])
+        # 50 50 | 50 40 | 40 -> ฟรี 50 + 40, ชิ้นสุดท้ายไม่ครบชุด
+        self.assertEqual(quote.discount_total, Decimal('90.00'))
+        self.assertEqual(quote.total, Decimal('140.00'))
+
+        big = quote_cart([CartLine(1, 'a', Decimal('10'), 10 ** 9)], rules=[self.rule(kind='BUY_X_GET_Y', buy_quantity=2, free_quantity=1)])
+        self.assertEqual(big.discount_total, Decimal('10') * (10 ** 9 // 3))
+
+    def test_bundle_is_arithmetic_for_large_quantities(self):
+        bundle = self.rule(kind='BUNDLE', buy_quantity=2, bundle_price=Decimal('70'))
+        big = quote_cart([CartLine(1, 'a', Decimal('50'), 10 ** 12 + 1)], rules=[bundle])
+        self.assertEqual(big.discount_total, Decimal('30') * (10 ** 12 // 2))
+        # ชุดที่ 1 (50+40) คุ้ม, ชุดที่ 2 (40+30) ไม่คุ้ม -> หยุด
+        lines = [CartLine(1, 'a', Decimal('50'), 1), CartLine(2, 'b', Decimal('40'), 2), CartLine(3, 'c', Decimal('30'), 1)]
+        self.assertEqual(quote_cart(lines, rules=[bundle]).discount_total, Decimal('20'))
+
+    def test_bundle_and_percent_do_not_stack(self):
+        rules = [
+            self.rule(id=1, name='2 drinks 70', kind='BUNDLE', category_id=self.drinks.id, buy_quantity=2, bundle_price=Decimal('70')),
+            self.rule(id=2, name='10% off', kind='PERCENT', percent=Decimal('10')),
+        ]
+        lines = [CartLine.from_menu_item(self.coffee, 1), CartLine.from_menu_item(self.tea, 2), CartLine.from_menu_item(self.rice, 1)]
+        quote = quote_cart(lines, rules=rules)
+        # bundle: กาแฟ+ชา (90 -> 70) = 20, ชาที่เหลือ 40 + ข้าว 60 ได้ 10% = 10
+        self.assertEqual([(p['name'], p['amount']) for p in quote.promotions], [('2 drinks 70', Decimal('20.00')), ('10% off', Decimal('10.00'))])
+        self.assertEqual(quote.total, Decimal('160.00'))
+
+    def test_time_window_and_days(self):
+        now = timezone.make_aware(timezone.datetime(2026, 10, 19, 23, 30))  # วันจันทร์
+        late_night = self.rule(kind='PERCENT', percent=Decimal('50'), start_time=timezone.datetime(2000, 1, 1, 22).time(), end_time=timezone.datetime(2000, 1, 1, 2).time())
+        self.assertTrue(late_night.is_live(now))
+        self.assertFalse(late_night.is_live(now - timedelta(hours=12)))
+        self.assertFalse(self.rule(kind='PERCENT', percent=Decimal('5'), days_of_week='56').is_live(now))
+        self.assertFalse(self.rule(kind='PERCENT', percent=Decimal('5'), ends_at=now).is_live(now))
+
+    def test_quote_and_order_use_compiled_rules(self):
+        for index in range(5):
+            promotion = Promotion.objects.create(name=f"tea {index}", kind='PERCENT', percent=Decimal('10'), priority=index)
+            promotion.menu_items.add(self.tea)
+        Promotion.objects.create(name="inactive", kind='PERCENT', percent=Decimal('90'), is_active=False)
+        items = [{'id': self.tea.id, 'quantity': 2}, {'id': self.rice.id, 'quantity': 1}]
+
+        response = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['subtotal'], '140.00')
+        self.assertEqual(response.data['discount_total'], '8.00')
+        self.assertEqual([p['name'] for p in response.data['promotions']], ['tea 0'])
+
+        # rule และตารางราคาถูก build ไว้แล้ว: quote ครั้งถัดไปไม่แตะ DB เลย ไม่ว่าจะมีกี่โปร
+        with self.assertNumQueries(0):
+            self.client.post('/api/orders/quote/', {'items': items}, format='json')
+
+        response = self.client.post('/api/orders/submit-final/', {
+            'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-",
+            'items': json.dumps(items),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.data['order_id'])
+        self.assertEqual((order.total_price, order.discount_total), (Decimal('132.00'), Decimal('8.00')))
+        self.assertEqual(order.applied_promotions[0]['amount'], '8.00')
+
+        # แก้โปรใน admin -> rule ถูก build ใหม่
+        Promotion.objects.filter(name="inactive").get().menu_items.add(self.rice)
+        Promotion.objects.filter(name="inactive").update(is_active=True)
+        Promotion.objects.get(name="inactive").save()
+        response = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertEqual(response.data['discount_total'], '62.00')
+
+    def test_quote_rejects_bad_items(self):
+        response = self.client.post('/api/orders/quote/', {'items': [{'id': self.tea.id, 'quantity': 0}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Invalid item structure')
+        response = self.client.post('/api/orders/quote/', {'items': [{'id': self.tea.id, 'quantity': 10 ** 12}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_duplicate_items_are_merged_in_quote_and_order(self):
+        items = [{'id': self.tea.id, 'quantity': 1}, {'id': self.rice.id, 'quantity': 1}, {'id': self.tea.id, 'quantity': 2}]
+        quote = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertTrue(quote.data['valid'])
+        self.assertEqual([(item['id'], item['quantity']) for item in quote.data['items']], [(self.tea.id, 3), (self.rice.id, 1)])
+
+        response = self.client.post('/api/orders/submit-final/', {
+            'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-",
+            'items': json.dumps(items),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(str(Order.objects.get(id=response.data['order_id']).total_price), quote.data['total'])
+
+        items = [{'id': self.tea.id, 'quantity': 60}, {'id': self.tea.id, 'quantity': 60}]
+        response = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_quote_rejects_non_object_body(self):
+        response = self.client.post('/api/orders/quote/', [{'id': self.tea.id, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/orders/submit-final/', [{'id': self.tea.id, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_quote_reports_removed_and_unavailable_items(self):
+        items = [{'id': self.tea.id, 'quantity': 1}, {'id': self.coffee.id, 'quantity': 1}, {'id': 9999, 'quantity': 1}]
+        self.client.post('/api/orders/quote/', {'items': items}, format='json')
+
+        # ปิดขายผ่าน admin -> signal bump เวอร์ชัน -> ตารางราคาใน memory ถูก build ใหม่
+        self.coffee.is_available = False
+        self.coffee.save()
+        response = self.client.post('/api/orders/quote/', {'items': json.dumps(items)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['valid'])
+        self.assertEqual(
+            [(problem['id'], problem['error']) for problem in response.data['problems']],
+            [(self.coffee.id, 'unavailable'), (9999, 'not_found')],
+        )
+        self.assertEqual([item['id'] for item in response.data['items']], [self.tea.id])
+        self.assertEqual(response.data['total'], '40.00')
+
+
+@override_settings(
+    TIME_SLOT_MINUTES=30, TIME_SLOT_CAPACITY=2, TIME_SLOT_OPEN='10:00', TIME_SLOT_CLOSE='12:00',
+    TIME_SLOT_DAYS_AHEAD=1, TIME_SLOT_LEAD_MINUTES=30,
+)
+class TimeSlotTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.menu_item = MenuItem.objects.create(name="ข้าวกะเพรา", price=Decimal("50.00"))
+        ensure_slots()
+        self.slot = TimeSlot.objects.filter(starts_at__gte=timezone.now() + timedelta(hours=1)).first()
+
+    def submit(self, slot_id):
+        return self.client.post('/api/orders/submit-final/', {
+            'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-",
+            'items': json.dumps([{'id': self.menu_item.id, 'quantity': 1}]),
+            'time_slot_id': slot_id,
+        }, format='multipart')
+
+    def test_ensure_slots_fills_days_ahead_once(self):
+        morning = timezone.make_aware(timezone.datetime(2026, 10, 19, 8, 0))
+        TimeSlot.objects.all().delete()
+        # 10:00-12:00 ทีละ 30 นาที = 4 slot ต่อวัน, วันนี้ + 1 วัน
+        self.assertEqual(ensure_slots(now=morning), 8)
+        self.assertEqual(ensure_slots(now=morning), 0)
+        self.assertEqual(
+            [timezone.localtime(start).strftime('%H:%M') for start in TimeSlot.objects.values_list('starts_at', flat=True)[:4]],
+            ['10:00', '10:30', '11:00', '11:30'],
+        )
+
+    def test_claims_stop_at_capacity(self):
+        self.assertIsNotNone(claim_slot(self.slot.id))
+        self.assertIsNotNone(claim_slot(self.slot.id))
+        self.assertIsNone(claim_slot(self.slot.id))
+        self.assertNotIn(self.slot.id, [slot['id'] for slot in open_slots()])
+
+        # slot ที่ใกล้เกินไป (ภายใน lead time) จองไม่ได้
+        soon = TimeSlot.objects.create(starts_at=timezone.now() + timedelta(minutes=5), ends_at=timezone.now() + timedelta(minutes=35), capacity=5)
+        self.assertIsNone(claim_slot(soon.id))
+
+    def test_order_claims_slot_and_cancel_releases_it(self):
+        response = self.client.get('/api/slots/')
+        self.assertEqual(response.status_code, 200)
+        listed = {slot['id']: slot['remaining'] for slot in response.data}
+        self.assertEqual(listed[self.slot.id], 2)
+
+        first = self.submit(self.slot.id)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.submit(self.slot.id).status_code, 201)
+        full = self.submit(self.slot.id)
+        self.assertEqual(full.status_code, 409)
+        self.assertEqual(Order.objects.count(), 2)
+
+        order = Order.objects.get(id=first.data['order_id'])
+        self.assertEqual(order.scheduled_for, self.slot.starts_at)
+        self.assertIsNotNone(self.client.get(f'/api/orders/{order.id}/').data['scheduled_for'])
+
+        # คืนที่ตอน save ไม่ว่าจะเรียก record_transition หรือไม่ และ save ซ้ำไม่คืนซ้ำ
+        order.status = 'CANCELLED'
+        order.save(update_fields=['status'])
+        order.save()
+        Order.objects.get(id=order.id).save()
+        self.assertEqual(TimeSlot.objects.get(id=self.slot.id).booked, 1)
+        self.assertEqual(self.submit(self.slot.id).status_code, 201)
+
+        # record_transition จด log อย่างเดียว
+        second = Order.objects.exclude(id=order.id).filter(time_slot=self.slot).first()
+        second.status = 'CANCELLED'
+        record_transition(second, 'AWAITING_PAYMENT', 'UNPAID', source='admin')
+        self.assertEqual(TimeSlot.objects.get(id=self.slot.id).booked, 2)
+
+    def test_malformed_slot_id_is_400(self):
+        self.assertEqual(self.submit('abc').status_code, 400)
+        response = self.client.post('/api/orders/quote/', {
+            'items': [{'id': self.menu_item.id, 'quantity': 1}], 'time_slot_id': 'abc',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TimeSlot.objects.get(id=self.slot.id).booked, 0)
+
+    def test_admin_cannot_lower_capacity_below_booked(self):
+        TimeSlot.objects.filter(id=self.slot.id).update(booked=2)
+        self.client.force_login(User.objects.create_superuser('slot-admin', 'slot@example.com', 'pw'))
+        url = f'/admin/menu/timeslot/{self.slot.id}/change/'
+        starts_at = timezone.localtime(self.slot.starts_at)
+        ends_at = timezone.localtime(self.slot.ends_at)
+        form = {
+            'kitchen': self.slot.kitchen_id,
+            'starts_at_0': f"{starts_at:%Y-%m-%d}", 'starts_at_1': f"{starts_at:%H:%M:%S}",
+            'ends_at_0': f"{ends_at:%Y-%m-%d}", 'ends_at_1': f"{ends_at:%H:%M:%S}",
+        }
+        response = self.client.post(url, {**form, 'capacity': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Capacity cannot be lower than the 2 orders already booked.")
+        self.assertEqual(TimeSlot.objects.get(id=self.slot.id).capacity, 2)
+
+        self.assertEqual(self.client.post(url, {**form, 'capacity': 3}).status_code, 302)
+        self.assertEqual(TimeSlot.objects.get(id=self.slot.id).capacity, 3)
+
+
+class AvailabilityScheduleTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.breakfast = Category.objects.create(name="อาหารเช้า")
+        self.porridge = MenuItem.objects.create(name="โจ๊ก", price=Decimal("45.00"), category=self.breakfast)
+        self.toast = MenuItem.objects.create(name="ขนมปังปิ้ง", price=Decimal("30.00"), category=self.breakfast)
+        self.rice = MenuItem.objects.create(name="ข้าวผัด", price=Decimal("60.00"))
+
+    def at(self, day, hour, minute=0):
+        # 2026-10-19 เป็นวันจันทร์
+        return timezone.make_aware(timezone.datetime(2026, 10, 19 + day, hour, minute))
+
+    def test_index_handles_overrides_and_midnight(self):
+        t = timezone.datetime.strptime
+        schedule = build_schedule(
+            [
+                (None, 1, '01234', t('07:00', '%H:%M').time(), t('10:30', '%H:%M').time()),
+                (3, None, '', t('22:00', '%H:%M').time(), t('02:00', '%H:%M').time()),
+                (2, None, '6', t('09:00', '%H:%M').time(), t('12:00', '%H:%M').time()),
+            ],
+            {1: 1, 2: 1},
+        )
+        self.assertTrue(schedule.is_available(1, self.at(0, 7)))
+        self.assertFalse(schedule.is_available(1, self.at(0, 10, 30)))
+        self.assertFalse(schedule.is_available(1, self.at(5, 8)))
+        # เมนู 2 มี window ของตัวเอง (อาทิตย์) แทน window ของหมวด
+        self.assertFalse(schedule.is_available(2, self.at(0, 8)))
+        self.assertTrue(schedule.is_available(2, self.at(6, 9)))
+        # ข้ามเที่ยงคืน และข้ามคืนวันอาทิตย์ -> เช้าวันจันทร์
+        self.assertTrue(schedule.is_available(3, self.at(6, 23)))
+        self.assertTrue(schedule.is_available(3, self.at(0, 1, 59)))
+        self.assertFalse(schedule.is_available(3, self.at(0, 2)))
+        self.assertTrue(schedule.is_available(99, self.at(3, 3)))
+        # ช่วงที่ปิดเมนูชุดเดียวกันใช้ segment เดียวกัน (payload cache key เดียวกัน)
+        self.assertEqual(schedule.segment_at(self.at(0, 12)), schedule.segment_at(self.at(1, 15)))
+
+    def test_menu_payload_follows_windows_without_queries(self):
+        AvailabilityWindow.objects.create(category=self.breakfast, start_time='07:00', end_time='10:30')
+        AvailabilityWindow.objects.create(menu_item=self.toast, days_of_week='56', start_time='07:00', end_time='12:00')
+
+        names = lambda items: sorted(item['name'] for item in items)
+        self.assertEqual(names(get_menu_items(self.at(0, 8))), ['ข้าวผัด', 'โจ๊ก'])
+        with self.assertNumQueries(0):
+            self.assertEqual(names(get_menu_items(self.at(0, 11))), ['ข้าวผัด'])
+            self.assertEqual(names(get_menu_items(self.at(5, 11))), ['ขนมปังปิ้ง', 'ข้าวผัด'])
+            self.assertEqual(len(get_menu_grouped(self.at(0, 11))), 1)
+
+    def test_scheduled_orders_check_availability_at_slot_time(self):
+        today = timezone.localtime()
+        tomorrow = today + timedelta(days=1)
+        slot = TimeSlot.objects.create(
+            starts_at=tomorrow.replace(hour=19, minute=0, second=0, microsecond=0),
+            ends_at=tomorrow.replace(hour=19, minute=30, second=0, microsecond=0), capacity=5,
+        )
+        # โจ๊กขายเฉพาะพรุ่งนี้, ข้าวผัดขายเฉพาะวันนี้
+        AvailabilityWindow.objects.create(menu_item=self.porridge, days_of_week=str(tomorrow.weekday()), start_time='00:00', end_time='23:59')
+        AvailabilityWindow.objects.create(menu_item=self.rice, days_of_week=str(today.weekday()), start_time='00:00', end_time='23:59')
+
+        def submit(item):
+            return self.client.post('/api/orders/submit-final/', {
+                'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-",
+                'items': json.dumps([{'id': item.id, 'quantity': 1}]), 'time_slot_id': slot.id,
+            }, format='multipart')
+
+        quote = self.client.post('/api/orders/quote/', {'items': [{'id': self.porridge.id, 'quantity': 1}], 'time_slot_id': slot.id}, format='json')
+        self.assertTrue(quote.data['valid'])
+        self.assertEqual(submit(self.porridge).status_code, 201)
+
+        rejected = submit(self.rice)
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(rejected.data['error'], 'Some menu items are not available at the requested time')
+        # ที่ใน slot ที่จองไว้ถูกคืนพร้อม rollback
+        self.assertEqual(TimeSlot.objects.get(id=slot.id).booked, 1)
+
+    def test_orders_and_quotes_reject_items_outside_their_window(self):
+        today = timezone.localtime().weekday()
+        other_days = ''.join(str(day) for day in range(7) if day != today)
+        AvailabilityWindow.objects.create(menu_item=self.porridge, days_of_week=other_days, start_time='00:00', end_time='23:59')
+        items = [{'id': self.porridge.id, 'quantity': 1}]
+
+        quote = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertEqual(quote.data['problems'][0]['error'], 'unavailable')
+        response = self.client.post('/api/orders/submit-final/', {
+            'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-",
+            'items': json.dumps(items),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Some menu items are not available right now')
+        self.assertNotIn(self.porridge.id, [item['id'] for item in self.client.get('/api/items/').data])
+
+
+class MenuImportTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.drinks = Category.objects.create(name="เครื่องดื่ม")
+        self.tea = MenuItem.objects.create(name="ชาไทย", price=Decimal("40.00"), category=self.drinks)
+        self.coffee = MenuItem.objects.create(name="กาแฟ", price=Decimal("50.00"), category=self.drinks)
+
+    def csv_rows(self, lines):
+        return read_rows("name,price,category,is_available\n" + "\n".join(lines))
+
+    def test_diffs_against_current_rows_and_invalidates_once(self):
+        rows = self.csv_rows(["ชาไทย,45,เครื่องดื่ม,true", "กาแฟ,50.00,เครื่องดื่ม,true", "ข้าวเหนียวมะม่วง,80,ของหวาน,false"])
+        with patch('menu.importer.bump_menu_version') as bump, self.captureOnCommitCallbacks(execute=True):
+            result = import_menu(rows)
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.created, result.updated, result.unchanged, result.categories), (1, 1, 1, 1))
+        self.assertEqual(bump.call_count, 1)
+        self.tea.refresh_from_db()
+        self.assertEqual(self.tea.price, Decimal("45.00"))
+        mango = MenuItem.objects.get(name="ข้าวเหนียวมะม่วง")
+        self.assertEqual((mango.category.name, mango.is_available), ("ของหวาน", False))
+
+        # ไฟล์เดิมซ้ำ -> ไม่มีอะไรเปลี่ยน ไม่ต้อง invalidate
+        with patch('menu.importer.bump_menu_version') as bump, self.captureOnCommitCallbacks(execute=True):
+            result = import_menu(rows)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 3))
+        self.assertEqual(bump.call_count, 0)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def queries_for(prefix, count, price):
+            rows = self.csv_rows([f"{prefix} {index},{price},,true" for index in range(count)])
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(import_menu(rows).errors, [])
+            return len(queries)
+
+        # สร้างใหม่ 5 vs 60 รายการ, แก้ราคา 5 vs 60 รายการ -> จำนวน query เท่ากัน
+        self.assertEqual(queries_for('a', 5, 10), queries_for('b', 60, 10))
+        self.assertEqual(queries_for('a', 5, 20), queries_for('b', 60, 20))
+
+    def test_invalid_rows_abort_everything(self):
+        result = import_menu(self.csv_rows(["ชาไทย,99,,true", "ขนม,abc,,true", ",10,,true"]))
+        self.assertEqual(len(result.errors), 2)
+        self.assertEqual(MenuItem.objects.get(id=self.tea.id).price, Decimal("40.00"))
+
+    @patch('menu.importer._read_image', return_value=b'not-an-image')
+    @patch('cloudinary.uploader.upload_resource')
+    def test_images_upload_through_pool(self, upload_resource, read_image):
+        cloudinary.config(cloud_name='test')
+        self.addCleanup(cloudinary.reset_config)
+        upload_resource.side_effect = lambda data, filename: CloudinaryResource(
+            f"menu/{filename.split('.')[0]}", format='jpg', version=1, type='upload', resource_type='image',
+        )
+        rows = read_rows('[{"name": "ชาไทย", "image": "https://example.com/tea.jpg"}, {"name": "โกโก้", "price": "45", "image": "/tmp/cocoa.jpg"}]')
+        result = import_menu(rows, workers=2, allow_local_images=True)
+        self.assertEqual((result.errors, result.images, result.created, result.updated), ([], 2, 1, 1))
+        self.assertEqual(upload_resource.call_count, 2)
+        self.assertEqual(MenuItem.objects.get(id=self.tea.id).image_variants['public_id'], 'menu/tea')
+        self.assertEqual(MenuItem.objects.get(name="โกโก้").image.public_id, 'menu/cocoa')
+
+    @patch('cloudinary.uploader.upload_resource')
+    def test_admin_import_refuses_local_and_internal_images(self, upload_resource):
+        rows = read_rows('[{"name": "ชาไทย", "image": "/etc/passwd"}, {"name": "กาแฟ", "image": "http://example.com/a.jpg"}]')
+        result = import_menu(rows)
+        self.assertEqual(result.errors, ["row 1: image must be an https:// URL", "row 2: image must be an https:// URL"])
+
+        for url in ['https://127.0.0.1/a.jpg', 'https://169.254.169.254/latest/meta-data', 'https://10.0.0.5/a.jpg', 'https://[::1]/a.jpg']:
+            with self.assertRaises(ValueError):
+                check_public_url(url)
+        result = import_menu(read_rows('[{"name": "ชาไทย", "image": "https://169.254.169.254/a.jpg"}]'))
+        self.assertIn("not a public address", result.errors[0])
+        upload_resource.assert_not_called()
+
+    def test_admin_import_and_export(self):
+        self.client.force_login(User.objects.create_superuser('import-admin', 'import@example.com', 'pw'))
+        response = self.client.post('/admin/menu/menuitem/', {
+            'action': 'export_as_csv', '_selected_action': [self.tea.id, self.coffee.id],
+        })
+        exported = response.content.decode()
+        self.assertIn('ชาไทย', exported)
+
+        upload = SimpleUploadedFile('menu.csv', exported.replace('40.00', '42.00').encode(), content_type='text/csv')
+        response = self.client.post('/admin/menu/menuitem/import/', {'file': upload})
+        self.assertRedirects(response, '/admin/menu/menuitem/', fetch_redirect_response=False)
+        self.assertEqual(MenuItem.objects.get(id=self.tea.id).price, Decimal("42.00"))
+
+
+class KitchenPartitionTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.riverside = Kitchen.objects.create(name="Riverside", slug='riverside', telegram_chat_id='-200')
+        self.main_dish = MenuItem.objects.create(name="ข้าวผัด", price=Decimal("60.00"))
+        self.river_dish = MenuItem.objects.create(name="ข้าวผัดปู", price=Decimal("120.00"), kitchen=self.riverside)
+
+    def names(self, response):
+        return [item['name'] for item in response.data]
+
+    def test_menu_reads_are_scoped_per_kitchen(self):
+        self.assertEqual(self.names(self.client.get('/api/items/')), ["ข้าวผัด"])
+        self.assertEqual(self.names(self.client.get('/api/items/?kitchen=riverside')), ["ข้าวผัดปู"])
+        self.assertEqual(self.names(self.client.get('/api/items/search/?q=ข้าว&kitchen=riverside')), ["ข้าวผัดปู"])
+        self.assertEqual(self.client.get('/api/items/?kitchen=nowhere').status_code, 404)
+
+        # แก้เมนูครัวหนึ่ง -> cache ของอีกครัวยังอยู่ (bump เฉพาะครัวนั้น)
+        self.client.get('/api/items/')
+        self.river_dish.price = Decimal("130.00")
+        self.river_dish.save()
+        with self.assertNumQueries(0):
+            self.client.get('/api/items/')
+
+    def test_orders_only_accept_items_from_their_kitchen(self):
+        items = json.dumps([{'id': self.river_dish.id, 'quantity': 1}])
+        response = self.client.post('/api/orders/quote/', {'items': items}, format='json')
+        self.assertEqual(response.data['problems'], [{'id': self.river_dish.id, 'name': None, 'error': 'not_found'}])
+
+        order = {'customer_name': "ทดสอบ", 'customer_phone': "0812345678", 'customer_address': "-", 'items': items}
+        self.assertEqual(self.client.post('/api/orders/submit-final/', order, format='multipart').status_code, 400)
+        with patch('menu.views.send_telegram_notification'):
+            response = self.client.post('/api/orders/submit-final/', {**order, 'kitchen': 'riverside'}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get(id=response.data['order_id']).kitchen, self.riverside)
+
+    def test_admin_stats_and_list_filter_by_kitchen(self):
+        Order.objects.create(customer_name="a", customer_phone="1", customer_address="-", total_price=Decimal("10"))
+        Order.objects.create(customer_name="b", customer_phone="2", customer_address="-", total_price=Decimal("10"), kitchen=self.riverside)
+        self.client.force_authenticate(User.objects.create_superuser('kitchen-admin', 'kitchen@example.com', 'pw'))
+
+        self.assertEqual(self.client.get('/api/admin/stats/').data['total_orders_count'], 2)
+        self.assertEqual(self.client.get('/api/admin/stats/?kitchen=riverside').data['total_orders_count'], 1)
+        response = self.client.get('/api/admin/orders/?kitchen=riverside')
+        orders = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([order['customer_name'] for order in orders], ["b"])
+
+    @patch.dict('os.environ', {'TELEGRAM_CHAT_ID': '-100'})
+    def test_admin_chat_comes_from_kitchen(self):
+        from .kitchens import kitchen_chat_id, kitchen_id_for
+
+        self.assertEqual(kitchen_chat_id(self.riverside.id), '-200')
+        self.assertEqual(kitchen_chat_id(kitchen_id_for()), '-100')
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET='hook-secret', TELEGRAM_BOT_USERNAME='kitsu_bot')
+class TelegramBotWebhookTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.objects.create(
+            customer_name="ทดสอบ", customer_phone="0812345678", customer_address="-", total_price=Decimal("80.00"),
+            status='PREPARING', items_summary=[{'name': "ข้าวมันไก่", 'quantity': 2}], item_count=2,
+        )
+
+    def send(self, text, chat_id=555, secret='hook-secret'):
+        update = {'update_id': 1, 'message': {'message_id': 1, 'chat': {'id': chat_id, 'type': 'private'}, 'text': text}}
+        return self.client.post('/api/webhook/telegram/', update, format='json', HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret)
+
+    def test_token_is_signed(self):
+        self.assertEqual(parse_order_token(order_token(self.order.id)), self.order.id)
+        self.assertIsNone(parse_order_token(f"{self.order.id + 1}-{order_token(self.order.id).split('-')[1]}"))
+        self.assertIsNone(parse_order_token("garbage"))
+
+    def test_start_links_chat_and_replies_in_webhook_response(self):
+        self.assertEqual(self.send('/start', secret='wrong').status_code, 403)
+
+        response = self.send(f"/start {order_token(self.order.id)}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['method'], response.data['chat_id']), ('sendMessage', 555))
+        self.assertIn("ข้าวมันไก่ x2", response.data['text'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.customer_telegram_chat_id, '555')
+
+        self.assertIn("ลิงก์นี้ไม่ถูกต้อง", self.send(f"/start {self.order.id}-0000").data['text'])
+
+    def test_orders_command_issues_chat_lookup_token(self):
+        Order.objects.filter(id=self.order.id).update(customer_telegram_chat_id='555')
+        text = self.send('/orders').data['text']
+        link = unescape(text.split('href="')[1].split('"')[0])
+        self.assertTrue(link.startswith('http://testserver/api/orders/lookup/?chat_id=555&token='))
+
+        response = self.client.get(link)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data['results']], [self.order.id])
+        # token ของ chat หนึ่งใช้กับ chat อื่นไม่ได้
+        self.assertEqual(self.client.get(link.replace('chat_id=555', 'chat_id=556')).status_code, 403)
+
+        with override_settings(ORDER_HISTORY_URL='https://shop.example/history?lang=th'):
+            text = self.send('/orders').data['text']
+        self.assertIn('https://shop.example/history?lang=th&amp;chat_id=555&amp;token=', text)
+
+    def test_status_lists_open_orders_of_chat_in_one_query(self):
+        Order.objects.filter(id=self.order.id).update(customer_telegram_chat_id='555')
+        Order.objects.create(
+            customer_name="ทดสอบ", customer_phone="0812345678", customer_address="-", total_price=Decimal("10.00"),
+            status='COMPLETED', customer_telegram_chat_id='555',
+        )
+        with self.assertNumQueries(1):
+            text = self.send('/status').data['text']
+        self.assertIn(f"Order #{self.order.id}", text)
+        self.assertEqual(text.count("Order #"), 1)
+        self.assertEqual(self.send('hello').data, {})
+
+
+class QueryPlanTest(ResetSharedStateMixin, TestCase):
+    def test_hot_queries_use_indexes(self):
+        results = check_query_plans(orders=300, menu_items=40)
+        self.assertEqual({result.query for result in results}, {query.name for query in HOT_QUERIES})
+        self.assertEqual([(result.query, result.problems) for result in results if result.problems], [])
+        # seed ถูก rollback
+        self.assertFalse(Order.objects.filter(payment_intent_id__startswith='pi_plan_').exists())
+
+    def test_detects_query_that_cannot_use_an_index(self):
+        # created_at__date แปลงค่าทุกแถวก่อนเทียบ -> อ่านทั้งตาราง (เหตุผลที่ dashboard_stats ใช้ช่วงเวลา)
+        by_date = HotQuery('stats by date', lambda context: list(Order.objects.filter(created_at__date=timezone.localdate())), 10)
+        [result] = check_query_plans([by_date], orders=50, menu_items=5)
+        self.assertTrue(result.problems)
+
+    def test_dashboard_stats_counts_today_by_range(self):
+        now = timezone.now()
+        Order.objects.create(customer_name="a", customer_phone="1", customer_address="-", total_price=Decimal("30"), status='COMPLETED')
+        Order.objects.create(customer_name="b", customer_phone="2", customer_address="-", total_price=Decimal("20"))
+        old = Order.objects.create(customer_name="c", customer_phone="3", customer_address="-", total_price=Decimal("99"), status='COMPLETED')
+        Order.objects.filter(id=old.id).update(created_at=now - timedelta(days=2))
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('stats-admin', 'stats@example.com', 'pw'))
+        response = client.get('/api/admin/stats/')
+        self.assertEqual(response.data, {'todays_revenue': '30.00', 'todays_orders_count': 2, 'total_orders_count': 3})
+
+
+class RequestProfilerTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        overrides = override_settings(REQUEST_PROFILE_DIR=self.directory.name, REQUEST_PROFILE_KEEP=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.admin = User.objects.create_superuser('profile-admin', 'profile@example.com', 'pw')
+        self.token = Token.objects.create(user=self.admin)
+
+    def profiled_get(self, path='/api/items/?_profile=1', token=None):
+        return APIClient().get(path, HTTP_AUTHORIZATION=f"Token {(token or self.token).key}")
+
+    def test_unrequested_request_is_not_profiled(self):
+        with patch('kitsu_backend.profiling.cProfile.Profile') as profile:
+            response = self.profiled_get('/api/items/')
+        profile.assert_not_called()
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_trigger_matches_exact_parameter(self):
+        with patch('kitsu_backend.profiling.cProfile.Profile') as profile:
+            self.profiled_get('/api/items/?x_profile=1')
+            self.profiled_get('/api/items/?_profile=10')
+        profile.assert_not_called()
+
+    def test_anonymous_trigger_does_not_look_up_token(self):
+        # ไม่มี Authorization -> ไม่ query ตาราง token
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/items/', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse([query for query in queries.captured_queries if 'authtoken' in query['sql']])
+
+    def test_non_staff_trigger_is_ignored(self):
+        user = User.objects.create_user('profile-customer', password='pw')
+        response = self.profiled_get(token=Token.objects.create(user=user))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_admin_request_is_profiled_and_pruned(self):
+        response = self.profiled_get()
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        [saved] = list_profiles()
+        self.assertEqual((saved['id'], saved['path'], saved['status'], saved['user']), (profile_id, '/api/items/?_profile=1', 200, 'profile-admin'))
+        self.assertGreater(saved['sql_count'], 0)
+        self.assertNotIn('sql', saved)
+
+        ids = [profile_id]
+        ids.append(APIClient().get('/api/items/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f"Token {self.token.key}")['X-Profile-Id'])
+        ids.append(self.profiled_get()['X-Profile-Id'])
+        # REQUEST_PROFILE_KEEP=2 -> อันแรกถูกลบ
+        self.assertEqual([profile['id'] for profile in list_profiles()], ids[:0:-1])
+
+    def test_admin_endpoints(self):
+        profile_id = self.profiled_get()['X-Profile-Id']
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual([profile['id'] for profile in client.get('/api/admin/profiles/').data], [profile_id])
+
+        detail = client.get(f'/api/admin/profiles/{profile_id}/').data
+        self.assertTrue(detail['sql'])
+        self.assertIn('function calls', detail['top_functions'])
+
+        download = client.get(f'/api/admin/profiles/{profile_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+        self.assertTrue(b''.join(download.streaming_content))
+
+        self.assertEqual(client.get('/api/admin/profiles/../settings/').status_code, 404)
+        self.assertEqual(client.get('/api/admin/profiles/20240101000000000000-deadbeef/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/admin/profiles/').status_code, 401)
+
+
+class ReceiptTest(ResetSharedStateMixin, TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        overrides = override_settings(RECEIPT_CACHE_DIR=self.directory.name, TELEGRAM_ASYNC_SENDER=True, RECEIPT_ON_COMPLETED=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.order = Order.objects.create(
+            customer_name="<ลูกค้า>", customer_phone="0812345678", customer_address="1 ถนนสุขุมวิท",
+            total_price=Decimal("90.00"), discount_total=Decimal("10.00"),
+            applied_promotions=[{'id': 1, 'name': "ลด 10", 'amount': "10.00"}],
+            item_count=2, items_summary=[{'name': "ข้าวผัด", 'quantity': 2, 'price': "50.00"}],
+        )
+        self.url = f'/api/orders/{self.order.id}/receipt'
+
+    def get(self, fmt, **extra):
+        return self.client.get(f'{self.url}.{fmt}', {'token': receipt_token(self.order.id)}, **extra)
+
+    def test_html_receipt(self):
+        response = self.get('html')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn("&lt;ลูกค้า&gt;", body)
+        self.assertIn("100.00", body)
+        self.assertIn("฿90.00", body)
+
+    def test_requires_token_or_admin(self):
+        self.assertEqual(self.client.get(f'{self.url}.html').status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}.html', {'token': 'nope'}).status_code, 404)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('receipt-admin', 'receipt@example.com', 'pw'))
+        self.assertEqual(client.get(f'{self.url}.png').status_code, 200)
+        self.assertEqual(self.get('pdf').status_code, 404)
+
+    def test_repeated_fetch_reads_cached_file(self):
+        first = self.get('png')
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        with patch.dict('menu.receipts.RENDERERS', {'png': lambda data: self.fail("re-rendered")}):
+            second = self.get('png')
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(self.get('png', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(os.listdir(self.directory.name), [f"{first['ETag'].strip(chr(34))}.png"])
+
+    def test_version_follows_receipt_content(self):
+        def version():
+            return receipt_version(receipt_data(receipt_queryset().get(id=self.order.id)))
+
+        unpaid = version()
+        Order.objects.filter(id=self.order.id).update(status='DELIVERING')
+        self.assertEqual(version(), unpaid)
+        Order.objects.filter(id=self.order.id).update(payment_status='PAID')
+        self.assertNotEqual(version(), unpaid)
+
+    def test_evicts_least_recently_used(self):
+        now = time.time()
+        for index, name in enumerate(['old.png', 'used.png', 'new.png']):
+            path = os.path.join(self.directory.name, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            os.utime(path, (now + index, now + index))
+        os.utime(os.path.join(self.directory.name, 'used.png'), (now + 10, now + 10))
+        self.assertEqual(evict(max_bytes=200), 1)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['new.png', 'used.png'])
+
+    def test_completed_notification_attaches_receipt(self):
+        Order.objects.filter(id=self.order.id).update(customer_telegram_chat_id='555', status='DELIVERING')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('receipt-staff', 'staff@example.com', 'pw'))
+        with patch.dict(os.environ, {'CUSTOMER_TELEGRAM_BOT_TOKEN': 'token'}), patch('menu.views.submit_message') as submit:
+            response = client.patch(f'/api/admin/orders/{self.order.id}/update-status/', {'status': 'COMPLETED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(submit.call_args.kwargs['photo'].startswith(b'\x89PNG'))
+        # ไฟล์เดียวกับที่ลูกค้าเปิดทีหลัง
+        self.assertEqual(self.get('png').content, submit.call_args.kwargs['photo'])
+
+    @override_settings(RECEIPT_ON_COMPLETED=False)
+    def test_completed_notification_without_receipt_font(self):
+        Order.objects.filter(id=self.order.id).update(customer_telegram_chat_id='555')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('receipt-off', 'off@example.com', 'pw'))
+        with patch.dict(os.environ, {'CUSTOMER_TELEGRAM_BOT_TOKEN': 'token'}), patch('menu.views.submit_message') as submit:
+            client.patch(f'/api/admin/orders/{self.order.id}/update-status/', {'status': 'COMPLETED'}, format='json')
+        self.assertIsNone(submit.call_args.kwargs['photo'])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_sender_sends_photo(self):
+        calls = []
+
+        async def transport(url, payload, files=None):
+            calls.append((url, payload, files))
+            return 200, {'ok': True}
+
+        async def run():
+            sender = TelegramSender(transport=transport)
+            await sender.enqueue(TelegramMessage('token', '42', 'done', parse_mode='HTML', photo=b'png'))
+            await sender.join()
+
+        asyncio.run(run())
+        [(url, payload, files)] = calls
+        self.assertTrue(url.endswith('/sendPhoto'))
+        self.assertEqual(payload, {'chat_id': '42', 'caption': 'done', 'parse_mode': 'HTML'})
+        self.assertEqual(files['photo'][1], b'png')
@@ -0,0 +1,267 @@
+# menu/throttling.py
+
+import math
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+from .services import normalize_phone
+
+# =======================================================
+#               RATE LIMITING / LOAD SHEDDING
+# =======================================================
+# - sliding window counter ต่อ key (IP / เบอร์โทร) แบบประมาณค่าจาก 2 window ติดกัน
+#   count = ของ window ก่อนหน้า * (ส่วนที่ยังทับอยู่) + ของ window ปัจจุบัน
+# - store มี 2 แบบ: 'memory' (ต่อ process) และ 'cache' (Django cache, แชร์กันทุก worker)
+# - AbuseSheddingMiddleware ตัดสินจาก path + IP อย่างเดียว -> ปฏิเสธได้ก่อนอ่าน body
+# - concurrency cap ต้องนับรวมทุก worker (sync worker มี request ในมือได้แค่ตัวเดียว นับต่อ process ไม่มีทางถึง cap)
+#   -> ใช้ ConcurrencyLimiter บน cache ที่แชร์กัน (CONCURRENCY_CACHE) เท่านั้น
+
+
+class MemoryWindowStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.prune_at = 10000
+
+    def incr(self, key, window_seconds):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if len(self.counts) > self.prune_at:
+                self._prune()
+                self.prune_at = max(10000, len(self.counts) * 2)
+            return self.counts[key]
+
+    def get(self, key):
+        return self.counts.get(key, 0)
+
+    def _prune(self):
+        # key มี window index ต่อท้าย เก็บไว้เฉพาะ 2 window ล่าสุดของแต่ละ prefix
+        latest = {}
+        for key in self.counts:
+            prefix, _, window = key.rpartition(':')
+            latest[prefix] = max(latest.get(prefix, 0), int(window))
+        self.counts = {
+            key: count for key, count in self.counts.items()
+            if int(key.rpartition(':')[2]) >= latest[key.rpartition(':')[0]] - 1
+        }
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+class CacheWindowStore:
+    def incr(self, key, window_seconds):
+        # add ก่อน (อายุ 2 window เพราะต้องใช้เป็น "window ก่อนหน้า" ต่อ)
+        cache.add(key, 0, timeout=window_seconds * 2)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=window_seconds * 2)
+            return 1
+
+    def get(self, key):
+        return cache.get(key, 0)
+
+    def reset(self):
+        pass
+
+
+class ConcurrencyLimiter:
+    """
+    semaphore บน cache ที่แชร์กัน: limit ช่อง = limit key, จองช่องด้วย cache.add (atomic ทุก backend
+    รวมถึง DB cache ที่ incr ไม่ atomic) แล้วลบ key ตอนจบ request
+    worker ตายกลางคัน -> ช่องว่างเองเมื่อ key หมดอายุ (ttl)
+    """
+
+    local_backends = (LocMemCache, DummyCache)
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+        if isinstance(self.cache, self.local_backends):
+            raise ImproperlyConfigured(
+                f"CONCURRENCY_LIMITS needs a cache shared by every worker; "
+                f"CACHES[{alias!r}] is {type(self.cache).__name__}. "
+                f"Point CONCURRENCY_CACHE at a database or Redis cache, or set CONCURRENCY_LIMITS = {{}}."
+            )
+
+    def acquire(self, key, limit, ttl):
+        """-> key ของช่องที่จองได้ (ส่งให้ release) หรือ None ถ้าเต็ม"""
+        slots = [f"{key}:{index}" for index in range(limit)]
+        held = self.cache.get_many(slots)
+        free = [slot for slot in slots if slot not in held]
+        # สุ่มลำดับ -> worker ที่จองพร้อมกันไม่แย่งช่องเดียวกัน
+        random.shuffle(free)
+        for slot in free:
+            if self.cache.add(slot, 1, timeout=ttl):
+                return slot
+        return None
+
+    def release(self, slot):
+        self.cache.delete(slot)
+
+
+_memory_store = MemoryWindowStore()
+_cache_store = CacheWindowStore()
+
+
+def get_store():
+    if getattr(settings, 'THROTTLE_BACKEND', 'memory') == 'cache':
+        return _cache_store
+    return _memory_store
+
+
+def reset_throttles():
+    _memory_store.reset()
+
+
+def hit(scope, identity, limit, window_seconds, now=None):
+    """
+    นับ request 1 ครั้ง คืน (allowed, retry_after_seconds)
+    """
+    store = get_store()
+    now = time.time() if now is None else now
+    window = int(now // window_seconds)
+    elapsed = (now % window_seconds) / window_seconds
+
+    current = store.incr(f"throttle:{scope}:{identity}:{window}", window_seconds)
+    previous = store.get(f"throttle:{scope}:{identity}:{window - 1}")
+    estimated = previous * (1 - elapsed) + current
+
+    if estimated <= limit:
+        return True, 0
+
+    # ประมาณเวลาที่ต้องรอจนค่าประมาณลดลงต่ำกว่า limit
+    if previous:
+        wait = ((estimated - limit) / previous) * window_seconds
+        wait = min(wait, (1 - elapsed) * window_seconds + window_seconds)
+    else:
+        wait = (1 - elapsed) * window_seconds
+    return False, max(1, math.ceil(wait))
+
+
+def client_ip(request):
+    # หลัง proxy (Render) IP จริงคือตัวที่ proxy ต่อท้ายใน X-Forwarded-For
+    proxies = getattr(settings, 'THROTTLE_TRUSTED_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(retry_after, message='Too many requests. Please try again later.', status=429):
+    response = JsonResponse({'error': message}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AbuseSheddingMiddleware:
+    """
+    ปฏิเสธ request เขียนข้อมูลแบบไม่ต้อง login ตั้งแต่ก่อนถึง view:
+    - THROTTLE_IP_RULES: [(path regex, limit, window วินาที)] นับต่อ IP -> 429
+    - CONCURRENCY_LIMITS: {path regex: จำนวน request พร้อมกันสูงสุด} -> 503
+    รองรับทั้ง WSGI และ ASGI: GET (async view) ผ่านไปเลยไม่ต้องข้าม thread
+    """
+
+    sync_capable = True
+    async_capable = True
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.compiled = {}
+        # ตรวจตอน start: concurrency cap บน cache ใน process = cap ต่อ worker ที่ไม่มีวันทำงาน -> ล้มดังๆ
+        self.limiter = None
+        if getattr(settings, 'CONCURRENCY_LIMITS', {}):
+            self.limiter = ConcurrencyLimiter(getattr(settings, 'CONCURRENCY_CACHE', 'shared'))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _match(self, rules, path):
+        for pattern, *rest in rules:
+            regex = self.compiled.get(pattern)
+            if regex is None:
+                regex = self.compiled[pattern] = re.compile(pattern)
+            if regex.match(path):
+                return pattern, rest
+        return None, None
+
+    def admit(self, request):
+        """-> (response ที่ปฏิเสธ หรือ None, ช่อง concurrency ที่ต้อง release หรือ None)"""
+        pattern, rule = self._match(getattr(settings, 'THROTTLE_IP_RULES', []), request.path_info)
+        if pattern is not None:
+            limit, window = rule
+            allowed, retry_after = hit(f"ip:{pattern}", client_ip(request), limit, window)
+            if not allowed:
+                return too_many_requests(retry_after), None
+
+        if self.limiter is None:
+            return None, None
+        limits = getattr(settings, 'CONCURRENCY_LIMITS', {})
+        pattern, rule = self._match([(key, value) for key, value in limits.items()], request.path_info)
+        if pattern is None:
+            return None, None
+
+        slot = self.limiter.acquire(f"concurrency:{pattern}", rule[0], ttl=60)
+        if slot is None:
+            return too_many_requests(1, message='Server is busy. Please try again shortly.', status=503), None
+        return None, slot
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method not in self.methods:
+            return self.get_response(request)
+
+        rejected, slot = self.admit(request)
+        if rejected is not None:
+            return rejected
+        try:
+            return self.get_response(request)
+        finally:
+            if slot is not None:
+                self.limiter.release(slot)
+
+    async def __acall__(self, request):
+        if request.method not in self.methods:
+            return await self.get_response(request)
+
+        # DB cache เป็น I/O แบบ sync -> ทำใน thread, เฉพาะ request เขียนข้อมูล (view เป็น sync อยู่แล้ว)
+        rejected, slot = await sync_to_async(self.admit)(request)
+        if rejected is not None:
+            return rejected
+        try:
+            return await self.get_response(request)
+        finally:
+            if slot is not None:
+                await sync_to_async(self.limiter.release)(slot)
+
+
+class PhoneRateThrottle(BaseThrottle):
+    """จำกัดจำนวนออเดอร์ต่อเบอร์โทร (ต้องอ่าน body แล้ว จึงอยู่ชั้น DRF)"""
+
+    def allow_request(self, request, view):
+        # body เป็น JSON array ได้ -> ไม่ใช่ dict ให้ serializer ของ view ตอบ 400 เอง
+        data = request.data if isinstance(request.data, dict) else {}
+        phone = normalize_phone(data.get('customer_phone'))
+        if not phone:
+            return True
+        limit, window = getattr(settings, 'THROTTLE_PHONE_RATE', (5, 600))
+        allowed, self.retry_after = hit('phone', phone, limit, window)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
@@ -1,13 +1,26 @@
 # menu/urls.py
+from django.conf import settings
 from django.urls import path
 from .views import (
     MenuItemListAPIView,
+    MenuGroupedAPIView,
+    MenuSearchAPIView,
     OrderStatusAPIView,
+    CustomerOrderLookupAPIView,
+    OrderReceiptAPIView,
     AdminOrderListView,
     AdminUpdateOrderStatusView,
     AdminDashboardStatsAPIView,
+    AdminDatabasePoolAPIView,
+    AdminOrderSLAAPIView,
+    AdminSchedulerStatusAPIView,
+    AdminRequestProfileListAPIView,
+    AdminRequestProfileDetailAPIView,
+    AdminRequestProfileDownloadAPIView,
     OrderSlipUploadAPIView,
     FinalOrderSubmissionAPIView,
+    CartQuoteAPIView,
+    TimeSlotAvailabilityAPIView,
     CreatePaymentIntentAPIView,
     PaymentStatusAPIView,
 )
@@ -15,31 +28,55 @@ from .webhooks import (
     SimulatorWebhookAPIView,
     StripeWebhookAPIView,
     OmiseWebhookAPIView,
+    TelegramBotWebhookAPIView,
 )
 from rest_framework.authtoken.views import obtain_auth_token
+from . import async_views
 
+# endpoint ที่ลูกค้า poll บ่อย: ใต้ ASGI ใช้เวอร์ชัน async (menu/async_views.py)
+if settings.ASYNC_PUBLIC_VIEWS:
+    menu_item_list_view = async_views.menu_item_list
+    order_status_view = async_views.order_status
+    payment_status_view = async_views.payment_status
+else:
+    menu_item_list_view = MenuItemListAPIView.as_view()
+    order_status_view = OrderStatusAPIView.as_view()
+    payment_status_view = PaymentStatusAPIView.as_view()
 
 urlpatterns = [
 
     # Public
-    path('items/', MenuItemListAPIView.as_view()),
+    path('items/', menu_item_list_view),
+    path('items/grouped/', MenuGroupedAPIView.as_view()),
+    path('items/search/', MenuSearchAPIView.as_view()),
     path('orders/submit-final/', FinalOrderSubmissionAPIView.as_view()),
-    path('orders/<int:id>/', OrderStatusAPIView.as_view()),
+    path('orders/quote/', CartQuoteAPIView.as_view()),
+    path('slots/', TimeSlotAvailabilityAPIView.as_view()),
+    path('orders/lookup/', CustomerOrderLookupAPIView.as_view()),
+    path('orders/<int:id>/', order_status_view),
     path('orders/<int:id>/upload-slip/', OrderSlipUploadAPIView.as_view()),
+    path('orders/<int:id>/receipt.<str:fmt>', OrderReceiptAPIView.as_view()),
     
 
     # Payment
     path('payment/create-intent/', CreatePaymentIntentAPIView.as_view()),
-    path('payment/status/<str:payment_intent_id>/', PaymentStatusAPIView.as_view()),
+    path('payment/status/<str:payment_intent_id>/', payment_status_view),
 
     # Webhooks (แยก provider)
     path('webhook/simulator/', SimulatorWebhookAPIView.as_view()),
     path('webhook/stripe/', StripeWebhookAPIView.as_view()),
     path('webhook/omise/', OmiseWebhookAPIView.as_view()),
+    path('webhook/telegram/', TelegramBotWebhookAPIView.as_view()),
 
     # Admin
     path('auth/token/', obtain_auth_token),
     path('admin/orders/', AdminOrderListView.as_view()),
     path('admin/orders/<int:id>/update-status/', AdminUpdateOrderStatusView.as_view()),
     path('admin/stats/', AdminDashboardStatsAPIView.as_view()),
+    path('admin/db-pool/', AdminDatabasePoolAPIView.as_view()),
+    path('admin/sla/', AdminOrderSLAAPIView.as_view()),
+    path('admin/scheduler/', AdminSchedulerStatusAPIView.as_view()),
+    path('admin/profiles/', AdminRequestProfileListAPIView.as_view()),
+    path('admin/profiles/<str:profile_id>/', AdminRequestProfileDetailAPIView.as_view()),
+    path('admin/profiles/<str:profile_id>/download/', AdminRequestProfileDownloadAPIView.as_view()),
 ]
@@ -3,20 +3,23 @@
 # =======================================================
 
 import os
-import requests
 import json
+import base64
+import binascii
 import uuid
 import hmac
 import hashlib
 
+from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Q
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 
 from rest_framework import generics, status
 from rest_framework.permissions import IsAdminUser, AllowAny
@@ -24,10 +27,27 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
+from kitsu_backend.db_pool import database_stats
+from kitsu_backend.db_router import replica_reads
+from kitsu_backend.profiling import list_profiles, load_profile, profile_path, top_functions
+
+from .cache import get_menu_items, get_menu_grouped, get_orderable_menu, get_schedule, filter_menu_items
+from .bot import start_link
+from .events import WINDOWS, record_transition, stage_percentiles
+from .kitchens import kitchen_chat_id, kitchen_filter, kitchen_from_request
 from .models import MenuItem, Order, OrderItem
+from .promotions import CartLine, quote_cart
+from .receipts import FORMATS, check_receipt_token, get_receipt, receipt_photo, receipt_queryset, receipt_url
+from .scheduler import scheduler_status
+from .search import search_menu_items, DEFAULT_LIMIT, MAX_LIMIT
+from .slots import claim_slot, open_slots, parse_slot_id, slot_starts_at
+from .services import check_lookup_token, get_items_summary, lookup_token, normalize_phone, set_item_summary
+from .telegram import submit_message, telegram_api_url
+from .throttling import PhoneRateThrottle
 from .serializers import (
     MenuItemSerializer,
     OrderStatusSerializer,
+    OrderLookupSerializer,
     AdminOrderSerializer,
     OrderSlipUploadSerializer,
     FinalOrderSubmissionSerializer,
@@ -39,15 +59,16 @@ from .serializers import (
 
 def send_telegram_notification(order):
     bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+    # แต่ละครัวมีกลุ่ม admin ของตัวเอง (ไม่ได้ตั้ง = TELEGRAM_CHAT_ID)
+    chat_id = kitchen_chat_id(order.kitchen_id)
 
     if not bot_token or not chat_id:
         print("WARNING: Telegram credentials not found. Skipping notification.")
         return
 
     message_items = "\nItems:\n"
-    for item in order.items.all():
-        message_items += f"- {item.menu_item_name} (x{item.quantity})\n"
+    for item in get_items_summary(order):
+        message_items += f"- {item['name']} (x{item['quantity']})\n"
 
     message = (
         f"🔔 Kitsu Kitchen: New Order!\n\n"
@@ -58,8 +79,26 @@ def send_telegram_notification(order):
         f"Total: {order.total_price:.2f} บาท\n"
         f"{message_items}"
     )
-    
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    if order.scheduled_for:
+        message += f"Scheduled for: {timezone.localtime(order.scheduled_for):%d/%m %H:%M}\n"
+    if order.applied_promotions:
+        message += "Promotions:\n" + "".join(
+            f"- {promotion['name']} (-{promotion['amount']})\n" for promotion in order.applied_promotions
+        )
+
+    if settings.TELEGRAM_ASYNC_SENDER:
+        # ส่งผ่านคิว (rate limit ต่อ chat + รวมหลายออเดอร์เป็น digest ช่วงคนเยอะ)
+        submit_message(bot_token, chat_id, message, coalesce=True, meta={
+            'order_id': order.id,
+            'customer_name': order.customer_name,
+            'total': f"{order.total_price:.2f}",
+        })
+        return
+
+    # import ตอนใช้งาน (ลดเวลา cold start, ปกติส่งผ่าน async sender อยู่แล้ว)
+    import requests
+
+    url = telegram_api_url(bot_token)
     payload = {
         'chat_id': chat_id,
         'text': message,
@@ -75,22 +114,167 @@ def send_telegram_notification(order):
             print(f"Telegram API Response: {e.response.text}")
 
 
+def encode_order_cursor(created_at, order_id):
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_order_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
 # =======================================================
 #               CUSTOMER-FACING API VIEWS
 # =======================================================
 
 class MenuItemListAPIView(generics.ListAPIView):
-    queryset = MenuItem.objects.filter(is_available=True)
+    queryset = MenuItem.objects.filter(is_available=True).select_related('category')
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny] # No authentication required for menu items
 
+    def list(self, request, *args, **kwargs):
+        # ใช้ payload ที่ cache ไว้ของครัวนี้ (build ใหม่เมื่อเมนูเปลี่ยน ดู menu/cache.py)
+        items = get_menu_items(kitchen_id=kitchen_from_request(request))
+        return Response(filter_menu_items(items, request.query_params.get('category')))
+
+
+class MenuGroupedAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        groups = get_menu_grouped(kitchen_id=kitchen_from_request(request))
+        category = request.query_params.get('category')
+        if category:
+            groups = [group for group in groups if str(group['id']) == category]
+        return Response(groups, status=status.HTTP_200_OK)
+
+
+class MenuSearchAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+
+        results = search_menu_items(
+            query, max(limit, 1), kitchen_id=kitchen_from_request(request),
+            category=request.query_params.get('category'),
+        )
+        return Response(results, status=status.HTTP_200_OK)
+
+
 class OrderStatusAPIView(generics.RetrieveAPIView):
+    # รายการอาหารอ่านจาก Order.items_summary -> query เดียว
     queryset = Order.objects.all()
     serializer_class = OrderStatusSerializer
     lookup_field = 'id'
     permission_classes = [AllowAny]  # No authentication required for checking order status
 
 
+class OrderReceiptAPIView(APIView):
+    """
+    ใบเสร็จของออเดอร์: /orders/<id>/receipt.png หรือ .html
+    ลูกค้าใช้ ?token= จาก receipt_url (ตอบตอนสั่งอาหาร), admin เปิดได้ทุกใบ
+    render ครั้งแรกครั้งเดียว ครั้งต่อไปอ่านไฟล์จาก cache (menu/receipts.py), ETag = version hash
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, id, fmt):
+        if fmt not in FORMATS:
+            return Response({'error': 'format must be png or html'}, status=status.HTTP_404_NOT_FOUND)
+        if not (request.user.is_staff or check_receipt_token(id, request.query_params.get('token'))):
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            order = receipt_queryset().get(id=id)
+        except Order.DoesNotExist:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        content, version = get_receipt(order, fmt)
+        etag = f'"{version}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(content, content_type=FORMATS[fmt])
+        response['ETag'] = etag
+        # มีชื่อ / ที่อยู่ลูกค้า -> ห้าม cache ที่ proxy
+        response['Cache-Control'] = 'private, max-age=300'
+        return response
+
+
+class CustomerOrderLookupAPIView(APIView):
+    """
+    ประวัติออเดอร์ล่าสุดของลูกค้า: ?phone=<เบอร์> หรือ ?chat_id=<telegram chat id>
+    ต้องมี ?token= (lookup_token: ของเบอร์ได้ตอนสั่งอาหาร, ของ chat_id ได้จากคำสั่ง /orders ของ bot) หรือเป็น admin
+    แบ่งหน้าแบบ keyset ด้วย ?cursor= (ใช้ index (customer_phone/chat_id, created_at))
+    """
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        phone = normalize_phone(request.query_params.get('phone'))
+        chat_id = request.query_params.get('chat_id', '').strip()
+
+        if phone:
+            orders = Order.objects.filter(customer_phone=phone)
+        elif chat_id:
+            orders = Order.objects.filter(customer_telegram_chat_id=chat_id)
+        else:
+            return Response(
+                {'error': 'phone or chat_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        token = request.query_params.get('token')
+        if not (request.user.is_staff or check_lookup_token(token, phone=phone, chat_id=None if phone else chat_id)):
+            return Response(
+                {'error': 'Invalid or missing token'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                created_at, last_id = decode_order_cursor(cursor)
+                orders = orders.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+                )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor or limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = list(
+            orders.order_by('-created_at', '-id')
+            .values('id', 'status', 'payment_status', 'total_price', 'created_at')[:limit + 1]
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_order_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+        return Response({
+            'results': OrderLookupSerializer(rows, many=True).data,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+
 class OrderSlipUploadAPIView(generics.UpdateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSlipUploadSerializer
@@ -99,20 +283,31 @@ class OrderSlipUploadAPIView(generics.UpdateAPIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def perform_update(self, serializer):
+        previous = (serializer.instance.status, serializer.instance.payment_status)
         order = serializer.save()
         order.status = 'AWAITING_PAYMENT'
         order.payment_status = 'UNPAID'
         order.save()
+        record_transition(order, *previous, source='customer')
 
 # =======================================================
 #               ADMIN-FACING API VIEWS
 # =======================================================
 
 class AdminOrderListView(generics.ListAPIView):
-    queryset = Order.objects.all().order_by('-created_at')
+    # รายการอาหารอ่านจาก Order.items_summary -> ไม่ต้อง join / prefetch OrderItem
+    queryset = Order.objects.order_by('-created_at')
     serializer_class = AdminOrderSerializer
     permission_classes = [IsAdminUser]
 
+    def get_queryset(self):
+        # ?kitchen=<slug> -> เฉพาะออเดอร์ของครัวนั้น (index kitchen, created_at)
+        return super().get_queryset().filter(**kitchen_filter(self.request))
+
+    @replica_reads
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class AdminUpdateOrderStatusView(APIView):
     permission_classes = [IsAdminUser]
@@ -130,46 +325,54 @@ class AdminUpdateOrderStatusView(APIView):
                 send_customer_telegram_notification(order, msg)
             elif new_status == 'COMPLETED':
                 msg = get_customer_message(order, 'completed')
-                send_customer_telegram_notification(order, msg)
+                # แนบรูปใบเสร็จ (render ครั้งเดียว ลูกค้าเปิดลิงก์ใบเสร็จทีหลังได้ไฟล์เดิมจาก cache)
+                photo = receipt_photo(order) if order.customer_telegram_chat_id else None
+                send_customer_telegram_notification(order, msg, photo=photo)
             elif new_status == 'CANCELLED':
                 # อาจจะส่งข้อความแจ้งลูกค้าด้วยก็ได้ (ถ้าต้องการ)
                 msg = get_customer_message(order, 'cancelled')
                 send_customer_telegram_notification(order, msg)
 
+            previous = (order.status, order.payment_status)
             order.status = new_status
             order.save()
+            record_transition(order, *previous, source='admin')
             return Response(AdminOrderSerializer(order).data, status=status.HTTP_200_OK)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
         
 
+def dashboard_stats(orders, now=None):
+    """
+    สรุปยอดของ orders (queryset ที่กรองครัวแล้ว) สำหรับ Dashboard
+    "วันนี้" เป็นช่วง created_at >= เที่ยงคืน AND < เที่ยงคืนถัดไป (ตามเวลาประเทศไทย) -> ใช้ index ได้
+    (created_at__date แปลงค่าทุกแถวก่อนเทียบ -> อ่านทั้งตาราง) ดู menu/query_plans.py
+    """
+    day = timezone.localtime(now or timezone.now()).date()
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    # ออเดอร์ทั้งหมดของวันนี้ + ยอดขายเฉพาะที่เสร็จสมบูรณ์แล้ว ใน query เดียว
+    today = orders.filter(created_at__gte=start, created_at__lt=end).aggregate(
+        count=Count('id'),
+        revenue=Sum('total_price', filter=Q(status='COMPLETED')),
+    )
+    return {
+        'todays_revenue': f"{today['revenue'] or Decimal('0.00'):.2f}",
+        'todays_orders_count': today['count'],
+        'total_orders_count': orders.count(),
+    }
+
+
 # --- ⭐️ API View ใหม่สำหรับข้อมูลสรุปบน Dashboard (เวอร์ชันที่ถูกต้อง) ⭐️ ---
 class AdminDashboardStatsAPIView(APIView):
     permission_classes = [IsAdminUser]
 
+    @replica_reads
     def get(self, request, *args, **kwargs):
+        # ?kitchen=<slug> -> สถิติของครัวนั้น (ไม่ระบุ = ทุกครัว), ไม่รู้จัก slug -> 404
+        orders = Order.objects.filter(**kitchen_filter(request))
         try:
-            # ใช้วิธีที่ถูกต้องและปลอดภัยที่สุดในการจัดการ Timezone
-            today = timezone.localtime(timezone.now()).date()
-
-            # 1. หาออเดอร์ทั้งหมดของ "วันนี้" (ตามเวลาประเทศไทย)
-            all_todays_orders = Order.objects.filter(created_at__date=today)
-            # 2. หา 'เฉพาะ' ออเดอร์ที่เสร็จสมบูรณ์แล้วของวันนี้
-            completed_todays_orders = all_todays_orders.filter(status='COMPLETED')
-
-            # คำนวณยอดขาย
-            todays_revenue = completed_todays_orders.aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-            # นับจำนวนออเดอร์ทั้งหมด
-            total_orders_count = Order.objects.count()
-            # นับจำนวนออเดอร์ของวันนี้
-            todays_orders_count = all_todays_orders.count()
-
-            data = {
-                'todays_revenue': f"{todays_revenue:.2f}",
-                'todays_orders_count': todays_orders_count,
-                'total_orders_count': total_orders_count,
-            }
-            return Response(data, status=status.HTTP_200_OK)
+            return Response(dashboard_stats(orders), status=status.HTTP_200_OK)
         except Exception as e:
             # เพิ่มการดักจับ Error เพื่อให้เราเห็นว่าเกิดอะไรขึ้น
             print(f"ERROR in AdminDashboardStatsView: {e}")
@@ -178,93 +381,283 @@ class AdminDashboardStatsAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+# =======================================================
+class AdminDatabasePoolAPIView(APIView):
+    """สถานะ connection / pool ของ database ทุก alias (เฉพาะ worker process ที่ตอบ request นี้)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(database_stats(), status=status.HTTP_200_OK)
+
+# =======================================================
+class AdminOrderSLAAPIView(APIView):
+    """
+    เวลาที่ออเดอร์อยู่ในแต่ละช่วง (สั่ง->เริ่มทำ, ทำ->ส่ง, ส่ง->เสร็จ) แบบ percentile
+    ?window=1h|24h|7d (ไม่ระบุ = ทุก window) คำนวณจาก histogram รายชั่วโมง (menu/events.py)
+    """
+    permission_classes = [IsAdminUser]
+
+    @replica_reads
+    def get(self, request, *args, **kwargs):
+        requested = request.query_params.get('window')
+        if requested and requested not in WINDOWS:
+            return Response(
+                {'error': f"window must be one of {', '.join(WINDOWS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        names = [requested] if requested else list(WINDOWS)
+        now = timezone.now()
+        return Response(
+            {name: stage_percentiles(WINDOWS[name], now=now) for name in names},
+            status=status.HTTP_200_OK
+        )
+
+# =======================================================
+class AdminSchedulerStatusAPIView(APIView):
+    """leader ปัจจุบันของ scheduler และสถิติการรันของแต่ละงาน"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(scheduler_status(), status=status.HTTP_200_OK)
+
+# =======================================================
+class AdminRequestProfileListAPIView(APIView):
+    """profile ของ request ที่เก็บไว้ (ล่าสุดก่อน) ดู kitsu_backend/profiling.py"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(list_profiles(), status=status.HTTP_200_OK)
+
+# =======================================================
+class AdminRequestProfileDetailAPIView(APIView):
+    """profile หนึ่งตัว: ข้อมูล request, SQL ทุก statement และฟังก์ชันที่ใช้เวลามากสุด"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        data = load_profile(profile_id)
+        stats_path = profile_path(profile_id)
+        if data is None or stats_path is None:
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        data['top_functions'] = top_functions(stats_path)
+        return Response(data, status=status.HTTP_200_OK)
+
+# =======================================================
+class AdminRequestProfileDownloadAPIView(APIView):
+    """ไฟล์ .prof (pstats) สำหรับเปิดด้วย snakeviz / python -m pstats"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        stats_path = profile_path(profile_id)
+        if stats_path is None:
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(stats_path, 'rb'), as_attachment=True, filename=f"{profile_id}.prof")
+
+# =======================================================
+class TimeSlotAvailabilityAPIView(APIView):
+    """
+    slot สั่งล่วงหน้าที่ยังว่าง (?date=YYYY-MM-DD เฉพาะวันนั้น) พร้อมจำนวนที่เหลือ
+    อ่านจากตาราง TimeSlot อย่างเดียว ไม่นับออเดอร์
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        day = None
+        if request.query_params.get('date'):
+            try:
+                day = datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'error': 'date must be YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        return Response(open_slots(day=day, kitchen_id=kitchen_from_request(request)), status=status.HTTP_200_OK)
+
+# =======================================================
+# จำนวนสูงสุดต่อรายการ (กันตะกร้าที่ quantity ใหญ่ผิดปกติ)
+MAX_ITEM_QUANTITY = 99
+
+
+def parse_cart_items(raw_items):
+    """
+    items จาก client (JSON string หรือ list ของ {'id', 'quantity'}) -> [(id, quantity)] ตามลำดับที่ส่งมา
+    id ซ้ำ -> รวมเป็นบรรทัดเดียว (quantity รวมกัน) ทั้ง quote และตอนสั่งจริง
+    ข้อมูลไม่ถูกต้อง -> ValueError พร้อมข้อความที่ส่งกลับให้ client ได้เลย
+    """
+    try:
+        items_data = json.loads(raw_items) if isinstance(raw_items, (str, bytes)) else raw_items
+        if not isinstance(items_data, list) or not items_data:
+            raise ValueError
+    except (json.JSONDecodeError, ValueError):
+        raise ValueError('items must be a non-empty JSON array')
+
+    # FIX: กัน id หาย
+    for item in items_data:
+        if not isinstance(item, dict) or 'id' not in item or 'quantity' not in item:
+            raise ValueError('Each item must contain id and quantity')
+
+    items = {}
+    for item in items_data:
+        try:
+            item_id, quantity = int(item['id']), int(item['quantity'])
+            if not 0 < quantity <= MAX_ITEM_QUANTITY:
+                raise ValueError
+        except (ValueError, TypeError):
+            raise ValueError('Invalid item structure')
+        items[item_id] = items.get(item_id, 0) + quantity
+        if items[item_id] > MAX_ITEM_QUANTITY:
+            raise ValueError(f'Quantity per menu item must be at most {MAX_ITEM_QUANTITY}')
+    return list(items.items())
+
+
+def load_cart_lines(raw_items, kitchen_id, at=None):
+    """
+    เหมือน parse_cart_items แต่อ่านราคาจาก DB (ใช้ตอนสร้างออเดอร์จริง) -> [CartLine], เมนูของครัวอื่น = ไม่พบ
+    at = เวลาที่ต้องขายได้ (สั่งล่วงหน้า = เวลาเริ่ม slot, ไม่ระบุ = ตอนนี้)
+    """
+    items = parse_cart_items(raw_items)
+    menu_map = {
+        menu_item.id: menu_item
+        for menu_item in MenuItem.objects.filter(
+            kitchen_id=kitchen_id, id__in=[item_id for item_id, _ in items]
+        ).only('id', 'name', 'price', 'category_id', 'is_available')
+    }
+    if len(menu_map) != len(items):
+        raise ValueError('Some menu items were not found')
+    # ปิดขาย หรือนอกช่วงเวลาขาย (ตารางเวลาใน memory, ไม่ query)
+    hidden = get_schedule(kitchen_id=kitchen_id).hidden_at(at or timezone.now())
+    if any(not menu_item.is_available or menu_item.id in hidden for menu_item in menu_map.values()):
+        raise ValueError('Some menu items are not available at the requested time' if at else 'Some menu items are not available right now')
+    return [CartLine.from_menu_item(menu_map[item_id], quantity) for item_id, quantity in items]
+
+
+class CartQuoteAPIView(APIView):
+    """
+    ตรวจ + คิดราคาตะกร้า (รวมโปรโมชันที่ใช้ได้ตอนนี้) โดยไม่สร้างออเดอร์และไม่ query DB
+    ราคาอ่านจากตารางราคาใน memory (get_price_table) ที่เช็คเวอร์ชันเมนูทุกครั้ง -> frontend เรียกได้ทุกครั้งที่ตะกร้าเปลี่ยน
+    body: {"items": [{"id": 1, "quantity": 2}, ...], "kitchen": "<slug>" (ไม่ระบุ = ครัวหลัก),
+           "time_slot_id": <id> (สั่งล่วงหน้า: เช็คช่วงเวลาขายตอนเวลาของ slot, +1 query)}
+    -> valid, ราคาแต่ละรายการ, subtotal, ส่วนลด, total และ problems (เมนูที่ถูกลบ / หมด) ที่ไม่ถูกนับในราคา
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        # body ต้องเป็น JSON object (array / ค่าเดี่ยว -> 400 ไม่ใช่ AttributeError)
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Request body must be a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            items = parse_cart_items(request.data.get('items'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        kitchen_id = kitchen_from_request(request)
+        at = None
+        if request.data.get('time_slot_id'):
+            try:
+                slot_id = parse_slot_id(request.data['time_slot_id'])
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            at = slot_starts_at(slot_id, kitchen_id=kitchen_id)
+            if at is None:
+                return Response({'error': 'This time slot is full or no longer available'}, status=status.HTTP_409_CONFLICT)
+        prices, hidden = get_orderable_menu(now=at, kitchen_id=kitchen_id)
+        cart_lines, problems = [], []
+        for item_id, quantity in items:
+            entry = prices.get(item_id)
+            if entry is None:
+                problems.append({'id': item_id, 'name': None, 'error': 'not_found'})
+            elif not entry.is_available or item_id in hidden:
+                problems.append({'id': item_id, 'name': entry.name, 'error': 'unavailable'})
+            else:
+                cart_lines.append(CartLine(item_id, entry.name, entry.price, quantity, entry.category_id))
+
+        data = quote_cart(cart_lines, kitchen_id=kitchen_id).as_dict()
+        data['valid'] = not problems
+        data['problems'] = problems
+        return Response(data, status=status.HTTP_200_OK)
+
 # =======================================================
 class FinalOrderSubmissionAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Request body must be a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = FinalOrderSubmissionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        # 1. Parse items (FIX: validate structure ชัดเจน)
-        try:
-            items_data = json.loads(data['items'])
-            if not isinstance(items_data, list) or not items_data:
-                raise ValueError
-        except (json.JSONDecodeError, ValueError):
+        # เก็บเบอร์โทรในรูปแบบเดียวกันเสมอ (ใช้ค้นประวัติออเดอร์)
+        customer_phone = normalize_phone(data['customer_phone'])
+        if not customer_phone:
             return Response(
-                {'error': 'items must be a non-empty JSON array'},
+                {'error': 'customer_phone must contain digits'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 2. Validate item ids (FIX: กัน id หาย)
-        item_ids = []
-        for item in items_data:
-            if 'id' not in item or 'quantity' not in item:
+        # 1. สั่งล่วงหน้า: จองที่ใน slot ด้วย conditional UPDATE (ไม่ต้องนับออเดอร์), rollback พร้อมออเดอร์ถ้าพัง
+        kitchen_id = kitchen_from_request(request)
+        scheduled_for = None
+        if data.get('time_slot_id'):
+            try:
+                slot_id = parse_slot_id(data['time_slot_id'])
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            scheduled_for = claim_slot(slot_id, kitchen_id=kitchen_id)
+            if scheduled_for is None:
                 return Response(
-                    {'error': 'Each item must contain id and quantity'},
-                    status=status.HTTP_400_BAD_REQUEST
+                    {'error': 'This time slot is full or no longer available'},
+                    status=status.HTTP_409_CONFLICT
                 )
-            item_ids.append(item['id'])
 
-        # 3. Fetch menu items
-        menu_items = MenuItem.objects.filter(id__in=item_ids)
-        menu_map = {item.id: item for item in menu_items}
-
-        if len(menu_map) != len(item_ids):
-            return Response(
-                {'error': 'Some menu items were not found'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # 2-3. Parse + validate items, fetch menu items ของครัวที่สั่ง (ใช้ร่วมกับ /orders/quote/)
+        # สั่งล่วงหน้า -> เมนูต้องขายได้ตอนเวลาของ slot ไม่ใช่ตอนกดสั่ง
+        try:
+            cart_lines = load_cart_lines(data['items'], kitchen_id, at=scheduled_for)
+        except ValueError as e:
+            # return Response ไม่ rollback เอง -> คืนที่ใน slot ที่เพิ่งจอง
+            transaction.set_rollback(True)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # 4. Create order (FIX: payment_slip optional)
         order = Order.objects.create(
+            kitchen_id=kitchen_id,
             customer_name=data['customer_name'],
-            customer_phone=data['customer_phone'],
+            customer_phone=customer_phone,
             customer_address=data['customer_address'],
             customer_telegram_chat_id=data.get('customer_telegram_chat_id'),  # ← FIX เพิ่ม Telegram ID
             payment_slip=data.get('payment_slip'),  # ← FIX สำคัญ
             status='AWAITING_PAYMENT',
             payment_status='UNPAID',
-            total_price=Decimal('0.00')
+            total_price=Decimal('0.00'),
+            time_slot_id=slot_id if scheduled_for else None,
+            scheduled_for=scheduled_for
         )
 
-        # 5. Create order items + calculate total
-        total_price = Decimal('0.00')
-        order_items = []
-
-        for item in items_data:
-            try:
-                menu_item = menu_map[item['id']]
-                quantity = int(item['quantity'])
-                if quantity <= 0:
-                    raise ValueError
-            except (KeyError, ValueError, TypeError):
-                return Response(
-                    {'error': 'Invalid item structure'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            total_price += menu_item.price * quantity
-
-            order_items.append(
-                OrderItem(
-                    order=order,
-                    menu_item=menu_item,
-                    menu_item_name=menu_item.name,
-                    quantity=quantity,
-                    price=menu_item.price
-                )
+        # 5. Create order items + calculate total (ราคาหลังหักโปรโมชัน)
+        order_items = [
+            OrderItem(
+                order=order,
+                menu_item_id=line.menu_item_id,
+                menu_item_name=line.name,
+                quantity=line.quantity,
+                price=line.price
             )
-
+            for line in cart_lines
+        ]
         OrderItem.objects.bulk_create(order_items)
+        quote = quote_cart(cart_lines, kitchen_id=kitchen_id)
+        total_price = quote.total
 
-        # 6. Finalize order
+        # 6. Finalize order (+ สรุปรายการไว้ในแถว order เลย)
         order.total_price = total_price
-        order.save(update_fields=['total_price'])
+        order.discount_total = quote.discount_total
+        order.applied_promotions = quote.applied_promotions()
+        set_item_summary(order, order_items)
+        order.save(update_fields=['total_price', 'discount_total', 'applied_promotions', 'item_count', 'items_summary'])
+        record_transition(order, '', '', source='customer')
 
         # 7. Notify AFTER commit (FIX: ไม่ rollback เพราะ Telegram)
         def notify_after_commit():
@@ -285,12 +678,18 @@ class FinalOrderSubmissionAPIView(APIView):
             {
                 'message': 'Order created successfully',
                 'order_id': order.id,
-                'total_price': f"{total_price:.2f}"
+                'total_price': f"{total_price:.2f}",
+                'discount_total': f"{quote.discount_total:.2f}",
+                # ลิงก์เปิด bot ที่ผูก chat กับออเดอร์นี้ (แทนการกรอก chat id เอง / reload หน้า tracker)
+                'telegram_link': start_link(order.id),
+                'receipt_url': receipt_url(order.id),
+                # ใช้กับ /api/orders/lookup/?phone=...&token=... (ประวัติออเดอร์ของเบอร์นี้)
+                'lookup_token': lookup_token(phone=customer_phone)
             },
             status=status.HTTP_201_CREATED
         )
 
-def send_customer_telegram_notification(order,message):
+def send_customer_telegram_notification(order, message, photo=None):
     bot_token = os.environ.get('CUSTOMER_TELEGRAM_BOT_TOKEN')
     chat_id = order.customer_telegram_chat_id
 
@@ -302,15 +701,22 @@ def send_customer_telegram_notification(order,message):
         print(f"WARNING: No Telegram Chat ID for Order {order.id}. Skipping.")
         return
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        'chat_id': chat_id,
-        'text': message,
-        'parse_mode': 'HTML'
-    }
+    if settings.TELEGRAM_ASYNC_SENDER:
+        submit_message(bot_token, chat_id, message, parse_mode='HTML', photo=photo)
+        return
+
+    import requests
 
     try:
-        response = requests.post(url, json=payload, timeout=5)
+        if photo:
+            # sendPhoto: ข้อความเป็น caption ของรูป
+            url = telegram_api_url(bot_token, 'sendPhoto')
+            payload = {'chat_id': chat_id, 'caption': message, 'parse_mode': 'HTML'}
+            response = requests.post(url, data=payload, files={'photo': ('receipt.png', photo, 'image/png')}, timeout=10)
+        else:
+            url = telegram_api_url(bot_token)
+            payload = {'chat_id': chat_id, 'text': message, 'parse_mode': 'HTML'}
+            response = requests.post(url, json=payload, timeout=5)
         response.raise_for_status()
         print(f"Customer Telegram notification sent for Order {order.id}")
     except requests.exceptions.RequestException as e:
@@ -324,7 +730,8 @@ def get_customer_message(order, event):
             f"{base}"
             f"✅ คำสั่งซื้อของคุณถูกสร้างแล้ว!\n\n"
             f"📋 รายการ:\n"
-            + "".join([f"- {item.menu_item_name} x{item.quantity}\n" for item in order.items.all()])
+            + "".join([f"- {item['name']} x{item['quantity']}\n" for item in get_items_summary(order)])
+            + (f"\n🎉 ส่วนลด: ฿{order.discount_total:.2f}" if order.discount_total else "")
             + f"\n💰 ยอดรวม: ฿{order.total_price:.2f}\n\n"
             f"กรุณาชำระเงินเพื่อดำเนินการต่อครับ"
         ),
@@ -388,14 +795,18 @@ class CreatePaymentIntentAPIView(APIView):
         )
 
         # bind intent_id กับ Order
+        previous = (order.status, order.payment_status)
         order.payment_intent_id = intent_id
+        order.payment_intent_created_at = timezone.now()
         order.payment_status = 'UNPAID'
         order.status = 'AWAITING_PAYMENT'
         order.save(update_fields=[
             'payment_intent_id',
+            'payment_intent_created_at',
             'payment_status',
             'status'
         ])
+        record_transition(order, *previous, source='customer')
 
         simulator_url = (
             "https://potae31121.github.io/kitsu-cloud-kitchen/"
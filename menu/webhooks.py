@@ -1,6 +1,9 @@
 # menu/webhooks.py
 
+import hmac
 import json
+
+from django.conf import settings
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -11,6 +14,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 
+from .bot import handle_update
+from .events import record_transition
 from .models import Order
 from .views import get_customer_message, send_customer_telegram_notification, send_telegram_notification
 
@@ -46,11 +51,13 @@ class SimulatorWebhookAPIView(APIView):
         if order.payment_status == 'PAID':
             return Response({'message': 'Already processed'}, status=200)
 
+        previous = (order.status, order.payment_status)
         if payment_status == 'success':
             order.payment_status = 'PAID'
             order.status = 'PREPARING'
             order.paid_at = timezone.now()
             order.save()
+            record_transition(order, *previous, source='webhook')
 
             send_telegram_notification(order)
             # เพิ่มแจ้งลูกค้า
@@ -61,6 +68,7 @@ class SimulatorWebhookAPIView(APIView):
 
         order.payment_status = 'FAILED'
         order.save()
+        record_transition(order, *previous, source='webhook')
         return Response({'message': 'Payment failed'}, status=200)
 
 
@@ -94,3 +102,32 @@ class OmiseWebhookAPIView(APIView):
             {'message': 'Omise webhook received'},
             status=status.HTTP_200_OK
         )
+
+
+# =======================================================
+# Telegram Bot Webhook (customer bot: /start <token>, /status, /orders)
+# =======================================================
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TelegramBotWebhookAPIView(APIView):
+    """
+    ตั้งด้วย setWebhook(url=.../api/webhook/telegram/, secret_token=TELEGRAM_WEBHOOK_SECRET)
+    คำตอบของ bot ส่งกลับใน response นี้เลย (menu/bot.py) ไม่ต้องเรียก Telegram API เพิ่ม
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        secret = getattr(settings, 'TELEGRAM_WEBHOOK_SECRET', '')
+        received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not secret or not hmac.compare_digest(received, secret):
+            return Response({'error': 'Invalid secret token'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            update = json.loads(request.body)
+        except json.JSONDecodeError:
+            return Response({'error': 'Invalid JSON'}, status=400)
+
+        # /orders: ลิงก์ไปหน้าประวัติของ frontend ถ้าตั้งไว้ ไม่งั้นชี้ไปที่ lookup API ตรงๆ
+        history_url = getattr(settings, 'ORDER_HISTORY_URL', '') or request.build_absolute_uri('/api/orders/lookup/')
+        # Telegram ส่ง update เดิมซ้ำถ้าไม่ได้ 200 -> ข้อความที่ไม่รู้จักก็ตอบ 200 (body ว่าง)
+        return Response(handle_update(update, history_url=history_url) or {}, status=status.HTTP_200_OK)